@@ -6,16 +6,104 @@ CONF_THRESHOLD = 0.15
 IMG_SIZE = 640
 ALLOWED_LABELS = ("truck", "car")
 DETECTION_TTL_FRAMES = 10
+# Tracking: a detection continues a track when it overlaps the track's predicted
+# box by TRACK_MIN_IOU or its centre is within TRACK_MATCH_RADIUS pixels. Missed
+# tracks coast at their last velocity for at most TRACK_PREDICT_SECONDS.
+TRACK_MATCH_RADIUS = 60
+TRACK_MIN_IOU = 0.1
+TRACK_PREDICT_SECONDS = 1.0
+
+# "auto" picks the backend from MODEL_PATH: .pt -> torch, .onnx -> onnxruntime,
+# .xml / OpenVINO folder -> openvino. CPU-only PCs: see export_model.py.
+INFERENCE_BACKEND = "auto"
+NMS_IOU_THRESHOLD = 0.7
+# Run the model in INFERENCE_WORKERS separate processes (0 = inside the app),
+# each limited to INFERENCE_WORKER_THREADS CPU threads. Frames reach them via
+# shared memory; useful on many-core PCs with several cameras or a high DPS.
+INFERENCE_WORKERS = 0
+INFERENCE_WORKER_THREADS = 2
 
 # Keep this as requested: detection cycles per second.
 TARGET_DPS = 4
 
+# Motion-gated inference: YOLO runs at MOTION_MAX_DPS while something moves
+# inside the zones and drops to MOTION_IDLE_DPS once the scene has been still
+# for MOTION_IDLE_SECONDS. When disabled, TARGET_DPS is used all the time.
+MOTION_GATING = True
+MOTION_MAX_DPS = TARGET_DPS
+MOTION_IDLE_DPS = 0.2
+MOTION_IDLE_SECONDS = 5.0
+MOTION_THRESHOLD = 0.01  # fraction of zone pixels that must change
+
+# Run YOLO only on the union box of all zones (plus this margin in pixels).
+ROI_ENABLED = True
+ROI_MARGIN = 40
+
 FRAME_WIDTH = 960
 FRAME_HEIGHT = 540
 WINDOW_TITLE = "Depot Truck Monitor"
+# GUI repaint cap, independent of TARGET_DPS and the camera rate (0 = every frame).
+DISPLAY_FPS = 15
+# Preview size relative to FRAME_WIDTH x FRAME_HEIGHT (e.g. 0.5 paints a quarter
+# of the pixels); zones are still edited and stored in full-frame coordinates.
+DISPLAY_SCALE = 1.0
 
 ZONES_PATH = "zones.json"
+# A .db/.sqlite path stores RFID events (and bay state transitions) in an
+# indexed SQLite database instead; migrate with `python event_store.py import`.
 RFID_LOG_PATH = "rfid_log.csv"
 RFID_SERIAL_PORT = ""
 RFID_SERIAL_BAUDRATE = 115200
-RFID_SERIAL_AUTOSTART = True
\ No newline at end of file
+RFID_SERIAL_AUTOSTART = True
+
+# RFID rows are buffered and appended in batches (RFID_FLUSH_ROWS rows or every
+# RFID_FLUSH_SECONDS). RFID_FSYNC: "never" (OS decides), "batch" (fsync each
+# batch) or "always" (fsync every event before returning).
+RFID_FLUSH_ROWS = 50
+RFID_FLUSH_SECONDS = 1.0
+RFID_FSYNC = "batch"
+# Rotate the log past RFID_ROTATE_MAX_BYTES (0 = never) and/or daily; keep RFID_ROTATE_BACKUPS old files.
+RFID_ROTATE_MAX_BYTES = 10_000_000
+RFID_ROTATE_DAILY = False
+RFID_ROTATE_BACKUPS = 30
+# Rows in the GUI RFID table: the live view keeps the newest N, history pages are N rows each.
+RFID_TABLE_ROWS = 250
+
+# A bay state only counts once it holds for ZONE_DEBOUNCE_FRAMES frames and
+# ZONE_DEBOUNCE_SECONDS. Each change, with the time spent in the previous state,
+# is appended to ZONE_TRANSITIONS_PATH (.csv, or .db for the SQLite event store).
+ZONE_DEBOUNCE_FRAMES = 3
+ZONE_DEBOUNCE_SECONDS = 1.0
+RECORD_ZONE_TRANSITIONS = True
+ZONE_TRANSITIONS_PATH = "zone_transitions.csv"
+# Badge-ins are matched to the next bay occupied within CORRELATION_WINDOW_SECONDS,
+# badge-outs to the bay the tag's truck left; finished visits go to VISITS_PATH.
+CORRELATION_WINDOW_SECONDS = 300.0
+VISITS_PATH = "visits.csv"
+
+# Last camera index/backend that worked, so the next start can skip probing.
+CAMERA_CACHE_PATH = "camera_cache.json"
+
+# Camera watchdog: a stream is treated as dead after CAMERA_STALL_SECONDS
+# without a new frame or CAMERA_FROZEN_SECONDS of identical frames, then
+# reopened in the background with exponential backoff between attempts.
+CAMERA_WATCHDOG = True
+CAMERA_STALL_SECONDS = 3.0
+CAMERA_FROZEN_SECONDS = 10.0
+CAMERA_RECONNECT_MIN_SECONDS = 1.0
+CAMERA_RECONNECT_MAX_SECONDS = 30.0
+
+# Cameras watching the depot, each with its own device index and zone file.
+# Frames from all cameras are batched into one YOLO call per detection cycle.
+CAMERAS = (
+    {"name": "cam0", "index": CAMERA_INDEX, "zones_path": ZONES_PATH},
+)
+
+# Per-stage latency histograms (p50/p95/p99) and frame rates. Headless mode
+# writes a snapshot to METRICS_PATH (.prom = Prometheus text, else JSON).
+METRICS_ENABLED = True
+METRICS_PATH = "metrics.prom"
+METRICS_DUMP_SECONDS = 10.0
+
+# Max packets buffered between pipeline stages (oldest is dropped when full).
+PIPELINE_QUEUE_SIZE = 2
@@ -0,0 +1,332 @@
+"""Inference backends: PyTorch (ultralytics), ONNX Runtime and OpenVINO.
+
+Every backend returns ``RawBoxes`` (xyxy/conf/cls NumPy arrays in the
+coordinates of the image it was given), so ``DepotDetector`` builds the same
+``DetectionBatch`` whatever runs the model. The ONNX Runtime and OpenVINO
+backends run an exported YOLOv8-style graph (output ``(batch, 4 + classes,
+anchors)``) and do their own letterbox and NMS, so they need neither torch nor
+ultralytics at runtime. Create those models with ``export_model.py``.
+"""
+
+from __future__ import annotations
+
+import ast
+import json
+from concurrent.futures import Future
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+import cv2
+import numpy as np
+
+from metrics import METRICS
+
+BACKENDS = ("torch", "onnxruntime", "openvino")
+LETTERBOX_COLOR = (114, 114, 114)
+MAX_DETECTIONS = 300
+# Per-class NMS trick: shift each class into its own coordinate range.
+_CLASS_OFFSET = 7680.0
+
+
+@dataclass
+class RawBoxes:
+    xyxy: np.ndarray
+    conf: np.ndarray
+    cls: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.conf)
+
+    @classmethod
+    def empty(cls) -> "RawBoxes":
+        return cls(np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.intp))
+
+
+def labels_path(model_path: str) -> Path:
+    """Sidecar file listing class names in class-id order (``<model>.labels.json``)."""
+    path = Path(model_path)
+    return path.with_name(path.stem + ".labels.json")
+
+
+def write_labels(model_path: str, names: Dict[int, str]) -> None:
+    ordered = [names[i] for i in sorted(names)]
+    labels_path(model_path).write_text(json.dumps(ordered, indent=2), encoding="utf-8")
+
+
+def read_labels(model_path: str) -> Dict[int, str] | None:
+    path = labels_path(model_path)
+    if not path.exists():
+        return None
+    return dict(enumerate(json.loads(path.read_text(encoding="utf-8"))))
+
+
+def letterbox(image: np.ndarray, size: int) -> tuple[np.ndarray, float, tuple[int, int]]:
+    """Resize keeping aspect ratio and pad to ``size`` x ``size``; returns (image, scale, (pad_x, pad_y))."""
+    h, w = image.shape[:2]
+    scale = min(size / h, size / w)
+    new_w, new_h = int(round(w * scale)), int(round(h * scale))
+    if (new_w, new_h) != (w, h):
+        image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    pad_x, pad_y = (size - new_w) / 2, (size - new_h) / 2
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+    image = cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=LETTERBOX_COLOR)
+    return image, scale, (left, top)
+
+
+def prepare_batch(images: Sequence[np.ndarray], size: int) -> tuple[np.ndarray, List[tuple[float, tuple[int, int]]]]:
+    """Letterbox BGR frames into one normalized RGB NCHW float32 batch."""
+    boxed = [letterbox(image, size) for image in images]
+    batch = np.stack([image for image, _, _ in boxed])[..., ::-1].transpose(0, 3, 1, 2)
+    batch = np.ascontiguousarray(batch, dtype=np.float32)
+    batch *= 1.0 / 255.0
+    return batch, [(scale, pad) for _, scale, pad in boxed]
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float) -> np.ndarray:
+    """Greedy non-maximum suppression; returns kept indices by descending score."""
+    x1, y1, x2, y2 = boxes.T
+    areas = (x2 - x1) * (y2 - y1)
+    order = scores.argsort()[::-1]
+    keep: List[int] = []
+    while order.size:
+        best = order[0]
+        keep.append(best)
+        rest = order[1:]
+        inter_w = np.clip(np.minimum(x2[best], x2[rest]) - np.maximum(x1[best], x1[rest]), 0, None)
+        inter_h = np.clip(np.minimum(y2[best], y2[rest]) - np.maximum(y1[best], y1[rest]), 0, None)
+        inter = inter_w * inter_h
+        iou = inter / (areas[best] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.intp)
+
+
+def decode_predictions(
+    pred: np.ndarray,
+    conf_threshold: float,
+    iou_threshold: float,
+    classes: Sequence[int] | None = None,
+) -> RawBoxes:
+    """Turn one ``(4 + classes, anchors)`` YOLO output into filtered, NMS-ed boxes."""
+    pred = pred.T
+    scores = pred[:, 4:]
+    class_ids = None
+    if classes is not None:
+        class_ids = np.asarray(classes, dtype=np.intp)
+        scores = scores[:, class_ids]
+        if not class_ids.size:
+            return RawBoxes.empty()
+    cls = scores.argmax(axis=1)
+    conf = scores[np.arange(len(scores)), cls]
+    keep = conf > conf_threshold
+    if not keep.any():
+        return RawBoxes.empty()
+    cls, conf, xywh = cls[keep], conf[keep], pred[keep, :4]
+    if class_ids is not None:
+        cls = class_ids[cls]
+
+    half = xywh[:, 2:] / 2
+    xyxy = np.hstack([xywh[:, :2] - half, xywh[:, :2] + half])
+    kept = nms(xyxy + cls[:, None] * _CLASS_OFFSET, conf, iou_threshold)[:MAX_DETECTIONS]
+    return RawBoxes(xyxy[kept], conf[kept], cls[kept])
+
+
+def scale_boxes(raw: RawBoxes, scale: float, pad: tuple[int, int], shape: tuple[int, int]) -> RawBoxes:
+    """Map letterboxed boxes back to the original ``(h, w)`` image."""
+    if not len(raw):
+        return raw
+    xyxy = (raw.xyxy - np.array([pad[0], pad[1], pad[0], pad[1]], dtype=raw.xyxy.dtype)) / scale
+    xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, shape[1])
+    xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, shape[0])
+    return RawBoxes(xyxy, raw.conf, raw.cls)
+
+
+class InferenceBackend:
+    name = ""
+    names: Dict[int, str] = {}
+    # How many submit() calls may usefully be outstanding at once (worker pools run several).
+    max_in_flight = 1
+
+    def predict(
+        self,
+        images: Sequence[np.ndarray],
+        img_size: int,
+        conf_threshold: float,
+        iou_threshold: float,
+        classes: Sequence[int] | None = None,
+    ) -> List[RawBoxes]:
+        raise NotImplementedError
+
+    def submit(
+        self,
+        images: Sequence[np.ndarray],
+        img_size: int,
+        conf_threshold: float,
+        iou_threshold: float,
+        classes: Sequence[int] | None = None,
+    ) -> "Future[List[RawBoxes]]":
+        """Start ``predict`` and return a future; in-process backends just run it now."""
+        future: Future[List[RawBoxes]] = Future()
+        try:
+            future.set_result(self.predict(images, img_size, conf_threshold, iou_threshold, classes))
+        except Exception as exc:
+            future.set_exception(exc)
+        return future
+
+    def close(self) -> None:
+        """Release worker processes or sessions; a no-op for in-process backends."""
+
+
+class TorchBackend(InferenceBackend):
+    """ultralytics/PyTorch; letterbox and NMS are done by ultralytics."""
+
+    name = "torch"
+
+    def __init__(self, model_path: str, model=None, threads: int = 0) -> None:
+        if threads > 0:
+            import torch
+
+            torch.set_num_threads(threads)
+        if model is None:
+            from ultralytics import YOLO
+
+            model = YOLO(model_path)
+        self.model = model
+        self.names = dict(model.names)
+
+    def predict(self, images, img_size, conf_threshold, iou_threshold, classes=None) -> List[RawBoxes]:
+        results = self.model(
+            list(images), imgsz=img_size, conf=conf_threshold, iou=iou_threshold, classes=classes, verbose=False
+        )
+        parsed: List[RawBoxes] = []
+        for result in results:
+            boxes = result.boxes
+            if boxes is None or len(boxes) == 0:
+                parsed.append(RawBoxes.empty())
+                continue
+            with METRICS.time("to_numpy"):
+                parsed.append(
+                    RawBoxes(
+                        boxes.xyxy.cpu().numpy(),
+                        boxes.conf.cpu().numpy(),
+                        boxes.cls.cpu().numpy().astype(np.intp),
+                    )
+                )
+        return parsed
+
+
+class _ExportedBackend(InferenceBackend):
+    """Shared letterbox -> run graph -> decode/NMS path for exported models."""
+
+    input_size: int | None = None
+    fixed_batch = False
+
+    def _run(self, batch: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def predict(self, images, img_size, conf_threshold, iou_threshold, classes=None) -> List[RawBoxes]:
+        with METRICS.time("preprocess"):
+            batch, meta = prepare_batch(images, self.input_size or img_size)
+        if self.fixed_batch and len(batch) > 1:
+            output = np.concatenate([self._run(batch[i : i + 1]) for i in range(len(batch))])
+        else:
+            output = self._run(batch)
+        with METRICS.time("postprocess"):
+            return [
+                scale_boxes(decode_predictions(pred, conf_threshold, iou_threshold, classes), scale, pad, image.shape[:2])
+                for pred, (scale, pad), image in zip(output, meta, images)
+            ]
+
+
+def _static_dim(value) -> int | None:
+    return value if isinstance(value, int) and value > 0 else None
+
+
+class OnnxRuntimeBackend(_ExportedBackend):
+    name = "onnxruntime"
+
+    def __init__(self, model_path: str, threads: int = 0) -> None:
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        self._input_name = model_input.name
+        self.fixed_batch = _static_dim(model_input.shape[0]) == 1
+        self.input_size = _static_dim(model_input.shape[2])
+        self.names = read_labels(model_path) or self._metadata_names(model_path)
+
+    def _metadata_names(self, model_path: str) -> Dict[int, str]:
+        # ultralytics exports store the class map as a repr'd dict in the metadata.
+        names = self.session.get_modelmeta().custom_metadata_map.get("names")
+        if not names:
+            raise ValueError(f"{model_path} has no class names; re-export it with export_model.py")
+        return {int(k): str(v) for k, v in ast.literal_eval(names).items()}
+
+    def _run(self, batch: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self._input_name: batch})[0]
+
+
+class OpenVinoBackend(_ExportedBackend):
+    name = "openvino"
+
+    def __init__(self, model_path: str, threads: int = 0) -> None:
+        import openvino as ov
+
+        xml_path = _openvino_xml(model_path)
+        core = ov.Core()
+        model = core.read_model(str(xml_path))
+        shape = model.input(0).get_partial_shape()
+        self.fixed_batch = shape[0].is_static and shape[0].get_length() == 1
+        self.input_size = shape[2].get_length() if shape[2].is_static else None
+        config = {"PERFORMANCE_HINT": "LATENCY"}
+        if threads > 0:
+            config["INFERENCE_NUM_THREADS"] = threads
+        self.compiled = core.compile_model(model, "CPU", config)
+        self._output = self.compiled.output(0)
+        names = read_labels(str(xml_path))
+        if names is None:
+            raise ValueError(f"{xml_path} has no {labels_path(str(xml_path)).name}; re-export it with export_model.py")
+        self.names = names
+
+    def _run(self, batch: np.ndarray) -> np.ndarray:
+        return self.compiled(batch)[self._output]
+
+
+def _openvino_xml(model_path: str) -> Path:
+    path = Path(model_path)
+    if path.is_dir():
+        xml_files = sorted(path.glob("*.xml"))
+        if not xml_files:
+            raise FileNotFoundError(f"No OpenVINO .xml model in {model_path}")
+        return xml_files[0]
+    return path
+
+
+def backend_for_path(model_path: str) -> str:
+    path = Path(model_path)
+    if path.suffix.lower() == ".onnx":
+        return "onnxruntime"
+    if path.suffix.lower() == ".xml" or path.is_dir():
+        return "openvino"
+    return "torch"
+
+
+def load_backend(model_path: str, backend: str = "auto", threads: int = 0) -> InferenceBackend:
+    """Open ``model_path`` with ``backend``; ``"auto"`` picks it from the file extension.
+
+    ``threads > 0`` caps the backend's intra-op CPU threads (0 = its default).
+    """
+    if backend == "auto":
+        backend = backend_for_path(model_path)
+    if backend == "torch":
+        return TorchBackend(model_path, threads=threads)
+    if backend == "onnxruntime":
+        return OnnxRuntimeBackend(model_path, threads=threads)
+    if backend == "openvino":
+        return OpenVinoBackend(model_path, threads=threads)
+    raise ValueError(f"Unknown inference backend {backend!r} (expected auto or one of {', '.join(BACKENDS)})")
@@ -0,0 +1,474 @@
+"""Offline benchmarks for the detection, evaluation, tracking, rendering and RFID hot paths.
+
+Runs on synthetic frames with a stub model in place of ``ultralytics.YOLO``,
+so no camera, weights or GPU are needed. Results are printed as JSON.
+
+    python benchmark.py                      # run and print JSON
+    python benchmark.py --save-baseline      # store results in benchmark_baseline.json
+    python benchmark.py --compare            # compare against the baseline, exit 1 on regressions
+
+``--compare`` lists benchmarks missing from the baseline under ``no_baseline``
+(they are not gated); re-save the baseline after adding a benchmark.
+
+``--backends`` instead times real models (e.g. the .pt weights and their
+ONNX/OpenVINO exports) and reports each one's accuracy drift against the
+first model listed:
+
+    python benchmark.py --backends yolov8m.pt yolov8m_depot_int8.onnx --frames footage/day1.mp4
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import types
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+
+BASELINE_PATH = "benchmark_baseline.json"
+FRAME_W = 960
+FRAME_H = 540
+STUB_NAMES = {0: "person", 2: "car", 5: "bus", 7: "truck"}
+
+
+class _Tensor:
+    """Mimics the ``.cpu().numpy()`` chain of a torch tensor."""
+
+    def __init__(self, array: np.ndarray) -> None:
+        self._array = array
+
+    def cpu(self) -> "_Tensor":
+        return self
+
+    def numpy(self) -> np.ndarray:
+        return self._array
+
+
+class _Boxes:
+    def __init__(self, xyxy: np.ndarray, conf: np.ndarray, cls: np.ndarray) -> None:
+        self.xyxy = _Tensor(xyxy)
+        self.conf = _Tensor(conf)
+        self.cls = _Tensor(cls)
+
+    def __len__(self) -> int:
+        return len(self.conf.numpy())
+
+
+class _Result:
+    def __init__(self, boxes: _Boxes) -> None:
+        self.boxes = boxes
+
+
+class StubYOLO:
+    """Returns a fixed set of random boxes instantly, in the ultralytics result layout."""
+
+    names = STUB_NAMES
+    num_boxes = 100
+
+    def __init__(self, model_path: str = "", *args, **kwargs) -> None:
+        rng = np.random.default_rng(0)
+        n = self.num_boxes
+        xy = rng.uniform(0, [FRAME_W - 120, FRAME_H - 80], size=(n, 2))
+        wh = rng.uniform(30, [120, 80], size=(n, 2))
+        self._boxes = _Boxes(
+            np.hstack([xy, xy + wh]).astype(np.float32),
+            rng.uniform(0.15, 1.0, n).astype(np.float32),
+            rng.choice(list(STUB_NAMES), n).astype(np.float32),
+        )
+
+    def __call__(self, source, **kwargs):
+        count = len(source) if isinstance(source, list) else 1
+        return [_Result(self._boxes) for _ in range(count)]
+
+
+def _stub_detector():
+    from backends import TorchBackend
+    from detector import DepotDetector
+
+    return DepotDetector("stub.pt", 0.15, 640, ("truck", "car"), backend=TorchBackend("stub.pt", model=StubYOLO()))
+
+
+def _measure(fn: Callable[[], object], iterations: int, warmup: int = 3) -> Dict[str, float]:
+    for _ in range(warmup):
+        fn()
+    samples: List[float] = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000.0)
+    samples.sort()
+    return {
+        "iterations": iterations,
+        "mean_ms": statistics.fmean(samples),
+        "p50_ms": samples[len(samples) // 2],
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+    }
+
+
+def _synthetic_frame() -> np.ndarray:
+    rng = np.random.default_rng(1)
+    return rng.integers(0, 255, size=(FRAME_H, FRAME_W, 3), dtype=np.uint8)
+
+
+def _many_zones(count: int) -> dict:
+    zones = {}
+    cols = 8
+    w = FRAME_W // cols
+    h = FRAME_H // max(1, count // cols)
+    for i in range(count):
+        x = (i % cols) * w
+        y = (i // cols) * h
+        zones[f"truck_space_{i + 1}"] = [[x, y], [x + w - 1, y + 5], [x + w - 5, y + h - 1], [x + 3, y + h - 3]]
+    zones["warn_car"] = [0, 0, FRAME_W - 1, FRAME_H - 1]
+    zones["exclude_gate"] = [0, 0, 60, 60]
+    return zones
+
+
+def bench_detector(results: Dict[str, dict], iterations: int) -> None:
+    from detector import Detection, DetectionBatch
+    from zones import DEFAULT_ZONES
+
+    det = _stub_detector()
+    frame = _synthetic_frame()
+    results["detect_postprocess_100_boxes"] = _measure(lambda: det.detect(frame), iterations)
+    results["detect_batch_4_frames"] = _measure(lambda: det.detect_batch([frame] * 4), iterations)
+
+    detections = det.detect(frame)
+    results["evaluate_default_zones"] = _measure(lambda: det.evaluate(detections, DEFAULT_ZONES), iterations)
+
+    rng = np.random.default_rng(2)
+    many = DetectionBatch.from_detections(
+        Detection(
+            label=str(rng.choice(["truck", "car", "person"])),
+            confidence=0.5,
+            bbox=[0, 0, 1, 1],
+            centroid=(int(rng.integers(0, FRAME_W)), int(rng.integers(0, FRAME_H))),
+        )
+        for _ in range(300)
+    )
+    zones = _many_zones(48)
+    results["evaluate_48_polygon_zones_300_dets"] = _measure(lambda: det.evaluate(many, zones), iterations)
+
+
+def bench_zones(results: Dict[str, dict], iterations: int) -> None:
+    from zones import ZoneIndex
+
+    zones = _many_zones(48)
+    results["zone_index_build_48_zones"] = _measure(lambda: ZoneIndex(zones), max(5, iterations // 10))
+
+    index = ZoneIndex(zones)
+    moved = dict(zones)
+    toggle = [False]
+
+    def edit_one() -> None:
+        toggle[0] = not toggle[0]
+        x = 20 if toggle[0] else 0
+        moved["truck_space_5"] = [[p[0] + x, p[1]] for p in zones["truck_space_5"]]
+        index.sync(moved)
+
+    results["zone_index_incremental_edit"] = _measure(edit_one, iterations)
+
+
+def bench_tracking(results: Dict[str, dict], iterations: int) -> None:
+    from detector import Detection, DetectionBatch
+    from tracking import DetectionTracker
+
+    rng = np.random.default_rng(3)
+    base = rng.integers(0, [FRAME_W, FRAME_H], size=(300, 2))
+
+    def frame_detections() -> DetectionBatch:
+        jitter = rng.integers(-5, 6, size=base.shape)
+        points = base + jitter
+        return DetectionBatch.from_detections(
+            Detection(label="truck", confidence=0.9, bbox=[x - 20, y - 20, x + 20, y + 20], centroid=(int(x), int(y)))
+            for x, y in points
+        )
+
+    tracker = DetectionTracker(10)
+    tracker.update(frame_detections(), 0.0)
+    batches = [frame_detections() for _ in range(8)]
+    counter = [0]
+
+    def update() -> None:
+        counter[0] += 1
+        tracker.update(batches[counter[0] % len(batches)], counter[0] * 0.25)
+
+    results["tracker_update_300_tracks"] = _measure(update, max(5, iterations // 5))
+
+
+def bench_rendering(results: Dict[str, dict], iterations: int) -> None:
+    import cv2
+
+    frame = _synthetic_frame()
+    detections = _stub_detector().detect(frame)
+
+    try:
+        from gui_app import DepotMonitorApp, OverlayOptions
+        from overlay import ZoneLayer
+        from zones import DEFAULT_ZONES, ZoneIndex
+    except Exception as exc:  # pragma: no cover - tkinter/PIL missing
+        results["draw_overlays"] = {"skipped": str(exc)}
+    else:
+        view = types.SimpleNamespace(
+            overlay_options=OverlayOptions(),
+            edit_mode=False,
+            temp_box=None,
+            temp_polygon=[],
+            _zone_layer=ZoneLayer(),
+        )
+        state = {"truck_space_1": "occupied", "truck_space_2": "warning", "truck_space_3": "free"}
+        canvas = frame.copy()
+        index = ZoneIndex(DEFAULT_ZONES)
+        results["draw_overlays"] = _measure(
+            lambda: DepotMonitorApp.draw_overlays(view, canvas, detections, index, state, ["car detected"]),
+            iterations,
+        )
+
+    rgb = np.empty_like(frame)
+    results["bgr_to_rgb"] = _measure(lambda: cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=rgb), iterations)
+    try:
+        from PIL import Image, ImageTk
+    except Exception as exc:  # pragma: no cover
+        results["rgb_to_pil"] = {"skipped": str(exc)}
+        return
+    height, width = rgb.shape[:2]
+    results["rgb_to_pil"] = _measure(
+        lambda: Image.frombuffer("RGB", (width, height), rgb, "raw", "RGB", 0, 1), iterations
+    )
+    try:
+        import tkinter as tk
+
+        root = tk.Tk()
+        root.withdraw()
+    except Exception as exc:
+        results["pil_to_photoimage"] = {"skipped": f"no display ({exc.__class__.__name__})"}
+        return
+    try:
+        image = Image.frombuffer("RGB", (width, height), rgb, "raw", "RGB", 0, 1)
+        photo = ImageTk.PhotoImage(image=image)
+        results["pil_to_photoimage"] = _measure(lambda: photo.paste(image), iterations)
+    finally:
+        root.destroy()
+
+
+def bench_rfid(results: Dict[str, dict], iterations: int) -> None:
+    from rfid_log import CSV_HEADERS, RFIDLogWriter, read_rfid_events
+    from rfid_serial_bridge import RFIDSerialBridge
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "rfid_log.csv"
+        rows = ["{},{},{},{}".format(*CSV_HEADERS)]
+        for i in range(100_000):
+            event = "ingress" if i % 2 == 0 else "egress"
+            rows.append(f"2024-01-01T{(i // 3600) % 24:02d}:{(i // 60) % 60:02d}:{i % 60:02d},{event},TAG{i % 500:04X},serial:COM5")
+        path.write_text("\n".join(rows) + "\n", encoding="utf-8")
+        results["read_rfid_events_100k_rows"] = _measure(
+            lambda: read_rfid_events(str(path), limit=250), max(3, iterations // 10), warmup=1
+        )
+
+        writer = RFIDLogWriter(str(Path(tmp) / "writer_log.csv"), fsync="never")
+
+        def burst() -> None:
+            for i in range(1000):
+                writer.write("ingress", f"TAG{i:04X}", "serial:COM5")
+
+        # Cost seen by the serial thread (queueing only), then the batched append itself.
+        results["rfid_writer_queue_x1000"] = _measure(burst, iterations)
+        results["rfid_writer_flush_1000_rows"] = _measure(lambda: (burst(), writer.flush()), iterations)
+        writer.close()
+
+        ring = RFIDLogWriter(str(path))
+        results["rfid_recent_ring_250"] = _measure(lambda: ring.recent(250), iterations)
+
+    lines = [f"{'INGRESS' if i % 2 else 'EGRESS'},{i:08x}" for i in range(1000)] + ["garbage", "RFID_LOGGER_READY"]
+
+    def parse_all() -> None:
+        for line in lines:
+            RFIDSerialBridge._parse_line(line)
+
+    results["parse_line_x1000"] = _measure(parse_all, iterations)
+
+
+def bench_motion(results: Dict[str, dict], iterations: int) -> None:
+    from motion import MotionGate
+    from zones import DEFAULT_ZONES
+
+    gate = MotionGate(4, 0.2, 5.0)
+    gate.set_zones(DEFAULT_ZONES)
+    frame = _synthetic_frame()
+    results["motion_gate_update"] = _measure(lambda: gate.update(frame, time.perf_counter()), iterations)
+
+
+def _box_iou(a: List[int], b: List[int]) -> float:
+    inter_w = max(0, min(a[2], b[2]) - max(a[0], b[0]))
+    inter_h = max(0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = inter_w * inter_h
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _match_ious(reference: list, candidate: list, iou_threshold: float = 0.5) -> List[float]:
+    """Greedy same-label matching of ``candidate`` to ``reference``; IoU of every matched pair."""
+    used: set[int] = set()
+    ious: List[float] = []
+    for ref in sorted(reference, key=lambda det: -det.confidence):
+        best, best_iou = None, iou_threshold
+        for j, cand in enumerate(candidate):
+            if j in used or cand.label != ref.label:
+                continue
+            iou = _box_iou(ref.bbox, cand.bbox)
+            if iou >= best_iou:
+                best, best_iou = j, iou
+        if best is not None:
+            used.add(best)
+            ious.append(best_iou)
+    return ious
+
+
+def bench_backends(
+    model_paths: List[str], frames_source: str | None, iterations: int, every: int = 10, limit: int = 50
+) -> Dict[str, dict]:
+    """Time each model and compare its detections with the first one (the reference)."""
+    import cv2
+
+    from app_config import ALLOWED_LABELS, CONF_THRESHOLD, IMG_SIZE, NMS_IOU_THRESHOLD, ZONES_PATH
+    from detector import DepotDetector
+    from replay import iter_frames
+    from zones import ZoneIndex, load_zones
+
+    if frames_source:
+        frames = [cv2.resize(item.frame, (FRAME_W, FRAME_H)) for item in islice(iter_frames(frames_source, every), limit)]
+    else:
+        # Noise frames still give timings; the drift numbers are only meaningful on real footage.
+        frames = [_synthetic_frame()]
+    zone_index = ZoneIndex(load_zones(ZONES_PATH, FRAME_W, FRAME_H))
+
+    report: Dict[str, dict] = {}
+    reference = None
+    for path in model_paths:
+        try:
+            det = DepotDetector(path, CONF_THRESHOLD, IMG_SIZE, ALLOWED_LABELS, iou_threshold=NMS_IOU_THRESHOLD)
+        except (ImportError, OSError, ValueError) as exc:
+            report[path] = {"skipped": f"{exc.__class__.__name__}: {exc}"}
+            continue
+        outputs = [det.detect(frame) for frame in frames]
+        states = [det.evaluate(dets, zone_index)["truck_zone_state"] for dets in outputs]
+        counter = [0]
+
+        def step() -> None:
+            counter[0] += 1
+            det.detect(frames[counter[0] % len(frames)])
+
+        entry = {"backend": det.backend.name, "frames": len(frames), **_measure(step, iterations)}
+        entry["fps"] = 1000.0 / entry["p50_ms"] if entry["p50_ms"] > 0 else 0.0
+        if reference is None:
+            reference = (outputs, states, entry["p50_ms"])
+            entry["reference"] = True
+        else:
+            ref_outputs, ref_states, ref_p50 = reference
+            ious = [iou for ref, cand in zip(ref_outputs, outputs) for iou in _match_ious(ref, cand)]
+            ref_count = sum(len(dets) for dets in ref_outputs)
+            cand_count = sum(len(dets) for dets in outputs)
+            entry.update(
+                speedup=ref_p50 / entry["p50_ms"] if entry["p50_ms"] > 0 else 0.0,
+                recall=len(ious) / ref_count if ref_count else 1.0,
+                precision=len(ious) / cand_count if cand_count else 1.0,
+                mean_iou=statistics.fmean(ious) if ious else 0.0,
+                bay_state_agreement=sum(a == b for a, b in zip(ref_states, states)) / len(states),
+            )
+        report[path] = entry
+    return report
+
+
+SUITES = {
+    "detector": bench_detector,
+    "zones": bench_zones,
+    "tracking": bench_tracking,
+    "rendering": bench_rendering,
+    "rfid": bench_rfid,
+    "motion": bench_motion,
+}
+
+
+def run(selected: List[str], iterations: int) -> Dict[str, dict]:
+    results: Dict[str, dict] = {}
+    for name in selected:
+        SUITES[name](results, iterations)
+    return results
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> tuple[List[str], List[str]]:
+    """Benchmarks whose p50 got slower than the baseline by more than ``tolerance``, and those with no baseline."""
+    regressions: List[str] = []
+    missing: List[str] = []
+    for name, current in results.items():
+        if "p50_ms" not in current:
+            continue  # skipped (optional dependency missing)
+        previous = baseline.get(name)
+        if not previous or "p50_ms" not in previous:
+            missing.append(name)
+            continue
+        ratio = current["p50_ms"] / previous["p50_ms"] if previous["p50_ms"] > 0 else 1.0
+        current["vs_baseline"] = round(ratio, 3)
+        if ratio > 1.0 + tolerance:
+            regressions.append(name)
+    return regressions, missing
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Depot monitor hot-path benchmarks")
+    parser.add_argument("--suite", action="append", choices=sorted(SUITES), help="run only these suites")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="overwrite the baseline with these results")
+    parser.add_argument("--compare", action="store_true", help="compare p50 against the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before flagging (0.25 = 25%%)")
+    parser.add_argument("--backends", nargs="+", metavar="MODEL", help="compare real models (first = reference)")
+    parser.add_argument("--frames", help="video or image folder used by --backends for accuracy drift")
+    parser.add_argument("--frames-every", type=int, default=10)
+    parser.add_argument("--frames-limit", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    suites = args.suite or ([] if args.backends else list(SUITES))
+    results = run(suites, args.iterations)
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "iterations": args.iterations,
+        "results": results,
+    }
+    if args.backends:
+        report["backends"] = bench_backends(
+            args.backends, args.frames, args.iterations, every=args.frames_every, limit=args.frames_limit
+        )
+
+    exit_code = 0
+    if args.compare:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))["results"]
+        regressions, missing = compare(results, baseline, args.tolerance)
+        report["regressions"] = regressions
+        report["no_baseline"] = missing
+        if missing:
+            print(f"no baseline for {', '.join(missing)}; not compared", file=sys.stderr)
+        exit_code = 1 if regressions else 0
+
+    text = json.dumps(report, indent=2, sort_keys=True)
+    print(text)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    if args.save_baseline:
+        Path(args.baseline).write_text(text + "\n", encoding="utf-8")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,258 @@
+"""Camera configuration and capture helpers (latest-frame grabber thread)."""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List
+
+import cv2
+import numpy as np
+
+from metrics import METRICS
+
+
+@dataclass
+class CameraSpec:
+    name: str
+    index: int
+    zones_path: str
+
+
+def camera_specs(entries: Iterable[Dict[str, Any]]) -> List[CameraSpec]:
+    """Build camera specs from the ``CAMERAS`` config entries."""
+    specs: List[CameraSpec] = []
+    for pos, entry in enumerate(entries):
+        specs.append(
+            CameraSpec(
+                name=str(entry.get("name") or f"cam{pos}"),
+                index=int(entry.get("index", pos)),
+                zones_path=str(entry.get("zones_path") or f"zones_cam{pos}.json"),
+            )
+        )
+    return specs
+
+
+def configure_opencv_logging() -> None:
+    # Avoid noisy backend probing warnings on startup.
+    try:
+        cv2.setLogLevel(cv2.LOG_LEVEL_ERROR)
+        return
+    except Exception:
+        pass
+    try:
+        cv2.utils.logging.setLogLevel(cv2.utils.logging.LOG_LEVEL_ERROR)
+    except Exception:
+        pass
+
+
+def camera_backends() -> List[int]:
+    backends: List[int] = []
+    for name in ("CAP_DSHOW", "CAP_MSMF", "CAP_ANY"):
+        backend = getattr(cv2, name, None)
+        if isinstance(backend, int) and backend not in backends:
+            backends.append(backend)
+    return backends or [0]
+
+
+def probe_cameras(max_index: int = 10, first_only: bool = False, skip: Iterable[int] = ()) -> List[int]:
+    """Indices of working cameras.
+
+    ``skip`` lists indices already known to work (e.g. in use by the pipeline);
+    they are reported without being reopened. ``first_only`` stops at the first hit.
+    """
+    known = set(skip)
+    available: List[int] = []
+    for idx in range(max_index + 1):
+        if idx in known:
+            available.append(idx)
+            continue
+        for backend in camera_backends():
+            cap = cv2.VideoCapture(idx, backend)
+            if not cap.isOpened():
+                cap.release()
+                continue
+            ok, _ = cap.read()
+            cap.release()
+            if ok:
+                available.append(idx)
+                break
+        if first_only and available:
+            break
+    return available
+
+
+def open_camera(index: int, frame_w: int, frame_h: int, backends: Iterable[int] | None = None):
+    """Open camera ``index`` with the first backend that delivers a frame; returns (cap, backend) or None."""
+    for backend in backends or camera_backends():
+        cap = cv2.VideoCapture(index, backend)
+        if not cap.isOpened():
+            cap.release()
+            continue
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, frame_w)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, frame_h)
+        ok, _ = cap.read()
+        if ok:
+            return cap, backend
+        cap.release()
+    return None
+
+
+def load_camera_cache(path: str) -> Dict[str, Dict[str, int]]:
+    """Last-known-good ``{camera name: {"configured", "index", "backend"}}`` entries."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    return {
+        str(name): {key: int(entry[key]) for key in ("configured", "index", "backend")}
+        for name, entry in data.items()
+        if isinstance(entry, dict) and all(isinstance(entry.get(key), int) for key in ("configured", "index", "backend"))
+    }
+
+
+def save_camera_cache(path: str, entries: Dict[str, Dict[str, int]]) -> None:
+    try:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(entries, f, indent=2)
+    except OSError:
+        pass
+
+
+@dataclass
+class CapturedFrame:
+    frame: Any
+    timestamp: float
+    seq: int
+
+
+class LatestFrameReader:
+    """Keeps grabbing from a ``cv2.VideoCapture`` and exposes only the newest frame.
+
+    OpenCV backends buffer several frames; reading at the consumer's pace
+    would hand out stale ones. The grabber thread drains the driver buffer
+    continuously and only the newest frame is kept; anything overwritten
+    before a consumer picked it up is counted as dropped.
+
+    It also tracks stream health for the watchdog: consecutive read
+    failures, gaps between frame timestamps and how long the picture has
+    been bit-identical (a frozen driver keeps returning the same buffer).
+    """
+
+    def __init__(self, cap, gap_seconds: float = 1.0) -> None:
+        self.cap = cap
+        self.gap_seconds = gap_seconds
+        self.grabbed_frames = 0
+        self.delivered_frames = 0
+        self.dropped_frames = 0
+        self.failed_grabs = 0
+        self.timestamp_gaps = 0
+        self.started_ts = time.time()
+
+        self._lock = threading.Lock()
+        self._new_frame = threading.Condition(self._lock)
+        self._frame = None
+        self._seq = 0
+        self._consumed_seq = 0
+        self._timestamp = 0.0
+        self._ok = False
+        self._fail_streak = 0
+        self._signature: int | None = None
+        self._last_change_ts = 0.0
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> "LatestFrameReader":
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="camera-grabber", daemon=True)
+        self._thread.start()
+        return self
+
+    def release(self) -> None:
+        self._stop_event.set()
+        with self._new_frame:
+            self._new_frame.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+        if self.cap is not None and self.cap.isOpened():
+            self.cap.release()
+
+    @property
+    def failing(self) -> bool:
+        return not self._ok
+
+    def health(self, stall_seconds: float, frozen_seconds: float, now: float | None = None) -> str | None:
+        """Why the stream looks dead (``"read failed"``, ``"stalled"``, ``"frozen"``), or None if healthy."""
+        now = time.time() if now is None else now
+        with self._lock:
+            last_frame_ts = self._timestamp or self.started_ts
+            if now - last_frame_ts > stall_seconds:
+                return "read failed" if self._fail_streak else "stalled"
+            if self._last_change_ts and now - self._last_change_ts > frozen_seconds:
+                return "frozen"
+        return None
+
+    def frame_age(self) -> float:
+        """Seconds since the newest grabbed frame arrived (0 if none yet)."""
+        if self._timestamp == 0.0:
+            return 0.0
+        return time.time() - self._timestamp
+
+    def read_latest(self, timeout: float = 0.5) -> CapturedFrame | None:
+        """Block until a frame newer than the last one returned is available."""
+        with self._new_frame:
+            if not self._new_frame.wait_for(
+                lambda: self._seq > self._consumed_seq or self._stop_event.is_set(),
+                timeout=timeout,
+            ):
+                return None
+            if self._stop_event.is_set():
+                return None
+            seq = self._seq
+            self.dropped_frames += seq - self._consumed_seq - 1
+            self._consumed_seq = seq
+            self.delivered_frames += 1
+            return CapturedFrame(frame=self._frame, timestamp=self._timestamp, seq=seq)
+
+    def read(self):
+        """``cv2.VideoCapture.read`` compatible wrapper around ``read_latest``."""
+        captured = self.read_latest()
+        if captured is None:
+            return False, None
+        return True, captured.frame
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            # Only this thread touches the capture object, so read outside the lock.
+            with METRICS.time("cap_read"):
+                ok, frame = self.cap.read()
+            timestamp = time.time()
+            # Sparse sample is enough: live sensors never repeat it bit for bit.
+            signature = zlib.crc32(np.ascontiguousarray(frame[::16, ::16])) if ok and frame is not None else None
+            with self._new_frame:
+                self._ok = ok
+                if signature is not None:
+                    if self._timestamp and timestamp - self._timestamp > self.gap_seconds:
+                        self.timestamp_gaps += 1
+                    if signature != self._signature:
+                        self._signature = signature
+                        self._last_change_ts = timestamp
+                    self._frame = frame
+                    self._seq += 1
+                    self._timestamp = timestamp
+                    self._fail_streak = 0
+                    self.grabbed_frames += 1
+                    self._new_frame.notify_all()
+                else:
+                    self.failed_grabs += 1
+                    self._fail_streak += 1
+            if not ok:
+                time.sleep(0.05)
@@ -0,0 +1,132 @@
+"""Camera health watchdog: detects dead streams and reconnects in the background."""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict
+
+from pipeline import DetectionPipeline
+
+
+@dataclass
+class CameraHealth:
+    connected_since: float | None = None
+    reconnects: int = 0
+    failures: int = 0
+    last_failure: str = ""
+    reconnecting: bool = False
+
+    def uptime(self, now: float | None = None) -> float:
+        if self.connected_since is None:
+            return 0.0
+        return (time.time() if now is None else now) - self.connected_since
+
+
+class CameraWatchdog:
+    """Checks every watched camera's reader and reopens failed ones.
+
+    A camera is considered dead after ``stall_seconds`` without a new frame
+    (read errors or a timestamp gap) or ``frozen_seconds`` of identical
+    frames. Its reader is detached from the pipeline and ``reconnect`` is
+    retried on a per-camera thread with exponential backoff; ``reconnect``
+    opens the device and swaps the new reader in via ``set_capture``, so the
+    UI thread never waits on a device open.
+    """
+
+    def __init__(
+        self,
+        pipeline: DetectionPipeline,
+        reconnect: Callable[[str], bool],
+        stall_seconds: float = 3.0,
+        frozen_seconds: float = 10.0,
+        backoff_min: float = 1.0,
+        backoff_max: float = 30.0,
+        check_interval: float = 0.5,
+    ) -> None:
+        self.pipeline = pipeline
+        self.reconnect = reconnect
+        self.stall_seconds = stall_seconds
+        self.frozen_seconds = frozen_seconds
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+        self.check_interval = check_interval
+        self.health: Dict[str, CameraHealth] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="camera-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+
+    def watch(self, camera_id: str) -> None:
+        """Call whenever a fresh reader was attached for ``camera_id``."""
+        with self._lock:
+            health = self.health.setdefault(camera_id, CameraHealth())
+            health.connected_since = time.time()
+
+    def snapshot(self, camera_id: str) -> Dict[str, object] | None:
+        health = self.health.get(camera_id)
+        if health is None:
+            return None
+        reader = self.pipeline.reader(camera_id)
+        return {
+            "uptime_s": health.uptime(),
+            "reconnects": health.reconnects,
+            "failures": health.failures,
+            "last_failure": health.last_failure,
+            "reconnecting": health.reconnecting,
+            "timestamp_gaps": reader.timestamp_gaps if reader is not None else 0,
+        }
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.check_interval):
+            now = time.time()
+            with self._lock:
+                watched = [(cam, h) for cam, h in self.health.items() if not h.reconnecting]
+            for camera_id, health in watched:
+                reader = self.pipeline.reader(camera_id)
+                reason = "disconnected" if reader is None else reader.health(self.stall_seconds, self.frozen_seconds, now)
+                if reason is None:
+                    continue
+                with self._lock:
+                    health.reconnecting = True
+                    health.failures += 1
+                    health.last_failure = reason
+                    health.connected_since = None
+                threading.Thread(
+                    target=self._reconnect_loop, args=(camera_id, reason), name=f"reconnect-{camera_id}", daemon=True
+                ).start()
+
+    def _reconnect_loop(self, camera_id: str, reason: str) -> None:
+        health = self.health[camera_id]
+        # Release the dead device first; many drivers refuse a second open.
+        self.pipeline.set_capture(camera_id, None)
+        delay = self.backoff_min
+        attempt = 0
+        try:
+            while not self._stop_event.is_set():
+                if self.pipeline.reader(camera_id) is not None:
+                    break  # reconnected by hand in the meantime
+                attempt += 1
+                self.pipeline.status[camera_id] = f"Camera {reason}, reconnecting (attempt {attempt})"
+                if self.reconnect(camera_id):
+                    health.reconnects += 1
+                    break
+                self.pipeline.status[camera_id] = f"Camera {reason}, retrying in {delay:g} s"
+                if self._stop_event.wait(delay):
+                    break
+                delay = min(delay * 2, self.backoff_max)
+        finally:
+            with self._lock:
+                health.reconnecting = False
@@ -0,0 +1,318 @@
+"""RFID tag <-> bay occupancy correlation into per-visit records.
+
+An INGRESS badge is matched to the first bay that turns occupied within
+``window`` seconds after it, and an EGRESS badge to the bay that tag's truck
+left at most ``window`` seconds before. Either side may arrive first (bay
+transitions are debounced, so they are reported a little late), so both
+streams keep time-ordered indexes of their still-unmatched entries and every
+lookup is a ``bisect`` into a window instead of a rescan of the logs.
+
+A visit is finished once the truck left and its badge-out was matched, or
+the window ran out. Anything left unmatched is flagged on the record:
+``no_badge_in`` (truck in a bay nobody badged in for), ``no_badge_out``,
+``no_bay`` (badge-in but no bay got occupied) and ``no_visit`` (badge-out
+with no matching truck). The offline ``correlate`` pass also emits trucks
+still in their bay at the end of the logs, flagged ``open`` with no leave time.
+
+Example (rebuild visits from the existing logs):
+    python correlation.py --rfid rfid_log.csv --transitions zone_transitions.csv --output visits.csv
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import heapq
+import itertools
+import threading
+from bisect import bisect_left, insort
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Generic, Iterable, List, Sequence, TypeVar
+
+from app_config import CORRELATION_WINDOW_SECONDS, RFID_LOG_PATH, VISITS_PATH, ZONE_TRANSITIONS_PATH
+from occupancy import read_transitions
+from rfid_log import read_rfid_events
+
+VISIT_FIELDS = ["tag_id", "camera_id", "zone", "arrive", "leave", "badge_in", "badge_out", "flags"]
+FLAGS = ("no_badge_in", "no_badge_out", "no_bay", "no_visit", "open")
+
+T = TypeVar("T")
+
+
+@dataclass(eq=False)
+class Visit:
+    camera_id: str = ""
+    zone: str = ""
+    arrive: float | None = None
+    leave: float | None = None
+    tag_id: str = ""
+    badge_in: float | None = None
+    badge_out: float | None = None
+    flags: List[str] = field(default_factory=list)
+
+    def as_row(self) -> Dict[str, str]:
+        row = {name: getattr(self, name) for name in VISIT_FIELDS}
+        for name in ("arrive", "leave", "badge_in", "badge_out"):
+            row[name] = _iso(row[name])
+        row["flags"] = " ".join(self.flags)
+        return row
+
+
+class TimeIndex(Generic[T]):
+    """Items ordered by timestamp; range lookups and removals by ``bisect``."""
+
+    def __init__(self) -> None:
+        self._keys: List[tuple[float, int]] = []
+        self._items: Dict[int, T] = {}
+        self._ids = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, ts: float, item: T) -> tuple[float, int]:
+        key = (ts, next(self._ids))
+        insort(self._keys, key)
+        self._items[key[1]] = item
+        return key
+
+    def first_between(self, lo: float, hi: float) -> tuple[float, int] | None:
+        """Key of the earliest item with ``lo <= ts <= hi``."""
+        start = bisect_left(self._keys, (lo, -1))
+        if start < len(self._keys) and self._keys[start][0] <= hi:
+            return self._keys[start]
+        return None
+
+    def pop(self, key: tuple[float, int]) -> T:
+        del self._keys[bisect_left(self._keys, key)]
+        return self._items.pop(key[1])
+
+    def pop_before(self, ts: float) -> List[T]:
+        """Remove and return every item older than ``ts``, oldest first."""
+        stop = bisect_left(self._keys, (ts, -1))
+        expired, self._keys = self._keys[:stop], self._keys[stop:]
+        return [self._items.pop(key[1]) for key in expired]
+
+
+class VisitCorrelator:
+    """Streaming matcher fed with RFID events and debounced bay transitions.
+
+    Thread-safe: the RFID writer and the pipeline's evaluate thread both feed
+    it. Finished visits go to the ``visits`` list and then to ``on_visit``,
+    which is called after the lock is released (it may write to disk).
+    """
+
+    def __init__(
+        self,
+        window_seconds: float = 300.0,
+        on_visit: Callable[[Visit], None] | None = None,
+        keep: int = 1000,
+    ) -> None:
+        self.window = window_seconds
+        self.on_visit = on_visit
+        self.keep = keep
+        self.visits: List[Visit] = []
+        self._lock = threading.Lock()
+        # Unmatched badge-ins, and trucks that arrived with no badge-in yet.
+        self._ingress: TimeIndex[Visit] = TimeIndex()
+        self._untagged: TimeIndex[Visit] = TimeIndex()
+        # Per tag: trucks that left and wait for a badge-out, and badge-outs that wait for a truck.
+        self._left: Dict[str, TimeIndex[Visit]] = {}
+        self._egress: Dict[str, TimeIndex[Visit]] = {}
+        self._open: Dict[tuple[str, str], Visit] = {}
+        # Min-heap of (deadline, kind, tag) so expire() only looks at what is due.
+        self._deadlines: List[tuple[float, int, str, str]] = []
+        self._seq = itertools.count()
+        self._finished: List[Visit] = []  # finished under the lock, not yet passed to on_visit
+
+    def add_rfid(self, event: str, tag_id: str, ts: float) -> None:
+        with self._lock:
+            if event == "ingress":
+                self._badge_in(tag_id, ts)
+            elif event == "egress":
+                self._badge_out(tag_id, ts)
+            finished = self._take_finished()
+        self._notify(finished)
+
+    def add_transition(self, camera_id: str, zone: str, from_state: str, to_state: str, ts: float) -> None:
+        # "warning" wins over "occupied", so a truck may arrive as free -> warning -> occupied;
+        # occupied <-> warning (someone walking next to the truck) is neither an arrival nor a departure.
+        with self._lock:
+            if to_state == "occupied" and (camera_id, zone) not in self._open:
+                self._arrive(camera_id, zone, ts)
+            elif to_state == "free":
+                self._leave(camera_id, zone, ts)
+            finished = self._take_finished()
+        self._notify(finished)
+
+    def _badge_in(self, tag_id: str, ts: float) -> None:
+        key = self._untagged.first_between(ts, ts + self.window)
+        if key is not None:
+            visit = self._untagged.pop(key)
+            visit.tag_id, visit.badge_in = tag_id, ts
+            if visit.leave is not None:
+                self._await_badge_out(visit)
+            return
+        self._ingress.add(ts, Visit(tag_id=tag_id, badge_in=ts))
+        self._schedule(ts, "ingress")
+
+    def _arrive(self, camera_id: str, zone: str, ts: float) -> None:
+        key = self._ingress.first_between(ts - self.window, ts)
+        if key is not None:
+            visit = self._ingress.pop(key)
+            visit.camera_id, visit.zone, visit.arrive = camera_id, zone, ts
+        else:
+            visit = Visit(camera_id=camera_id, zone=zone, arrive=ts)
+            self._untagged.add(ts, visit)
+            self._schedule(ts, "untagged")
+        self._open[(camera_id, zone)] = visit
+
+    def _leave(self, camera_id: str, zone: str, ts: float) -> None:
+        visit = self._open.pop((camera_id, zone), None)
+        if visit is not None:
+            self._leave_visit(visit, ts)
+
+    def _leave_visit(self, visit: Visit, ts: float) -> None:
+        visit.leave = ts
+        if visit.tag_id:
+            self._await_badge_out(visit)
+        elif "no_badge_in" in visit.flags:
+            self._finish(visit)
+        # else: still in _untagged, a late badge-in may claim it until its deadline.
+
+    def _await_badge_out(self, visit: Visit) -> None:
+        pending = self._egress.get(visit.tag_id)
+        key = pending.first_between(visit.leave, visit.leave + self.window) if pending else None
+        if key is not None:
+            visit.badge_out = pending.pop(key).badge_out
+            self._finish(visit)
+            return
+        self._left.setdefault(visit.tag_id, TimeIndex()).add(visit.leave, visit)
+        self._schedule(visit.leave, "left", visit.tag_id)
+
+    def _badge_out(self, tag_id: str, ts: float) -> None:
+        left = self._left.get(tag_id)
+        key = left.first_between(ts - self.window, ts) if left else None
+        if key is not None:
+            visit = left.pop(key)
+            visit.badge_out = ts
+            self._finish(visit)
+            return
+        self._egress.setdefault(tag_id, TimeIndex()).add(ts, Visit(tag_id=tag_id, badge_out=ts))
+        self._schedule(ts, "egress", tag_id)
+
+    def _schedule(self, ts: float, kind: str, tag_id: str = "") -> None:
+        heapq.heappush(self._deadlines, (ts + self.window, next(self._seq), kind, tag_id))
+
+    def expire(self, now: float) -> None:
+        """Flag and finish whatever can no longer be matched; cheap when nothing is due."""
+        with self._lock:
+            while self._deadlines and self._deadlines[0][0] < now:
+                _, _, kind, tag_id = heapq.heappop(self._deadlines)
+                cutoff = now - self.window
+                if kind == "ingress":
+                    for visit in self._ingress.pop_before(cutoff):
+                        self._finish(visit, "no_bay")
+                elif kind == "untagged":
+                    for visit in self._untagged.pop_before(cutoff):
+                        visit.flags.append("no_badge_in")
+                        if visit.leave is not None:
+                            self._finish(visit)
+                elif kind == "left" and tag_id in self._left:
+                    for visit in self._left[tag_id].pop_before(cutoff):
+                        self._finish(visit, "no_badge_out")
+                elif kind == "egress" and tag_id in self._egress:
+                    for visit in self._egress[tag_id].pop_before(cutoff):
+                        self._finish(visit, "no_visit")
+            finished = self._take_finished()
+        self._notify(finished)
+
+    def open_visits(self) -> List[Visit]:
+        with self._lock:
+            return list(self._open.values())
+
+    def _finish(self, visit: Visit, flag: str | None = None) -> None:
+        if flag:
+            visit.flags.append(flag)
+        self.visits.append(visit)
+        del self.visits[: -self.keep]
+        self._finished.append(visit)
+
+    def _take_finished(self) -> List[Visit]:
+        finished, self._finished = self._finished, []
+        return finished
+
+    def _notify(self, finished: List[Visit]) -> None:
+        if self.on_visit is not None:
+            for visit in finished:
+                self.on_visit(visit)
+
+
+class VisitLog:
+    """Append-only CSV of finished visits."""
+
+    def __init__(self, path: str) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def append(self, visit: Visit) -> None:
+        with self._lock:
+            new_file = not self.path.exists() or self.path.stat().st_size == 0
+            with self.path.open("a", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fieldnames=VISIT_FIELDS)
+                if new_file:
+                    writer.writeheader()
+                writer.writerow(visit.as_row())
+
+
+def _iso(ts: float | None) -> str:
+    return datetime.fromtimestamp(ts).isoformat(timespec="seconds") if ts is not None else ""
+
+
+def _epoch(timestamp: str) -> float:
+    return datetime.fromisoformat(timestamp).timestamp()
+
+
+def correlate(
+    rfid_rows: Iterable[Dict[str, str]], transition_rows: Iterable[Dict[str, str]], window_seconds: float
+) -> List[Visit]:
+    """Offline pass over an RFID log and a transition log (rows in any order)."""
+    correlator = VisitCorrelator(window_seconds, keep=10**9)
+    merged = [(_epoch(row["timestamp"]), 0, row) for row in rfid_rows if row.get("timestamp")]
+    merged += [(_epoch(row["timestamp"]), 1, row) for row in transition_rows if row.get("timestamp")]
+    merged.sort(key=lambda item: item[:2])
+    for ts, kind, row in merged:
+        correlator.expire(ts)
+        if kind == 0:
+            correlator.add_rfid(row["event"], row["tag_id"], ts)
+        else:
+            correlator.add_transition(row["camera_id"], row["zone"], row["from_state"], row["to_state"], ts)
+    correlator.expire(float("inf"))
+    still_open = sorted(correlator.open_visits(), key=lambda visit: visit.arrive)
+    for visit in still_open:
+        visit.flags.append("open")
+    return correlator.visits + still_open
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Match RFID badges to bay visits")
+    parser.add_argument("--rfid", default=RFID_LOG_PATH, help="RFID log (.csv or .db)")
+    parser.add_argument("--transitions", default=ZONE_TRANSITIONS_PATH, help="bay transition log (.csv or .db)")
+    parser.add_argument("--window", type=float, default=CORRELATION_WINDOW_SECONDS, help="matching window in seconds")
+    parser.add_argument("--output", default=VISITS_PATH)
+    args = parser.parse_args(argv)
+
+    rfid_rows = list(reversed(read_rfid_events(args.rfid, limit=0)))
+    visits = correlate(rfid_rows, read_transitions(args.transitions), args.window)
+    with Path(args.output).open("w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=VISIT_FIELDS)
+        writer.writeheader()
+        writer.writerows(visit.as_row() for visit in visits)
+    flagged = {flag: sum(flag in visit.flags for visit in visits) for flag in FLAGS}
+    summary = ", ".join(f"{flag}={count}" for flag, count in flagged.items())
+    print(f"{len(visits)} visits written to {args.output} ({summary})")
+
+
+if __name__ == "__main__":
+    main()
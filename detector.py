@@ -1,13 +1,22 @@
-"""YOLO detection and depot-specific event evaluation."""
+"""YOLO detection and depot-specific event evaluation.
+
+Detections of one frame travel as a ``DetectionBatch``: NumPy columns that
+tracking, zone evaluation and overlay drawing use directly. Iterating a batch
+still yields ``Detection`` objects for code that wants one box at a time.
+"""
 
 from __future__ import annotations
 
+import time
+from concurrent.futures import Future
 from dataclasses import dataclass
-from typing import Dict, List, Sequence
+from typing import Dict, Iterable, Iterator, List, Sequence
 
-from ultralytics import YOLO
+import numpy as np
 
-from zones import TRUCK_ZONE_KEYS, point_in_box
+from backends import InferenceBackend, RawBoxes, load_backend
+from metrics import METRICS
+from zones import Box, ZoneIndex, ZoneMap
 
 
 @dataclass
@@ -16,6 +25,86 @@ class Detection:
     confidence: float
     bbox: List[int]
     centroid: tuple[int, int]
+    track_id: int = -1
+
+
+@dataclass
+class DetectionBatch:
+    """Columnar detections: ``xyxy``/``centroids`` int32, ``conf`` float32, ``cls`` int32, ``labels`` str.
+
+    ``track_ids`` (int64) is -1 until the tracker assigns a stable id.
+    """
+
+    xyxy: np.ndarray
+    conf: np.ndarray
+    cls: np.ndarray
+    labels: np.ndarray
+    centroids: np.ndarray
+    track_ids: np.ndarray
+
+    @classmethod
+    def empty(cls) -> "DetectionBatch":
+        return cls(
+            np.zeros((0, 4), dtype=np.int32),
+            np.zeros(0, dtype=np.float32),
+            np.zeros(0, dtype=np.int32),
+            np.zeros(0, dtype=str),
+            np.zeros((0, 2), dtype=np.int32),
+            np.zeros(0, dtype=np.int64),
+        )
+
+    @classmethod
+    def from_detections(cls, detections: Iterable[Detection]) -> "DetectionBatch":
+        detections = list(detections)
+        if not detections:
+            return cls.empty()
+        return cls(
+            np.array([det.bbox for det in detections], dtype=np.int32).reshape(-1, 4),
+            np.array([det.confidence for det in detections], dtype=np.float32),
+            np.full(len(detections), -1, dtype=np.int32),
+            np.array([det.label for det in detections]),
+            np.array([det.centroid for det in detections], dtype=np.int32).reshape(-1, 2),
+            np.array([det.track_id for det in detections], dtype=np.int64),
+        )
+
+    def __len__(self) -> int:
+        return len(self.conf)
+
+    def __iter__(self) -> Iterator[Detection]:
+        rows = zip(
+            self.labels.tolist(),
+            self.conf.tolist(),
+            self.xyxy.tolist(),
+            self.centroids.tolist(),
+            self.track_ids.tolist(),
+        )
+        for label, conf, bbox, (cx, cy), track_id in rows:
+            yield Detection(label=label, confidence=conf, bbox=bbox, centroid=(cx, cy), track_id=track_id)
+
+    def __getitem__(self, index: int) -> Detection:
+        x1, y1, x2, y2 = self.xyxy[index].tolist()
+        cx, cy = self.centroids[index].tolist()
+        return Detection(
+            str(self.labels[index]), float(self.conf[index]), [x1, y1, x2, y2], (cx, cy), int(self.track_ids[index])
+        )
+
+    def _columns(self) -> tuple[np.ndarray, ...]:
+        return self.xyxy, self.conf, self.cls, self.labels, self.centroids, self.track_ids
+
+    def take(self, rows: np.ndarray) -> "DetectionBatch":
+        """New batch with the given rows (index array or boolean mask); the columns are copies."""
+        return DetectionBatch(*(column[rows] for column in self._columns()))
+
+    @staticmethod
+    def concat(first: "DetectionBatch", second: "DetectionBatch") -> "DetectionBatch":
+        return DetectionBatch(*(np.concatenate(pair) for pair in zip(first._columns(), second._columns())))
+
+
+def as_batch(detections: DetectionBatch | Iterable[Detection]) -> DetectionBatch:
+    """Accept either form; ``Detection`` lists from older callers are converted."""
+    if isinstance(detections, DetectionBatch):
+        return detections
+    return DetectionBatch.from_detections(detections)
 
 
 class DepotDetector:
@@ -25,76 +114,221 @@ class DepotDetector:
         conf_threshold: float,
         img_size: int,
         allowed_labels: Sequence[str] | None = None,
+        backend: str | InferenceBackend = "auto",
+        iou_threshold: float = 0.7,
+        lazy: bool = False,
+        workers: int = 0,
+        worker_threads: int = 0,
     ) -> None:
-        self.model = YOLO(model_path)
+        """``backend`` is ``"auto"`` (by file extension), a name from ``backends.BACKENDS`` or an instance.
+
+        With ``lazy=True`` nothing is loaded until ``load()`` is called (e.g. from
+        a background thread); ``evaluate()`` works either way. ``workers > 0``
+        runs the model in that many processes (``inference_pool.InferencePool``),
+        each capped at ``worker_threads`` CPU threads.
+        """
+        self.model_path = model_path
+        self.backend_name = backend if isinstance(backend, str) else backend.name
         self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
         self.img_size = img_size
         self.allowed_labels = {label.lower() for label in (allowed_labels or [])}
+        self.workers = workers
+        self.worker_threads = worker_threads
+        self.backend: InferenceBackend | None = None
+        self.names: Dict[int, str] = {}
+        self.classes: List[int] | None = None
+        # Class id -> label and -> "allowed", so parsing a result is two array lookups.
+        self._label_table = np.zeros(0, dtype=str)
+        self._allowed_table: np.ndarray | None = None
+        self._zone_index: ZoneIndex | None = None
+        if isinstance(backend, InferenceBackend):
+            self._use_backend(backend)
+        elif not lazy:
+            self.load()
+
+    @property
+    def ready(self) -> bool:
+        return self.backend is not None
+
+    def load(self, warmup_frame_size: tuple[int, int] | None = None) -> None:
+        """Open the model (imports torch/onnxruntime/openvino on first use).
+
+        With ``warmup_frame_size`` one throwaway inference runs before the
+        detector reports ``ready``, so the first real cycle isn't slowed by
+        lazy initialisation inside the backend.
+        """
+        if self.backend is not None:
+            return
+        if self.workers > 0:
+            from inference_pool import InferencePool
 
-    def detect(self, frame) -> List[Detection]:
-        result = self.model(frame, imgsz=self.img_size, conf=self.conf_threshold, verbose=False)[0]
-        boxes = result.boxes
-        detections: List[Detection] = []
-        if boxes is None or len(boxes) == 0:
-            return detections
-
-        xyxy_arr = boxes.xyxy.cpu().numpy()
-        conf_arr = boxes.conf.cpu().numpy()
-        cls_arr = boxes.cls.cpu().numpy().astype(int)
-
-        for xyxy, conf, cls_idx in zip(xyxy_arr, conf_arr, cls_arr):
-            x1, y1, x2, y2 = [int(v) for v in xyxy]
-            cx = int((x1 + x2) / 2)
-            cy = int((y1 + y2) / 2)
-            label = str(self.model.names.get(cls_idx, cls_idx)).lower()
-            if self.allowed_labels and label not in self.allowed_labels:
-                continue
-            detections.append(
-                Detection(
-                    label=label,
-                    confidence=float(conf),
-                    bbox=[x1, y1, x2, y2],
-                    centroid=(cx, cy),
+            # Each worker warms itself up; frames are copied into slots sized for warmup_frame_size.
+            self._use_backend(
+                InferencePool(
+                    self.model_path,
+                    self.backend_name,
+                    workers=self.workers,
+                    threads=self.worker_threads,
+                    frame_size=warmup_frame_size,
+                    warmup_img_size=self.img_size if warmup_frame_size is not None else None,
                 )
             )
-        return detections
+            return
+        backend = load_backend(self.model_path, self.backend_name)
+        if warmup_frame_size is not None:
+            w, h = warmup_frame_size
+            backend.predict([np.zeros((h, w, 3), dtype=np.uint8)], self.img_size, self.conf_threshold, self.iou_threshold)
+        self._use_backend(backend)
 
-    def evaluate(self, detections: List[Detection], zones: Dict[str, List[int]]) -> Dict[str, object]:
-        truck_occupancy: Dict[str, bool] = {}
-        zone_has_warning_object: Dict[str, bool] = {}
-        for key in TRUCK_ZONE_KEYS:
-            box = zones[key]
-            occupied = any(
-                det.label == "truck" and point_in_box(det.centroid[0], det.centroid[1], box)
-                for det in detections
-            )
-            warning_in_zone = any(
-                det.label != "truck" and point_in_box(det.centroid[0], det.centroid[1], box)
-                for det in detections
+    def _use_backend(self, backend: InferenceBackend) -> None:
+        self.names = {int(k): str(v).lower() for k, v in backend.names.items()}
+        # Unwanted classes are dropped before NMS instead of after parsing.
+        self.classes = (
+            [cls_idx for cls_idx, label in self.names.items() if label in self.allowed_labels]
+            if self.allowed_labels
+            else None
+        )
+        size = max(self.names, default=-1) + 1
+        self._label_table = np.array([self.names.get(i, str(i)) for i in range(size)], dtype=str)
+        if self.allowed_labels:
+            self._allowed_table = np.zeros(size, dtype=bool)
+            self._allowed_table[self.classes] = True
+        # Assigned last: ``ready`` flips only once names/classes are in place.
+        self.backend = backend
+
+    @property
+    def max_in_flight(self) -> int:
+        """How many ``submit_batch`` calls are worth keeping outstanding."""
+        return self.backend.max_in_flight if self.backend is not None else 1
+
+    def close(self) -> None:
+        if self.backend is not None:
+            self.backend.close()
+
+    @staticmethod
+    def _crop(frame, roi: Box | None):
+        """Crop ``frame`` to an inclusive ``[x1, y1, x2, y2]`` ROI; returns (crop, offset)."""
+        if roi is None:
+            return frame, (0, 0)
+        x1, y1, x2, y2 = roi
+        return frame[y1 : y2 + 1, x1 : x2 + 1], (x1, y1)
+
+    def detect(self, frame, roi: Box | None = None) -> DetectionBatch:
+        """Detect objects, optionally only inside ``roi``.
+
+        The crop is letterboxed to ``img_size`` by the model, so objects in the
+        zone area get more effective pixels; boxes are mapped back to frame
+        coordinates.
+        """
+        return self.detect_batch([frame], [roi])[0]
+
+    def detect_batch(self, frames: Sequence, rois: Sequence[Box | None] | None = None) -> List[DetectionBatch]:
+        """Run one batched inference call over several frames (e.g. one per camera)."""
+        if not frames:
+            return []
+        crops = [self._crop(frame, roi) for frame, roi in zip(frames, rois or [None] * len(frames))]
+        with METRICS.time("model"):
+            results = self.backend.predict(
+                [crop for crop, _ in crops], self.img_size, self.conf_threshold, self.iou_threshold, self.classes
             )
-            truck_occupancy[key] = occupied
-            zone_has_warning_object[key] = warning_in_zone
+        return [self._parse_result(result, offset) for result, (_, offset) in zip(results, crops)]
+
+    def submit_batch(self, frames: Sequence, rois: Sequence[Box | None] | None = None) -> Future:
+        """``detect_batch`` that returns a ``Future`` of the ``DetectionBatch`` list.
+
+        In-process backends finish before this returns; a worker pool keeps
+        running while the caller submits the next batch.
+        """
+        crops = [self._crop(frame, roi) for frame, roi in zip(frames, rois or [None] * len(frames))]
+        started = time.perf_counter()
+        raw = self.backend.submit(
+            [crop for crop, _ in crops], self.img_size, self.conf_threshold, self.iou_threshold, self.classes
+        )
+        parsed: Future = Future()
+
+        def parse(done: Future) -> None:
+            METRICS.record("model", (time.perf_counter() - started) * 1000.0)
+            try:
+                results = done.result()
+                parsed.set_result([self._parse_result(result, offset) for result, (_, offset) in zip(results, crops)])
+            except Exception as exc:
+                parsed.set_exception(exc)
+
+        raw.add_done_callback(parse)
+        return parsed
+
+    def _parse_result(self, boxes: RawBoxes, offset: tuple[int, int] = (0, 0)) -> DetectionBatch:
+        if len(boxes) == 0:
+            return DetectionBatch.empty()
+
+        xyxy = boxes.xyxy.astype(np.int32)  # truncates toward zero, like int()
+        if offset != (0, 0):
+            xyxy += np.array([offset[0], offset[1], offset[0], offset[1]], dtype=np.int32)
+        cls = boxes.cls.astype(np.int32)
+        known = cls < self._label_table.size
+        table_ids = np.where(known, cls, 0)
+        keep = known if self._allowed_table is None else known & self._allowed_table[table_ids]
+        if not keep.all():
+            xyxy, cls, table_ids, known = xyxy[keep], cls[keep], table_ids[keep], known[keep]
+        labels = self._label_table[table_ids]
+        if not known.all():  # ids the model has no name for (only kept without ALLOWED_LABELS)
+            labels = np.where(known, labels, cls.astype(str))
+        centroids = ((xyxy[:, :2] + xyxy[:, 2:]) / 2).astype(np.int32)
+        track_ids = np.full(len(cls), -1, dtype=np.int64)
+        return DetectionBatch(xyxy, boxes.conf[keep].astype(np.float32), cls, labels, centroids, track_ids)
+
+    def zone_index(self, zones: ZoneMap) -> ZoneIndex:
+        """Label-mask form of ``zones``; only zones that changed are re-rasterized."""
+        if self._zone_index is None:
+            self._zone_index = ZoneIndex(zones)
+        else:
+            self._zone_index = self._zone_index.sync(zones)
+        return self._zone_index
+
+    def evaluate(
+        self, detections: DetectionBatch | Sequence[Detection], zones: ZoneMap | ZoneIndex
+    ) -> Dict[str, object]:
+        index = zones if isinstance(zones, ZoneIndex) else self.zone_index(zones)
+        truck_keys = index.truck_keys
+        n_bays = len(truck_keys)
+        detections = as_batch(detections)
 
         warning_messages: List[str] = []
-        for det in detections:
-            x, y = det.centroid
-            if det.label == "truck":
-                continue
-            if det.label == "car" and point_in_box(x, y, zones["warn_car"]):
-                warning_messages.append("car detected")
-
-        unique_warnings = list(dict.fromkeys(warning_messages))
+        if len(detections):
+            labels = detections.labels
+            inside = index.contains(detections.centroids)
+            if index.exclusion_cols.size:
+                inside &= ~inside[:, index.exclusion_cols].any(axis=1, keepdims=True)
+
+            is_truck = (labels == "truck")[:, None]
+            in_bays = inside[:, index.truck_cols]
+            occupied = (in_bays & is_truck).any(axis=0)
+            warned = (in_bays & ~is_truck).any(axis=0)
+
+            if index.warning_labels:
+                label_match = labels[:, None] == np.array(index.warning_labels)[None, :]
+                hits = inside[:, index.warning_cols] & label_match & ~is_truck
+                # np.nonzero walks row-major, so messages keep detection order.
+                for col in np.nonzero(hits)[1]:
+                    warning_messages.append(f"{index.warning_labels[col]} detected")
+        else:
+            occupied = np.zeros(n_bays, dtype=bool)
+            warned = np.zeros(n_bays, dtype=bool)
+
+        truck_occupancy: Dict[str, bool] = {}
         zone_state: Dict[str, str] = {}
-        for key in TRUCK_ZONE_KEYS:
-            if zone_has_warning_object[key]:
+        for key, is_occupied, has_warning in zip(truck_keys, occupied.tolist(), warned.tolist()):
+            truck_occupancy[key] = is_occupied
+            if has_warning:
                 zone_state[key] = "warning"
-            elif truck_occupancy[key]:
+            elif is_occupied:
                 zone_state[key] = "occupied"
             else:
                 zone_state[key] = "free"
 
         return {
             "truck_occupancy": truck_occupancy,
-            "warnings": unique_warnings,
+            "warnings": list(dict.fromkeys(warning_messages)),
             "truck_zone_state": zone_state,
         }
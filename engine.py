@@ -0,0 +1,416 @@
+"""Headless depot monitoring engine (cameras, detection pipeline, zones, RFID).
+
+Nothing in here imports Tkinter or PIL, so the engine can run on a server
+without a display. The GUI is a thin consumer of the same engine.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List
+
+from app_config import (
+    ALLOWED_LABELS,
+    CAMERA_CACHE_PATH,
+    CAMERA_FROZEN_SECONDS,
+    CAMERA_RECONNECT_MAX_SECONDS,
+    CAMERA_RECONNECT_MIN_SECONDS,
+    CAMERA_STALL_SECONDS,
+    CAMERA_WATCHDOG,
+    CAMERAS,
+    CORRELATION_WINDOW_SECONDS,
+    CONF_THRESHOLD,
+    DETECTION_TTL_FRAMES,
+    FRAME_HEIGHT,
+    FRAME_WIDTH,
+    IMG_SIZE,
+    INFERENCE_BACKEND,
+    INFERENCE_WORKER_THREADS,
+    INFERENCE_WORKERS,
+    METRICS_DUMP_SECONDS,
+    METRICS_ENABLED,
+    METRICS_PATH,
+    MODEL_PATH,
+    MOTION_GATING,
+    MOTION_IDLE_DPS,
+    MOTION_IDLE_SECONDS,
+    MOTION_MAX_DPS,
+    MOTION_THRESHOLD,
+    NMS_IOU_THRESHOLD,
+    PIPELINE_QUEUE_SIZE,
+    RECORD_ZONE_TRANSITIONS,
+    RFID_FLUSH_ROWS,
+    RFID_FLUSH_SECONDS,
+    RFID_FSYNC,
+    RFID_LOG_PATH,
+    RFID_ROTATE_BACKUPS,
+    RFID_ROTATE_DAILY,
+    RFID_ROTATE_MAX_BYTES,
+    RFID_SERIAL_AUTOSTART,
+    RFID_SERIAL_BAUDRATE,
+    RFID_SERIAL_PORT,
+    ROI_ENABLED,
+    ROI_MARGIN,
+    TARGET_DPS,
+    TRACK_MATCH_RADIUS,
+    TRACK_MIN_IOU,
+    TRACK_PREDICT_SECONDS,
+    VISITS_PATH,
+    ZONE_DEBOUNCE_FRAMES,
+    ZONE_DEBOUNCE_SECONDS,
+    ZONE_TRANSITIONS_PATH,
+)
+from camera import (
+    LatestFrameReader,
+    camera_specs,
+    configure_opencv_logging,
+    load_camera_cache,
+    open_camera,
+    probe_cameras,
+    save_camera_cache,
+)
+from camera_watchdog import CameraWatchdog
+from correlation import Visit, VisitCorrelator, VisitLog
+from detector import DepotDetector
+from event_store import close_stores
+from metrics import METRICS
+from motion import MotionGate
+from occupancy import OccupancyTracker, ZoneTransition, transition_sink
+from pipeline import DetectionPipeline, FramePacket
+from rfid_log import RFIDLogWriter
+from rfid_serial_bridge import RFIDBridgeEvent, RFIDSerialBridge
+from tracking import DetectionTracker
+from zones import DEFAULT_ZONES, Zone, ZoneMap, load_zones, save_zones
+
+
+def _make_motion_gate() -> MotionGate:
+    return MotionGate(MOTION_MAX_DPS, MOTION_IDLE_DPS, MOTION_IDLE_SECONDS, threshold=MOTION_THRESHOLD)
+
+
+def _make_tracker() -> DetectionTracker:
+    return DetectionTracker(
+        DETECTION_TTL_FRAMES, TRACK_MATCH_RADIUS, TRACK_MIN_IOU, predict_seconds=TRACK_PREDICT_SECONDS
+    )
+
+
+class DepotEngine:
+    """Owns all runtime state: cameras, detector, pipeline, zone maps and the RFID bridge."""
+
+    def __init__(self, renderer: Callable[[FramePacket], Any] | None = None) -> None:
+        configure_opencv_logging()
+
+        self.detector = DepotDetector(
+            MODEL_PATH,
+            CONF_THRESHOLD,
+            IMG_SIZE,
+            ALLOWED_LABELS,
+            backend=INFERENCE_BACKEND,
+            iou_threshold=NMS_IOU_THRESHOLD,
+            lazy=True,
+            workers=INFERENCE_WORKERS,
+            worker_threads=INFERENCE_WORKER_THREADS,
+        )
+        self.model_status = "Model not loaded"
+        self.camera_specs = {spec.name: spec for spec in camera_specs(CAMERAS)}
+        self.zones_by_camera: Dict[str, ZoneMap] = {
+            name: load_zones(spec.zones_path, FRAME_WIDTH, FRAME_HEIGHT) for name, spec in self.camera_specs.items()
+        }
+        self.camera_device_index: Dict[str, int] = {name: spec.index for name, spec in self.camera_specs.items()}
+        self.camera_status: Dict[str, str] = {name: "Not connected" for name in self.camera_specs}
+        self.available_camera_indices: List[int] = []
+        # Serializes device opens/probes; the cache lets the next start skip probing.
+        self._camera_lock = threading.Lock()
+        self._camera_cache = load_camera_cache(CAMERA_CACHE_PATH)
+        self._record_transitions = transition_sink(ZONE_TRANSITIONS_PATH) if RECORD_ZONE_TRANSITIONS else None
+        # Recent transitions for drain_zone_transitions(); bounded since the GUI doesn't drain it.
+        self._zone_transitions: Deque[ZoneTransition] = deque(maxlen=500)
+        self._visit_log = VisitLog(VISITS_PATH)
+        self.correlator = VisitCorrelator(CORRELATION_WINDOW_SECONDS, on_visit=self._on_visit)
+        self.occupancy = OccupancyTracker(
+            ZONE_DEBOUNCE_FRAMES, ZONE_DEBOUNCE_SECONDS, on_transitions=self._on_zone_transitions
+        )
+        self.pipeline = DetectionPipeline(
+            self.detector,
+            self.zones_by_camera,
+            frame_size=(FRAME_WIDTH, FRAME_HEIGHT),
+            target_dps=TARGET_DPS,
+            ttl_frames=DETECTION_TTL_FRAMES,
+            renderer=renderer,
+            queue_size=PIPELINE_QUEUE_SIZE,
+            roi_margin=ROI_MARGIN if ROI_ENABLED else None,
+            motion_gate=_make_motion_gate if MOTION_GATING else None,
+            tracker=_make_tracker,
+            on_evaluated=self._on_evaluated,
+        )
+        self.watchdog: CameraWatchdog | None = None
+        if CAMERA_WATCHDOG:
+            self.watchdog = CameraWatchdog(
+                self.pipeline,
+                self._reconnect_camera,
+                stall_seconds=CAMERA_STALL_SECONDS,
+                frozen_seconds=CAMERA_FROZEN_SECONDS,
+                backoff_min=CAMERA_RECONNECT_MIN_SECONDS,
+                backoff_max=CAMERA_RECONNECT_MAX_SECONDS,
+            )
+        self.rfid_writer = RFIDLogWriter(
+            RFID_LOG_PATH,
+            flush_rows=RFID_FLUSH_ROWS,
+            flush_seconds=RFID_FLUSH_SECONDS,
+            fsync=RFID_FSYNC,
+            max_bytes=RFID_ROTATE_MAX_BYTES,
+            rotate_daily=RFID_ROTATE_DAILY,
+            backups=RFID_ROTATE_BACKUPS,
+            on_record=self._on_rfid_record,
+        )
+        self.rfid_bridge: RFIDSerialBridge | None = None
+        self._running = False
+
+    @property
+    def camera_ids(self) -> List[str]:
+        return list(self.camera_specs)
+
+    def start(self) -> None:
+        self.rfid_writer.start()
+        self.pipeline.start()
+        if self.watchdog is not None:
+            self.watchdog.start()
+        self._running = True
+
+    def stop(self) -> None:
+        self._running = False
+        if self.watchdog is not None:
+            self.watchdog.stop()
+        if self.rfid_bridge is not None:
+            self.rfid_bridge.stop()
+        self.rfid_writer.close()
+        self.pipeline.stop()
+        self.detector.close()
+        close_stores()
+
+    def load_model_async(self) -> threading.Thread:
+        """Load and warm up the model in the background; progress is in ``model_status``."""
+        thread = threading.Thread(target=self._load_model, name="model-loader", daemon=True)
+        thread.start()
+        return thread
+
+    def _load_model(self) -> None:
+        started = time.perf_counter()
+        self.model_status = f"Loading model {MODEL_PATH}..."
+        try:
+            self.detector.load(warmup_frame_size=(FRAME_WIDTH, FRAME_HEIGHT))
+        except Exception as exc:
+            self.model_status = f"Model failed to load: {exc}"
+            return
+        self.model_status = f"Model ready ({self.detector.backend.name}, {time.perf_counter() - started:.1f} s)"
+
+    def refresh_cameras(self, first_only: bool = False) -> List[int]:
+        """Probe device indices; cameras already streaming are listed without being reopened."""
+        in_use = [self.camera_device_index[c] for c in self.camera_ids if self.pipeline.reader(c) is not None]
+        with self._camera_lock:
+            found = probe_cameras(first_only=first_only, skip=in_use)
+        if not first_only:
+            self.available_camera_indices = found
+        return found
+
+    def connect_camera(self, camera_id: str, index: int, backends: List[int] | None = None) -> bool:
+        with self._camera_lock:
+            opened = open_camera(index, FRAME_WIDTH, FRAME_HEIGHT, backends)
+        if opened is None:
+            return False
+        cap, backend = opened
+        self.pipeline.set_capture(camera_id, LatestFrameReader(cap).start())
+        self.camera_device_index[camera_id] = index
+        self.camera_status[camera_id] = f"using camera {index}"
+        self._remember_camera(camera_id, index, backend)
+        if self.watchdog is not None:
+            self.watchdog.watch(camera_id)
+        return True
+
+    def _reconnect_camera(self, camera_id: str) -> bool:
+        """Watchdog callback: reopen the camera's current index, cached backend first."""
+        index = self.camera_device_index[camera_id]
+        cached = self._camera_cache.get(camera_id)
+        if cached is not None and cached["index"] == index:
+            if self.connect_camera(camera_id, index, [cached["backend"]]):
+                return True
+        return self.connect_camera(camera_id, index)
+
+    def camera_health(self, camera_id: str) -> Dict[str, object] | None:
+        """Uptime/reconnect counters for ``camera_id`` (None without a watchdog)."""
+        if self.watchdog is None:
+            return None
+        return self.watchdog.snapshot(camera_id)
+
+    def _remember_camera(self, camera_id: str, index: int, backend: int) -> None:
+        entry = {"configured": self.camera_specs[camera_id].index, "index": index, "backend": backend}
+        with self._camera_lock:
+            if self._camera_cache.get(camera_id) != entry:
+                self._camera_cache[camera_id] = entry
+                save_camera_cache(CAMERA_CACHE_PATH, self._camera_cache)
+
+    def connect_configured_cameras(self) -> Dict[str, bool]:
+        """Open every configured camera, trying the cached last-good index/backend first.
+
+        Probing only happens when that fails, and a lone camera stops at the
+        first working index it finds.
+        """
+        connected: Dict[str, bool] = {}
+        for camera_id, spec in self.camera_specs.items():
+            self.camera_status[camera_id] = "Connecting..."
+            cached = self._camera_cache.get(camera_id)
+            ok = False
+            if cached is not None and cached["configured"] == spec.index:
+                ok = self.connect_camera(camera_id, cached["index"], [cached["backend"]])
+            if not ok:
+                ok = self.connect_camera(camera_id, spec.index)
+            if not ok and len(self.camera_specs) == 1:
+                self.camera_status[camera_id] = "Searching for a camera..."
+                found = self.refresh_cameras(first_only=True)
+                ok = bool(found) and self.connect_camera(camera_id, found[0])
+            if not ok:
+                self.camera_status[camera_id] = f"failed to open camera {spec.index}"
+            connected[camera_id] = ok
+        return connected
+
+    def set_zone(self, camera_id: str, key: str, zone: Zone) -> None:
+        self.zones_by_camera[camera_id][key] = zone
+        self.pipeline.set_zones(camera_id, self.zones_by_camera[camera_id])
+
+    def save_zones(self, camera_id: str) -> str:
+        zones_path = self.camera_specs[camera_id].zones_path
+        save_zones(zones_path, self.zones_by_camera[camera_id])
+        return zones_path
+
+    def reset_zones(self, camera_id: str) -> None:
+        self.zones_by_camera[camera_id] = dict(DEFAULT_ZONES)
+        self.pipeline.set_zones(camera_id, self.zones_by_camera[camera_id])
+        save_zones(self.camera_specs[camera_id].zones_path, self.zones_by_camera[camera_id])
+
+    def latest(self, camera_id: str) -> FramePacket | None:
+        return self.pipeline.latest(camera_id)
+
+    def start_rfid_bridge(self) -> str:
+        if not RFID_SERIAL_AUTOSTART:
+            return "disabled"
+        self.rfid_bridge = RFIDSerialBridge(
+            csv_path=RFID_LOG_PATH,
+            port=RFID_SERIAL_PORT,
+            baudrate=RFID_SERIAL_BAUDRATE,
+            auto_scan=(RFID_SERIAL_PORT.strip() == ""),
+            writer=self.rfid_writer,
+        )
+        self.rfid_bridge.start()
+        return "starting"
+
+    def drain_rfid_events(self) -> List[RFIDBridgeEvent]:
+        if self.rfid_bridge is None:
+            return []
+        return self.rfid_bridge.drain_events()
+
+    def _on_evaluated(self, packet: FramePacket) -> None:
+        self.occupancy.observe(packet)
+        self.correlator.expire(packet.capture_ts)
+
+    def _on_rfid_record(self, record: Dict[str, str]) -> None:
+        ts = datetime.fromisoformat(record["timestamp"]).timestamp()
+        self.correlator.add_rfid(record["event"], record["tag_id"], ts)
+
+    def _on_visit(self, visit: Visit) -> None:
+        try:
+            self._visit_log.append(visit)
+        except OSError as exc:
+            print(f"visit not recorded: {exc}")
+
+    def _on_zone_transitions(self, transitions: List[ZoneTransition]) -> None:
+        self._zone_transitions.extend(transitions)
+        for t in transitions:
+            self.correlator.add_transition(t.camera_id, t.zone, t.from_state, t.to_state, t.timestamp)
+        if self._record_transitions is None:
+            return
+        try:
+            self._record_transitions(transitions)
+        except (OSError, sqlite3.Error) as exc:
+            print(f"zone transitions not recorded: {exc}")
+
+    def drain_zone_transitions(self) -> List[ZoneTransition]:
+        transitions: List[ZoneTransition] = []
+        while self._zone_transitions:
+            transitions.append(self._zone_transitions.popleft())
+        return transitions
+
+    def zone_dwell(self, camera_id: str) -> Dict[str, tuple[str, float]]:
+        """Debounced state of each bay and the seconds it has been in that state."""
+        return self.occupancy.current(camera_id, time.time())
+
+    def track_dwell(self, camera_id: str) -> Dict[int, float]:
+        """Seconds each truck/car currently tracked on the camera has been in view, by track id."""
+        return self.pipeline.track_dwell(camera_id, time.time())
+
+    def recent_visits(self, limit: int = 50) -> List[Visit]:
+        """Newest-first finished visits (tag, bay, arrive/leave, mismatch flags)."""
+        return self.correlator.visits[-limit:][::-1]
+
+    def log_rfid_event(self, event: str, tag_id: str, notes: str = "") -> Dict[str, str]:
+        return self.rfid_writer.write(event, tag_id, notes)
+
+    def recent_rfid_events(self, limit: int = 250, offset: int = 0) -> List[Dict[str, str]]:
+        """Newest-first RFID events (skipping the ``offset`` newest), from the in-memory ring when possible."""
+        return self.rfid_writer.recent(limit, offset)
+
+    def run_headless(self, poll_interval: float = 0.25) -> None:
+        """Blocking loop for display-less boxes: prints zone state changes and RFID events.
+
+        Latency/rate metrics are written to METRICS_PATH every METRICS_DUMP_SECONDS.
+        """
+        last_state: Dict[str, tuple] = {}
+        last_model_status = ""
+        last_camera_status: Dict[str, str] = {}
+        last_log_error: str | None = None
+        last_dump = time.perf_counter()
+        try:
+            while self._running:
+                if self.model_status != last_model_status:
+                    last_model_status = self.model_status
+                    print(f"{_now()} [model] {last_model_status}", flush=True)
+                if METRICS_ENABLED and METRICS_PATH and time.perf_counter() - last_dump >= METRICS_DUMP_SECONDS:
+                    METRICS.dump(METRICS_PATH)
+                    last_dump = time.perf_counter()
+                for camera_id in self.camera_ids:
+                    status = self.pipeline.status[camera_id]
+                    if last_camera_status.get(camera_id) != status:
+                        last_camera_status[camera_id] = status
+                        print(f"{_now()} [{camera_id}] {status}", flush=True)
+                    packet = self.latest(camera_id)
+                    if packet is None or not packet.eval_data:
+                        continue
+                    state = (
+                        tuple(sorted(packet.eval_data["truck_zone_state"].items())),
+                        tuple(packet.eval_data["warnings"]),
+                    )
+                    if last_state.get(camera_id) != state:
+                        last_state[camera_id] = state
+                        zones_text = " ".join(f"{k}={v}" for k, v in state[0])
+                        warnings_text = ", ".join(state[1]) or "no warnings"
+                        print(f"{_now()} [{camera_id}] {zones_text} | {warnings_text}", flush=True)
+                for transition in self.drain_zone_transitions():
+                    print(
+                        f"{_now()} [{transition.camera_id}] {transition.zone} {transition.from_state} -> "
+                        f"{transition.to_state} (after {transition.dwell_seconds:.0f}s)",
+                        flush=True,
+                    )
+                for event in self.drain_rfid_events():
+                    print(f"{_now()} [rfid] {event.message}", flush=True)
+                if self.rfid_writer.error != last_log_error:
+                    last_log_error = self.rfid_writer.error
+                    print(f"{_now()} [rfid] {last_log_error or 'log writes resumed'}", flush=True)
+                time.sleep(poll_interval)
+        except KeyboardInterrupt:
+            pass
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
@@ -0,0 +1,273 @@
+"""SQLite event store for RFID events and debounced bay state transitions.
+
+Used instead of the CSV log when ``RFID_LOG_PATH`` ends in ``.db``/``.sqlite``
+(``rfid_log.add_rfid_event``/``read_rfid_events`` dispatch here). The
+database runs in WAL mode so the GUI can read while the writer inserts, and
+is indexed for "last time tag X entered" and time-range queries.
+
+Examples:
+    python event_store.py import rfid_log.csv --db rfid_log.db
+    python event_store.py export backup.csv --db rfid_log.db --start 2024-05-01T00:00:00
+    python event_store.py tag 04A1B2C3 --db rfid_log.db
+    python event_store.py range 2024-05-02T06:00:00 2024-05-02T08:00:00 --db rfid_log.db
+    python event_store.py zones --db rfid_log.db --start 2024-05-02T00:00:00
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import sqlite3
+import threading
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Sequence
+
+from occupancy import TRANSITION_FIELDS
+from rfid_log import CSV_HEADERS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rfid_events (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    event TEXT NOT NULL,
+    tag_id TEXT NOT NULL,
+    notes TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_rfid_timestamp ON rfid_events (timestamp);
+CREATE INDEX IF NOT EXISTS idx_rfid_tag ON rfid_events (tag_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_rfid_event ON rfid_events (event, timestamp);
+
+CREATE TABLE IF NOT EXISTS zone_transitions (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    camera_id TEXT NOT NULL,
+    zone TEXT NOT NULL,
+    from_state TEXT NOT NULL,
+    to_state TEXT NOT NULL,
+    dwell_seconds REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_zone_timestamp ON zone_transitions (timestamp);
+CREATE INDEX IF NOT EXISTS idx_zone_zone ON zone_transitions (camera_id, zone, timestamp);
+"""
+
+# RFID_FSYNC policy -> SQLite synchronous level.
+SYNCHRONOUS = {"never": "OFF", "batch": "NORMAL", "always": "FULL"}
+
+_stores: Dict[str, "EventStore"] = {}
+_stores_lock = threading.Lock()
+
+
+def _ts(value: datetime | str | None) -> str | None:
+    if isinstance(value, datetime):
+        return value.isoformat(timespec="seconds")
+    return value
+
+
+def _where(*conditions: tuple[str, Any]) -> tuple[str, List[Any]]:
+    """``WHERE`` clause from (sql, value) pairs, skipping pairs whose value is empty."""
+    clauses = [sql for sql, value in conditions if value]
+    params = [value for _, value in conditions if value]
+    return (f" WHERE {' AND '.join(clauses)}" if clauses else ""), params
+
+
+class EventStore:
+    """Thread-safe wrapper around one SQLite connection."""
+
+    def __init__(self, path: str, synchronous: str = "NORMAL") -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self.set_synchronous(synchronous)
+        with self._conn:
+            self._conn.executescript(SCHEMA)
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(zone_transitions)")}
+            if "dwell_seconds" not in columns:
+                self._conn.execute("ALTER TABLE zone_transitions ADD COLUMN dwell_seconds REAL NOT NULL DEFAULT 0")
+
+    def set_synchronous(self, level: str) -> None:
+        """``OFF``/``NORMAL``/``FULL``, or an ``RFID_FSYNC`` policy name."""
+        level = SYNCHRONOUS.get(level, level).upper()
+        if level not in ("OFF", "NORMAL", "FULL"):
+            raise ValueError(f"Unknown synchronous level {level!r}")
+        with self._lock:
+            self._conn.execute(f"PRAGMA synchronous={level}")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _query(self, sql: str, params: Sequence[Any] = ()) -> List[Dict[str, str]]:
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params)]
+
+    def add_rfid_events(self, rows: Iterable[Dict[str, str]]) -> int:
+        """Insert rows (``CSV_HEADERS`` keys) in one transaction; returns how many."""
+        values = [(r["timestamp"], r["event"], r["tag_id"], r.get("notes") or "") for r in rows]
+        if not values:
+            return 0
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO rfid_events (timestamp, event, tag_id, notes) VALUES (?, ?, ?, ?)", values
+            )
+        return len(values)
+
+    def recent_rfid_events(self, limit: int = 200, offset: int = 0) -> List[Dict[str, str]]:
+        """Newest first, same shape as ``rfid_log.read_rfid_events``."""
+        sql = "SELECT timestamp, event, tag_id, notes FROM rfid_events ORDER BY timestamp DESC, id DESC"
+        return self._query(sql + " LIMIT ? OFFSET ?", (limit if limit > 0 else -1, max(0, offset)))
+
+    def tag_history(self, tag_id: str, event: str | None = None, limit: int = 100) -> List[Dict[str, str]]:
+        """Newest-first events for one tag, optionally only ``ingress`` or ``egress``."""
+        sql = "SELECT timestamp, event, tag_id, notes FROM rfid_events WHERE tag_id = ?"
+        params: List[Any] = [tag_id]
+        if event:
+            sql += " AND event = ?"
+            params.append(event)
+        sql += " ORDER BY timestamp DESC, id DESC LIMIT ?"
+        params.append(limit)
+        return self._query(sql, params)
+
+    def last_event(self, tag_id: str, event: str = "ingress") -> Dict[str, str] | None:
+        """E.g. "when did tag X last enter"."""
+        rows = self.tag_history(tag_id, event=event, limit=1)
+        return rows[0] if rows else None
+
+    def events_between(
+        self,
+        start: datetime | str | None,
+        end: datetime | str | None,
+        event: str | None = None,
+        tag_id: str | None = None,
+    ) -> List[Dict[str, str]]:
+        """Oldest-first events with ``start <= timestamp < end`` (either bound may be None)."""
+        where, params = _where(
+            ("timestamp >= ?", _ts(start)),
+            ("timestamp < ?", _ts(end)),
+            ("event = ?", event),
+            ("tag_id = ?", tag_id),
+        )
+        return self._query(
+            f"SELECT timestamp, event, tag_id, notes FROM rfid_events{where} ORDER BY timestamp, id", params
+        )
+
+    def add_zone_transitions(self, rows: Iterable[Dict[str, str]]) -> int:
+        """Insert debounced bay transitions (``occupancy.ZoneTransition.as_row()``)."""
+        values = [tuple(r[field] for field in TRANSITION_FIELDS) for r in rows]
+        if not values:
+            return 0
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO zone_transitions (timestamp, camera_id, zone, from_state, to_state, dwell_seconds)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                values,
+            )
+        return len(values)
+
+    def zone_transitions(
+        self,
+        start: datetime | str | None = None,
+        end: datetime | str | None = None,
+        camera_id: str | None = None,
+        zone: str | None = None,
+    ) -> List[Dict[str, str]]:
+        """Oldest-first bay state changes, optionally filtered."""
+        where, params = _where(
+            ("timestamp >= ?", _ts(start)),
+            ("timestamp < ?", _ts(end)),
+            ("camera_id = ?", camera_id),
+            ("zone = ?", zone),
+        )
+        fields = ", ".join(TRANSITION_FIELDS)
+        return self._query(f"SELECT {fields} FROM zone_transitions{where} ORDER BY timestamp, id", params)
+
+    def import_csv(self, csv_path: str, batch_size: int = 5000) -> int:
+        """Load an existing ``rfid_log.csv`` (streamed in batches); returns rows imported."""
+        total = 0
+        with Path(csv_path).open("r", newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            while True:
+                batch = [row for row in islice(reader, batch_size) if row.get("timestamp")]
+                if not batch:
+                    break
+                total += self.add_rfid_events(batch)
+        return total
+
+    def export_csv(
+        self, csv_path: str, start: datetime | str | None = None, end: datetime | str | None = None
+    ) -> int:
+        """Write RFID events (oldest first) in the CSV log format; returns rows written."""
+        rows = self.events_between(start, end)
+        with Path(csv_path).open("w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_HEADERS)
+            writer.writeheader()
+            writer.writerows(rows)
+        return len(rows)
+
+
+def open_store(path: str) -> EventStore:
+    """Shared store per database path (one connection for the writer, GUI and recorder)."""
+    key = str(Path(path).resolve())
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = EventStore(path)
+        return store
+
+
+def close_stores() -> None:
+    with _stores_lock:
+        for store in _stores.values():
+            store.close()
+        _stores.clear()
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--db", default="rfid_log.db", help="SQLite database path")
+    parser = argparse.ArgumentParser(description="Depot SQLite event store tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", parents=[common], help="import an rfid_log.csv")
+    imp.add_argument("csv_path")
+    exp = sub.add_parser("export", parents=[common], help="export RFID events to CSV")
+    exp.add_argument("csv_path")
+    exp.add_argument("--start")
+    exp.add_argument("--end")
+    tag = sub.add_parser("tag", parents=[common], help="history of one tag")
+    tag.add_argument("tag_id")
+    tag.add_argument("--event", choices=("ingress", "egress"))
+    tag.add_argument("--limit", type=int, default=20)
+    rng = sub.add_parser("range", parents=[common], help="RFID events in [start, end)")
+    rng.add_argument("start")
+    rng.add_argument("end")
+    rng.add_argument("--event", choices=("ingress", "egress"))
+    zones = sub.add_parser("zones", parents=[common], help="bay state transitions")
+    zones.add_argument("--start")
+    zones.add_argument("--end")
+    zones.add_argument("--camera")
+    args = parser.parse_args(argv)
+
+    store = EventStore(args.db)
+    try:
+        if args.command == "import":
+            print(f"imported {store.import_csv(args.csv_path)} rows into {args.db}")
+        elif args.command == "export":
+            print(f"exported {store.export_csv(args.csv_path, args.start, args.end)} rows to {args.csv_path}")
+        else:
+            if args.command == "tag":
+                rows = store.tag_history(args.tag_id, event=args.event, limit=args.limit)
+            elif args.command == "range":
+                rows = store.events_between(args.start, args.end, event=args.event)
+            else:
+                rows = store.zone_transitions(args.start, args.end, camera_id=args.camera)
+            for row in rows:
+                print(",".join(str(value) for value in row.values()))
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""One-time export of the YOLO weights to a CPU backend (ONNX Runtime / OpenVINO).
+
+The detection head is cut down to ``ALLOWED_LABELS`` before export, so the
+model only scores the classes the depot cares about. With ``--int8`` the
+exported model is statically quantized using frames from ``--calib`` (a
+video file or a folder of images from the depot cameras).
+
+Examples:
+    python export_model.py yolov8m.pt --format onnx --int8 --calib footage/day1.mp4
+    python export_model.py yolov8m.pt --format openvino --int8 --calib calib_frames/
+
+Then point ``MODEL_PATH`` at the printed file (``INFERENCE_BACKEND = "auto"``).
+Requires ultralytics for the export, plus onnxruntime (ONNX INT8) or
+openvino + nncf (OpenVINO, OpenVINO INT8).
+"""
+
+from __future__ import annotations
+
+import argparse
+import shutil
+from pathlib import Path
+from typing import List, Sequence
+
+import cv2
+import numpy as np
+
+from app_config import ALLOWED_LABELS, FRAME_HEIGHT, FRAME_WIDTH, IMG_SIZE, MODEL_PATH
+from backends import labels_path, prepare_batch, write_labels
+from replay import iter_frames
+
+
+def restrict_classes(yolo, labels: Sequence[str]) -> dict:
+    """Slice the class branch of the detection head down to ``labels``; returns the new names."""
+    import torch
+
+    model = yolo.model
+    names = {int(k): str(v).lower() for k, v in model.names.items()}
+    wanted = {label.lower() for label in labels}
+    keep = [cls_idx for cls_idx in sorted(names) if names[cls_idx] in wanted]
+    if not keep:
+        raise SystemExit(f"None of {sorted(wanted)} are classes of this model")
+
+    head = model.model[-1]
+    if not hasattr(head, "cv3"):
+        raise SystemExit(f"Unsupported detection head {type(head).__name__}; export without class restriction")
+    index = torch.tensor(keep)
+    for branches in (head.cv3, getattr(head, "one2one_cv3", None) or ()):
+        for branch in branches:
+            conv = branch[-1]
+            pruned = torch.nn.Conv2d(conv.in_channels, len(keep), 1)
+            pruned.weight.data = conv.weight.data[index].clone()
+            pruned.bias.data = conv.bias.data[index].clone()
+            branch[-1] = pruned
+    head.nc = len(keep)
+    head.no = head.nc + head.reg_max * 4
+    new_names = {i: names[cls_idx] for i, cls_idx in enumerate(keep)}
+    model.names = new_names
+    if isinstance(getattr(model, "yaml", None), dict):
+        model.yaml["nc"] = len(keep)
+    return new_names
+
+
+def calibration_batches(source: str, count: int, every: int, img_size: int) -> List[np.ndarray]:
+    """Single-frame batches from ``source``, resized and letterboxed exactly like at runtime."""
+    batches = []
+    for item in iter_frames(source, every):
+        frame = cv2.resize(item.frame, (FRAME_WIDTH, FRAME_HEIGHT))
+        batches.append(prepare_batch([frame], img_size)[0])
+        if len(batches) >= count:
+            break
+    if not batches:
+        raise SystemExit(f"No frames found in {source}")
+    return batches
+
+
+def export_onnx(model_path: str, labels: Sequence[str], img_size: int, output: Path) -> Path:
+    from ultralytics import YOLO
+
+    yolo = YOLO(model_path)
+    names = restrict_classes(yolo, labels) if labels else {int(k): str(v) for k, v in yolo.model.names.items()}
+    exported = Path(yolo.export(format="onnx", imgsz=img_size, dynamic=True, simplify=True))
+    if exported.resolve() != output.resolve():
+        shutil.move(str(exported), str(output))
+    write_labels(str(output), names)
+    return output
+
+
+def quantize_onnx(model_path: Path, calib: List[np.ndarray], output: Path) -> Path:
+    import onnxruntime as ort
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    input_name = ort.InferenceSession(str(model_path), providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+    class _Reader(CalibrationDataReader):
+        def __init__(self) -> None:
+            self._items = iter(calib)
+
+        def get_next(self):
+            batch = next(self._items, None)
+            return None if batch is None else {input_name: batch}
+
+    quantize_static(
+        str(model_path),
+        str(output),
+        _Reader(),
+        quant_format=QuantFormat.QDQ,
+        per_channel=True,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+    )
+    shutil.copyfile(labels_path(str(model_path)), labels_path(str(output)))
+    return output
+
+
+def export_openvino(onnx_path: Path, calib: List[np.ndarray] | None, output: Path) -> Path:
+    import openvino as ov
+
+    model = ov.convert_model(str(onnx_path))
+    if calib is not None:
+        import nncf
+
+        model = nncf.quantize(
+            model, nncf.Dataset(calib), preset=nncf.QuantizationPreset.MIXED, subset_size=len(calib)
+        )
+    ov.save_model(model, str(output), compress_to_fp16=False)
+    shutil.copyfile(labels_path(str(onnx_path)), labels_path(str(output)))
+    return output
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Export the depot YOLO model for CPU inference")
+    parser.add_argument("model", nargs="?", default=MODEL_PATH, help="ultralytics .pt weights")
+    parser.add_argument("--format", choices=("onnx", "openvino"), default="onnx")
+    parser.add_argument("--img-size", type=int, default=IMG_SIZE)
+    parser.add_argument("--int8", action="store_true", help="statically quantize to INT8 (needs --calib)")
+    parser.add_argument("--calib", help="video file or image folder with typical depot frames")
+    parser.add_argument("--calib-frames", type=int, default=200, help="frames used for calibration")
+    parser.add_argument("--calib-every", type=int, default=15, help="take every Nth calibration frame")
+    parser.add_argument("--all-classes", action="store_true", help=f"keep every class, not just {ALLOWED_LABELS}")
+    args = parser.parse_args(argv)
+    if args.int8 and not args.calib:
+        parser.error("--int8 needs --calib frames to calibrate activations")
+
+    stem = Path(args.model).with_suffix("")
+    stem = stem.with_name(stem.name + ("" if args.all_classes else "_depot"))
+    labels = () if args.all_classes else ALLOWED_LABELS
+    onnx_path = export_onnx(args.model, labels, args.img_size, stem.with_suffix(".onnx"))
+    calib = calibration_batches(args.calib, args.calib_frames, args.calib_every, args.img_size) if args.int8 else None
+
+    if args.format == "onnx":
+        output = quantize_onnx(onnx_path, calib, stem.with_name(stem.name + "_int8.onnx")) if calib else onnx_path
+    else:
+        suffix = "_int8.xml" if calib else ".xml"
+        output = export_openvino(onnx_path, calib, stem.with_name(stem.name + suffix))
+    print(f"Exported {output} (labels: {labels_path(str(output)).name})")
+    print(f'Set MODEL_PATH = "{output.as_posix()}" in app_config.py')
+
+
+if __name__ == "__main__":
+    main()
@@ -2,89 +2,116 @@
 
 from __future__ import annotations
 
+from collections import deque
 from dataclasses import dataclass
+import threading
 import time
 import tkinter as tk
 from tkinter import messagebox, ttk
+from typing import Any, Callable
 
 import cv2
+import numpy as np
 from PIL import Image, ImageTk
 
-from app_config import (
-    ALLOWED_LABELS,
-    CAMERA_INDEX,
-    CONF_THRESHOLD,
-    DETECTION_TTL_FRAMES,
-    FRAME_HEIGHT,
-    FRAME_WIDTH,
-    IMG_SIZE,
-    MODEL_PATH,
-    RFID_LOG_PATH,
-    RFID_SERIAL_AUTOSTART,
-    RFID_SERIAL_BAUDRATE,
-    RFID_SERIAL_PORT,
-    TARGET_DPS,
-    WINDOW_TITLE,
-    ZONES_PATH,
+from app_config import DISPLAY_FPS, DISPLAY_SCALE, FRAME_HEIGHT, FRAME_WIDTH, RFID_TABLE_ROWS, WINDOW_TITLE
+from detector import DetectionBatch
+from engine import DepotEngine
+from metrics import METRICS
+from overlay import DETECTION_COLORS, OTHER_ZONE_COLOR, BufferRing, DisplayScheduler, ZoneLayer
+from pipeline import FramePacket
+from zones import (
+    ZoneIndex,
+    ZoneMap,
+    normalize_box,
+    normalize_polygon,
+    truck_zone_keys,
+    zone_points,
 )
-from detector import DepotDetector, Detection
-from rfid_log import add_rfid_event, read_rfid_events
-from rfid_serial_bridge import RFIDSerialBridge
-from zones import DEFAULT_ZONES, TRUCK_ZONE_KEYS, load_zones, normalize_box, save_zones
 
 
 @dataclass
-class DetectionTrack:
-    detection: Detection
-    ttl_frames: int
+class OverlayOptions:
+    """Plain snapshot of the overlay toggles, safe to read from worker threads."""
+
+    show_detections: bool = True
+    show_centroids: bool = True
+    show_zones: bool = True
+    show_warnings: bool = True
+
+
+def _rfid_values(row: dict[str, str]) -> tuple[str, str, str, str]:
+    return row["timestamp"], row["event"], row["tag_id"], row["notes"]
 
 
 class DepotMonitorApp(tk.Tk):
     def __init__(self) -> None:
         super().__init__()
         self.title(WINDOW_TITLE)
-        self._configure_opencv_logging()
 
-        self.detector = DepotDetector(MODEL_PATH, CONF_THRESHOLD, IMG_SIZE, ALLOWED_LABELS)
-        self.detection_ttl_frames = max(1, DETECTION_TTL_FRAMES)
-        self.active_detection_tracks: list[DetectionTrack] = []
-        self.zones = load_zones(ZONES_PATH, FRAME_WIDTH, FRAME_HEIGHT)
-
-        self.cap = None
-        self.active_camera_index = CAMERA_INDEX
-        self.available_camera_indices: list[int] = []
-        self.camera_selection = tk.StringVar(value=str(CAMERA_INDEX))
+        self.engine = DepotEngine(renderer=self.render_packet)
+        self.pipeline = self.engine.pipeline
+        self.view_camera_id = self.engine.camera_ids[0]
+        self.view_selection = tk.StringVar(value=self.view_camera_id)
+        self.camera_selection = tk.StringVar(value=str(self.active_camera_index))
         self.camera_status_text = tk.StringVar(value="Camera not connected")
-
-        self.current_detections: list[Detection] = []
-        self.last_detection_ts = 0.0
+        self.model_status_text = tk.StringVar(value=self.engine.model_status)
+
+        self.last_shown_frame_id = 0
+        # Render thread: zone layer cache and output buffers. Tk thread: one PhotoImage, updated via paste().
+        self._zone_layer = ZoneLayer()
+        self._frame_buffers = BufferRing(3)
+        self._photo: ImageTk.PhotoImage | None = None
+        # Repaints are capped at DISPLAY_FPS; DISPLAY_SCALE < 1 draws full size into _canvas, then shrinks.
+        self.display = DisplayScheduler(DISPLAY_FPS)
+        self.display_scale = DISPLAY_SCALE if 0 < DISPLAY_SCALE < 1 else 1.0
+        self._canvas = None
+        # Last value pushed to each Tk widget, so unchanged state costs no Tcl calls.
+        self._shown_text: dict[str, str] = {}
+        self._shown_colors: dict[str, str] = {}
+        self._next_status_update = 0.0
         self.running = True
 
+        self.overlay_options = OverlayOptions()
         self.show_detections = tk.BooleanVar(value=True)
         self.show_centroids = tk.BooleanVar(value=True)
         self.show_zones = tk.BooleanVar(value=True)
         self.show_warnings = tk.BooleanVar(value=True)
+        for var in (self.show_detections, self.show_centroids, self.show_zones, self.show_warnings):
+            var.trace_add("write", self._sync_overlay_options)
+        self.pipeline_status_text = tk.StringVar(value="")
+        self.metrics_text = tk.StringVar(value="")
 
         self.warning_text = tk.StringVar(value="No warnings")
         self.rfid_status_text = tk.StringVar(value="RFID serial: idle")
-        self.truck_zone_state: dict[str, str] = {k: "free" for k in TRUCK_ZONE_KEYS}
+        self._shown_log_error: str | None = None
+        self.rfid_page_text = tk.StringVar(value="Live")
+        # Tree item ids, newest first; offset 0 is the live view, > 0 a page of older history.
+        self._rfid_items: deque[str] = deque()
+        self._rfid_offset = 0
+        self.truck_zone_state: dict[str, str] = {k: "free" for k in truck_zone_keys(self.zones)}
         self.depot_rect_items: dict[str, int] = {}
         self.depot_text_items: dict[str, int] = {}
-        self.rfid_bridge: RFIDSerialBridge | None = None
 
         self.edit_mode = False
         self.edit_zone_name = tk.StringVar(value=list(self.zones.keys())[0])
+        self.edit_shape = tk.StringVar(value="rectangle")
         self.drag_start: tuple[int, int] | None = None
         self.temp_box: list[int] | None = None
+        self.temp_polygon: list[list[int]] = []
 
         self._build_layout()
-        self.refresh_camera_list()
-        if not self.connect_camera(self.active_camera_index) and self.available_camera_indices:
-            self.connect_camera(self.available_camera_indices[0])
+        # The window comes up first; the model and the cameras arrive in the background.
+        self.engine.start()
+        self.engine.load_model_async()
+        self.camera_status_text.set("Connecting cameras...")
+        self._run_in_background(self.engine.connect_configured_cameras, self._on_cameras_connected)
         self.refresh_rfid_table()
-        self.start_rfid_bridge()
+        self.rfid_status_text.set(f"RFID serial: {self.engine.start_rfid_bridge()}")
         self.update_depot_indicators()
         self.after(350, self.poll_rfid_bridge)
+        self.after(1000, self.update_metrics_panel)
+        self.after(250, self.poll_model_status)
 
         self.protocol("WM_DELETE_WINDOW", self.on_close)
         self.after(10, self.update_frame)
@@ -104,6 +131,7 @@ class DepotMonitorApp(tk.Tk):
         self.video_label.bind("<ButtonPress-1>", self.on_mouse_down)
         self.video_label.bind("<B1-Motion>", self.on_mouse_drag)
         self.video_label.bind("<ButtonRelease-1>", self.on_mouse_up)
+        self.video_label.bind("<ButtonPress-3>", lambda _event: self.finish_polygon())
 
         controls = ttk.Frame(left, padding=(0, 8, 0, 0))
         controls.grid(row=1, column=0, sticky="ew")
@@ -130,20 +158,37 @@ class DepotMonitorApp(tk.Tk):
         camera_frame.grid(row=0, column=0, sticky="ew")
         camera_frame.columnconfigure(0, weight=1)
 
+        view_combo = ttk.Combobox(
+            camera_frame,
+            state="readonly",
+            textvariable=self.view_selection,
+            values=self.engine.camera_ids,
+        )
+        view_combo.grid(row=0, column=0, columnspan=3, sticky="ew", pady=(0, 6))
+        view_combo.bind("<<ComboboxSelected>>", self.on_view_camera_selected)
+
         self.camera_combo = ttk.Combobox(
             camera_frame,
             state="readonly",
             textvariable=self.camera_selection,
             values=[],
         )
-        self.camera_combo.grid(row=0, column=0, sticky="ew")
+        self.camera_combo.grid(row=1, column=0, sticky="ew")
         ttk.Button(camera_frame, text="Refresh", command=self.refresh_camera_list).grid(
-            row=0, column=1, padx=(6, 0)
+            row=1, column=1, padx=(6, 0)
         )
         ttk.Button(camera_frame, text="Apply", command=self.apply_camera_selection).grid(
-            row=0, column=2, padx=(6, 0)
+            row=1, column=2, padx=(6, 0)
         )
-        ttk.Label(camera_frame, textvariable=self.camera_status_text).grid(row=1, column=0, columnspan=3, sticky="w")
+        ttk.Label(camera_frame, textvariable=self.camera_status_text).grid(row=2, column=0, columnspan=3, sticky="w")
+        ttk.Label(camera_frame, textvariable=self.model_status_text).grid(row=3, column=0, columnspan=3, sticky="w")
+        ttk.Label(camera_frame, textvariable=self.pipeline_status_text).grid(
+            row=4, column=0, columnspan=3, sticky="w"
+        )
+        if METRICS.enabled:
+            ttk.Label(camera_frame, textvariable=self.metrics_text, font=("Consolas", 9), justify="left").grid(
+                row=5, column=0, columnspan=3, sticky="w", pady=(4, 0)
+            )
 
         ttk.Label(right, text="Warnings", font=("Segoe UI", 11, "bold")).grid(
             row=1, column=0, sticky="w", pady=(8, 0)
@@ -162,22 +207,34 @@ class DepotMonitorApp(tk.Tk):
         zone_frame.columnconfigure(0, weight=1)
 
         ttk.Label(zone_frame, text="Zone").grid(row=0, column=0, sticky="w")
-        zone_picker = ttk.Combobox(
+        self.zone_picker = ttk.Combobox(
             zone_frame,
             state="readonly",
             textvariable=self.edit_zone_name,
             values=list(self.zones.keys()),
         )
-        zone_picker.grid(row=1, column=0, sticky="ew", pady=(2, 6))
+        self.zone_picker.grid(row=1, column=0, sticky="ew", pady=(2, 6))
+
+        shape_row = ttk.Frame(zone_frame)
+        shape_row.grid(row=2, column=0, sticky="ew", pady=(0, 6))
+        ttk.Radiobutton(shape_row, text="Rectangle (drag)", value="rectangle", variable=self.edit_shape).grid(
+            row=0, column=0, sticky="w"
+        )
+        ttk.Radiobutton(shape_row, text="Polygon (click vertices)", value="polygon", variable=self.edit_shape).grid(
+            row=0, column=1, sticky="w", padx=(8, 0)
+        )
 
         self.edit_btn = ttk.Button(zone_frame, text="Start editing selected zone", command=self.toggle_edit_mode)
-        self.edit_btn.grid(row=2, column=0, sticky="ew")
+        self.edit_btn.grid(row=3, column=0, sticky="ew")
+        ttk.Button(zone_frame, text="Finish polygon (right click)", command=self.finish_polygon).grid(
+            row=4, column=0, sticky="ew", pady=(6, 0)
+        )
 
         ttk.Button(zone_frame, text="Save zones", command=self.save_zones_to_disk).grid(
-            row=3, column=0, sticky="ew", pady=(6, 0)
+            row=5, column=0, sticky="ew", pady=(6, 0)
         )
         ttk.Button(zone_frame, text="Reset zones", command=self.reset_zones).grid(
-            row=4, column=0, sticky="ew", pady=(6, 0)
+            row=6, column=0, sticky="ew", pady=(6, 0)
         )
 
         rfid_frame = ttk.LabelFrame(right, text="RFID ingress/egress (CSV)", padding=8)
@@ -193,9 +250,13 @@ class DepotMonitorApp(tk.Tk):
         ttk.Button(entry_row, text="Ingress", command=self.log_ingress).grid(row=0, column=1, padx=(6, 0))
         ttk.Button(entry_row, text="Egress", command=self.log_egress).grid(row=0, column=2, padx=(6, 0))
 
-        ttk.Button(rfid_frame, text="Reload list", command=self.refresh_rfid_table).grid(
-            row=1, column=0, sticky="ew", pady=(6, 6)
-        )
+        list_row = ttk.Frame(rfid_frame)
+        list_row.grid(row=1, column=0, sticky="ew", pady=(6, 6))
+        list_row.columnconfigure(0, weight=1)
+        ttk.Button(list_row, text="Reload list", command=self.refresh_rfid_table).grid(row=0, column=0, sticky="ew")
+        ttk.Button(list_row, text="Older", command=self.show_older_rfid_page).grid(row=0, column=1, padx=(6, 0))
+        ttk.Button(list_row, text="Newer", command=self.show_newer_rfid_page).grid(row=0, column=2, padx=(6, 0))
+        ttk.Label(list_row, textvariable=self.rfid_page_text).grid(row=0, column=3, padx=(6, 0))
         ttk.Label(rfid_frame, textvariable=self.rfid_status_text).grid(row=2, column=0, sticky="w", pady=(0, 6))
 
         self.rfid_tree = ttk.Treeview(
@@ -214,127 +275,203 @@ class DepotMonitorApp(tk.Tk):
             self.rfid_tree.column(col, width=width, anchor="w")
         self.rfid_tree.grid(row=3, column=0, sticky="nsew")
 
+    def _frame_point(self, event: tk.Event) -> tuple[int, int]:
+        """Video panel click -> full-frame coordinates (the preview may be downscaled)."""
+        return int(event.x / self.display_scale), int(event.y / self.display_scale)
+
     def on_mouse_down(self, event: tk.Event) -> None:
         if not self.edit_mode:
             return
-        self.drag_start = (event.x, event.y)
-        self.temp_box = [event.x, event.y, event.x, event.y]
+        x, y = self._frame_point(event)
+        if self.edit_shape.get() == "polygon":
+            self.temp_polygon = self.temp_polygon + [[x, y]]
+            return
+        self.drag_start = (x, y)
+        self.temp_box = [x, y, x, y]
 
     def on_mouse_drag(self, event: tk.Event) -> None:
         if not self.edit_mode or not self.drag_start:
             return
-        self.temp_box = [self.drag_start[0], self.drag_start[1], event.x, event.y]
+        self.temp_box = [self.drag_start[0], self.drag_start[1], *self._frame_point(event)]
 
     def on_mouse_up(self, event: tk.Event) -> None:
         if not self.edit_mode or not self.drag_start:
             return
-        self.temp_box = [self.drag_start[0], self.drag_start[1], event.x, event.y]
+        self.temp_box = [self.drag_start[0], self.drag_start[1], *self._frame_point(event)]
         zone = normalize_box(self.temp_box, FRAME_WIDTH, FRAME_HEIGHT)
-        self.zones[self.edit_zone_name.get()] = zone
+        self.engine.set_zone(self.view_camera_id, self.edit_zone_name.get(), zone)
         self.drag_start = None
         self.temp_box = None
 
+    def finish_polygon(self) -> None:
+        if not self.edit_mode or self.edit_shape.get() != "polygon":
+            return
+        if len(self.temp_polygon) < 3:
+            messagebox.showwarning("Zones", "A polygon zone needs at least 3 vertices")
+            return
+        zone = normalize_polygon(self.temp_polygon, FRAME_WIDTH, FRAME_HEIGHT)
+        self.engine.set_zone(self.view_camera_id, self.edit_zone_name.get(), zone)
+        self.temp_polygon = []
+
     def toggle_edit_mode(self) -> None:
         self.edit_mode = not self.edit_mode
+        self.temp_polygon = []
         self.edit_btn.configure(
             text="Stop editing selected zone" if self.edit_mode else "Start editing selected zone"
         )
 
+    @property
+    def zones(self) -> ZoneMap:
+        """Zone map of the camera currently shown in the video panel."""
+        return self.engine.zones_by_camera[self.view_camera_id]
+
+    @property
+    def active_camera_index(self) -> int:
+        return self.engine.camera_device_index[self.view_camera_id]
+
     def save_zones_to_disk(self) -> None:
-        save_zones(ZONES_PATH, self.zones)
-        messagebox.showinfo("Zones", f"Saved to {ZONES_PATH}")
+        zones_path = self.engine.save_zones(self.view_camera_id)
+        messagebox.showinfo("Zones", f"Saved to {zones_path}")
 
     def reset_zones(self) -> None:
-        self.zones = dict(DEFAULT_ZONES)
-        save_zones(ZONES_PATH, self.zones)
+        self.engine.reset_zones(self.view_camera_id)
+        self._on_zone_layout_changed()
+
+    def on_view_camera_selected(self, _event=None) -> None:
+        camera_id = self.view_selection.get()
+        if camera_id not in self.engine.camera_specs or camera_id == self.view_camera_id:
+            return
+        self.view_camera_id = camera_id
+        self.last_shown_frame_id = 0
+        self.display.reset()
+        self.camera_selection.set(str(self.active_camera_index))
+        self.edit_zone_name.set(list(self.zones.keys())[0])
+        self._on_zone_layout_changed()
+
+    def _on_zone_layout_changed(self) -> None:
+        self.zone_picker.configure(values=list(self.zones.keys()))
+        self.truck_zone_state = {k: "free" for k in truck_zone_keys(self.zones)}
+        self._build_depot_indicators()
+        self.update_depot_indicators()
 
     def log_ingress(self) -> None:
         tag = self.tag_entry.get().strip() or "manual-tag"
-        add_rfid_event(RFID_LOG_PATH, "ingress", tag, "manual entry")
+        record = self.engine.log_rfid_event("ingress", tag, "manual entry")
         self.tag_entry.delete(0, tk.END)
-        self.refresh_rfid_table()
+        self.add_rfid_rows([record])
 
     def log_egress(self) -> None:
         tag = self.tag_entry.get().strip() or "manual-tag"
-        add_rfid_event(RFID_LOG_PATH, "egress", tag, "manual entry")
+        record = self.engine.log_rfid_event("egress", tag, "manual entry")
         self.tag_entry.delete(0, tk.END)
-        self.refresh_rfid_table()
+        self.add_rfid_rows([record])
 
     def refresh_rfid_table(self) -> None:
-        for row_id in self.rfid_tree.get_children():
-            self.rfid_tree.delete(row_id)
-        for row in read_rfid_events(RFID_LOG_PATH, limit=250):
-            self.rfid_tree.insert("", tk.END, values=(row["timestamp"], row["event"], row["tag_id"], row["notes"]))
-
-    def start_rfid_bridge(self) -> None:
-        if not RFID_SERIAL_AUTOSTART:
-            self.rfid_status_text.set("RFID serial: disabled")
+        """Full reload of the shown page; new events otherwise arrive through ``add_rfid_rows``."""
+        self._show_rfid_rows(self.engine.recent_rfid_events(limit=RFID_TABLE_ROWS, offset=self._rfid_offset))
+
+    def show_older_rfid_page(self) -> None:
+        offset = self._rfid_offset + RFID_TABLE_ROWS
+        rows = self.engine.recent_rfid_events(limit=RFID_TABLE_ROWS, offset=offset)
+        if rows:
+            self._rfid_offset = offset
+            self._show_rfid_rows(rows)
+
+    def show_newer_rfid_page(self) -> None:
+        if self._rfid_offset == 0:
             return
+        self._rfid_offset = max(0, self._rfid_offset - RFID_TABLE_ROWS)
+        self.refresh_rfid_table()
 
-        self.rfid_bridge = RFIDSerialBridge(
-            csv_path=RFID_LOG_PATH,
-            port=RFID_SERIAL_PORT,
-            baudrate=RFID_SERIAL_BAUDRATE,
-            auto_scan=(RFID_SERIAL_PORT.strip() == ""),
-        )
-        self.rfid_bridge.start()
-        self.rfid_status_text.set("RFID serial: starting")
+    def _show_rfid_rows(self, rows: list[dict[str, str]]) -> None:
+        if self._rfid_items:
+            self.rfid_tree.delete(*self._rfid_items)
+        self._rfid_items = deque(self.rfid_tree.insert("", tk.END, values=_rfid_values(row)) for row in rows)
+        self._update_rfid_page_label()
+
+    def add_rfid_rows(self, rows: list[dict[str, str]]) -> None:
+        """Put new events (oldest first) on top of the live view and drop rows beyond the cap."""
+        if self._rfid_offset:
+            # Browsing history: shift the offset so the visible page keeps showing the same rows.
+            self._rfid_offset += len(rows)
+            self._update_rfid_page_label()
+            return
+        for row in rows:
+            self._rfid_items.appendleft(self.rfid_tree.insert("", 0, values=_rfid_values(row)))
+        while len(self._rfid_items) > RFID_TABLE_ROWS:
+            self.rfid_tree.delete(self._rfid_items.pop())
+
+    def _update_rfid_page_label(self) -> None:
+        if self._rfid_offset == 0:
+            self.rfid_page_text.set("Live")
+        else:
+            first = self._rfid_offset + 1
+            self.rfid_page_text.set(f"History {first}-{first + len(self._rfid_items) - 1}")
 
     def poll_rfid_bridge(self) -> None:
         if not self.running:
             return
-        table_changed = False
-        if self.rfid_bridge is not None:
-            for event in self.rfid_bridge.drain_events():
-                if event.kind == "status":
-                    self.rfid_status_text.set(f"RFID serial: {event.message}")
-                elif event.kind == "rfid_event":
-                    self.rfid_status_text.set(f"RFID serial: {event.message}")
-                    table_changed = True
-        if table_changed:
-            self.refresh_rfid_table()
+        new_rows: list[dict[str, str]] = []
+        for event in self.engine.drain_rfid_events():
+            if event.kind == "status":
+                self.rfid_status_text.set(f"RFID serial: {event.message}")
+            elif event.kind == "rfid_event":
+                self.rfid_status_text.set(f"RFID serial: {event.message}")
+                new_rows.append(
+                    {"timestamp": event.timestamp, "event": event.event, "tag_id": event.tag_id, "notes": event.notes}
+                )
+        if new_rows:
+            self.add_rfid_rows(new_rows)
+        log_error = self.engine.rfid_writer.error
+        if log_error != self._shown_log_error:
+            self._shown_log_error = log_error
+            self.rfid_status_text.set(f"RFID {log_error}" if log_error else "RFID log writes resumed")
         self.after(350, self.poll_rfid_bridge)
 
-    @staticmethod
-    def _configure_opencv_logging() -> None:
-        # Avoid noisy backend probing warnings on startup.
-        try:
-            cv2.setLogLevel(cv2.LOG_LEVEL_ERROR)
+    def _run_in_background(self, task: Callable[[], Any], on_done: Callable[[Any], None]) -> None:
+        """Run a slow camera call off the Tk thread and hand its result back via ``after``."""
+        result: dict[str, Any] = {}
+
+        def work() -> None:
+            result["value"] = task()
+
+        thread = threading.Thread(target=work, name="camera-task", daemon=True)
+        thread.start()
+
+        def poll() -> None:
+            if not self.running:
+                return
+            if thread.is_alive():
+                self.after(100, poll)
+            else:
+                on_done(result.get("value"))
+
+        self.after(100, poll)
+
+    def poll_model_status(self) -> None:
+        if not self.running:
             return
-        except Exception:
-            pass
-        try:
-            cv2.utils.logging.setLogLevel(cv2.utils.logging.LOG_LEVEL_ERROR)
-        except Exception:
-            pass
-
-    @staticmethod
-    def _camera_backends() -> list[int]:
-        backends: list[int] = []
-        for name in ("CAP_DSHOW", "CAP_MSMF", "CAP_ANY"):
-            backend = getattr(cv2, name, None)
-            if isinstance(backend, int) and backend not in backends:
-                backends.append(backend)
-        return backends or [0]
-
-    def probe_cameras(self, max_index: int = 10) -> list[int]:
-        available: list[int] = []
-        for idx in range(max_index + 1):
-            for backend in self._camera_backends():
-                cap = cv2.VideoCapture(idx, backend)
-                if not cap.isOpened():
-                    cap.release()
-                    continue
-                ok, _ = cap.read()
-                cap.release()
-                if ok:
-                    available.append(idx)
-                    break
-        return available
+        if self.model_status_text.get() != self.engine.model_status:
+            self.model_status_text.set(self.engine.model_status)
+        self.after(250, self.poll_model_status)
+
+    def _on_cameras_connected(self, _connected) -> None:
+        # Probing is skipped at startup; the list only grows when Refresh is clicked.
+        connected = [
+            str(self.engine.camera_device_index[camera_id])
+            for camera_id in self.engine.camera_ids
+            if self.pipeline.reader(camera_id) is not None
+        ]
+        self.camera_combo.configure(values=connected)
+        self.camera_selection.set(str(self.active_camera_index))
+        self.camera_status_text.set(f"{self.view_camera_id}: {self.engine.camera_status[self.view_camera_id]}")
 
     def refresh_camera_list(self) -> None:
-        self.available_camera_indices = self.probe_cameras()
-        values = [str(i) for i in self.available_camera_indices]
+        self.camera_status_text.set("Searching for cameras...")
+        self._run_in_background(self.engine.refresh_cameras, self._on_camera_list)
+
+    def _on_camera_list(self, indices) -> None:
+        values = [str(i) for i in indices or []]
         self.camera_combo.configure(values=values)
         if values:
             if str(self.active_camera_index) in values:
@@ -346,36 +483,21 @@ class DepotMonitorApp(tk.Tk):
             self.camera_selection.set("")
             self.camera_status_text.set("No camera found")
 
-    def _open_camera(self, index: int):
-        for backend in self._camera_backends():
-            cap = cv2.VideoCapture(index, backend)
-            if not cap.isOpened():
-                cap.release()
-                continue
-            cap.set(cv2.CAP_PROP_FRAME_WIDTH, FRAME_WIDTH)
-            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, FRAME_HEIGHT)
-            ok, _ = cap.read()
-            if ok:
-                return cap
-            cap.release()
-        return None
-
-    def connect_camera(self, index: int) -> bool:
-        new_cap = self._open_camera(index)
-        if new_cap is None:
-            self.camera_status_text.set(f"Failed to open camera {index}")
-            return False
-        old_cap = self.cap
-        self.cap = new_cap
-        self.active_camera_index = index
-        self.camera_selection.set(str(index))
-        self.last_detection_ts = 0.0
-        self.current_detections = []
-        self.active_detection_tracks = []
-        self.camera_status_text.set(f"Using camera {index}")
-        if old_cap and old_cap.isOpened():
-            old_cap.release()
-        return True
+    def connect_camera(self, camera_id: str, index: int) -> None:
+        self.camera_status_text.set(f"{camera_id}: opening camera {index}...")
+        self._run_in_background(
+            lambda: self.engine.connect_camera(camera_id, index),
+            lambda ok: self._on_camera_applied(camera_id, index, ok),
+        )
+
+    def _on_camera_applied(self, camera_id: str, index: int, ok: bool) -> None:
+        if not ok:
+            self.camera_status_text.set(f"{camera_id}: failed to open camera {index}")
+            messagebox.showerror("Camera", f"Could not open camera {index}")
+            return
+        if camera_id == self.view_camera_id:
+            self.camera_selection.set(str(index))
+        self.camera_status_text.set(f"{camera_id}: using camera {index}")
 
     def apply_camera_selection(self) -> None:
         value = self.camera_selection.get().strip()
@@ -387,16 +509,20 @@ class DepotMonitorApp(tk.Tk):
         except ValueError:
             messagebox.showwarning("Camera", "Invalid camera index")
             return
-        if not self.connect_camera(index):
-            messagebox.showerror("Camera", f"Could not open camera {index}")
+        self.connect_camera(self.view_camera_id, index)
 
     def _build_depot_indicators(self) -> None:
-        box_w = 105
-        box_h = 44
+        self.depot_canvas.delete("all")
+        self.depot_rect_items.clear()
+        self.depot_text_items.clear()
+        self._shown_colors.clear()
+        keys = truck_zone_keys(self.zones)
         gap = 12
         start_x = 10
+        box_w = max(40, min(105, (360 - 2 * start_x - gap * (len(keys) - 1)) // max(1, len(keys))))
+        box_h = 44
         y = 18
-        for idx, key in enumerate(TRUCK_ZONE_KEYS):
+        for idx, key in enumerate(keys):
             x1 = start_x + idx * (box_w + gap)
             y1 = y
             x2 = x1 + box_w
@@ -418,147 +544,206 @@ class DepotMonitorApp(tk.Tk):
             "warning": "#ffd451",   # yellow
             "free": "#d9534f",      # red
         }
-        for key in TRUCK_ZONE_KEYS:
+        for key, rect_id in self.depot_rect_items.items():
             state = self.truck_zone_state.get(key, "free")
             color = color_map.get(state, "#d9534f")
-            rect_id = self.depot_rect_items.get(key)
-            if rect_id is not None:
+            if self._shown_colors.get(key) != color:
+                self._shown_colors[key] = color
                 self.depot_canvas.itemconfig(rect_id, fill=color)
 
-    def update_frame(self) -> None:
-        if not self.running:
-            return
+    def _set_text(self, var: tk.StringVar, value: str) -> None:
+        """``var.set`` only when the text actually changed."""
+        name = str(var)
+        if self._shown_text.get(name) != value:
+            self._shown_text[name] = value
+            var.set(value)
+
+    def _sync_overlay_options(self, *_args) -> None:
+        self.overlay_options = OverlayOptions(
+            show_detections=self.show_detections.get(),
+            show_centroids=self.show_centroids.get(),
+            show_zones=self.show_zones.get(),
+            show_warnings=self.show_warnings.get(),
+        )
 
-        if self.cap is None:
-            self.warning_text.set("No camera connected")
-            self.after(200, self.update_frame)
-            return
+    def render_packet(self, packet: FramePacket):
+        """Render stage callback: runs on the pipeline thread, returns an RGB frame.
+
+        Only the camera shown in the video panel is rendered, and only when the
+        display scheduler has a repaint slot free (``DISPLAY_FPS``).
+        """
+        if packet.camera_id != self.view_camera_id or not self.display.due():
+            return None
+        shape = packet.frame.shape
+        if self.display_scale == 1.0:
+            canvas = output = self._frame_buffers.next(shape, avoid=self.display.in_use())
+        else:
+            if self._canvas is None or self._canvas.shape != shape:
+                self._canvas = np.empty(shape, dtype=np.uint8)
+            canvas = self._canvas
+        with METRICS.time("bgr_to_rgb"):
+            cv2.cvtColor(packet.frame, cv2.COLOR_BGR2RGB, dst=canvas)
+        with METRICS.time("draw_overlays"):
+            self.draw_overlays(
+                canvas,
+                packet.detections,
+                packet.zone_index,
+                packet.eval_data["truck_zone_state"],
+                packet.eval_data["warnings"],
+            )
+        if canvas is self._canvas:
+            width, height = round(shape[1] * self.display_scale), round(shape[0] * self.display_scale)
+            output = self._frame_buffers.next((height, width, 3), avoid=self.display.in_use())
+            with METRICS.time("display_resize"):
+                cv2.resize(canvas, (width, height), dst=output, interpolation=cv2.INTER_AREA)
+        self.display.publish(packet.frame_id, output, packet.capture_ts)
+        return output
 
-        ret, frame = self.cap.read()
-        if not ret:
-            self.warning_text.set("Camera read failed")
-            self.after(200, self.update_frame)
+    def update_frame(self) -> None:
+        """Tk-side display tick: widgets follow state diffs, the panel follows rendered frames."""
+        if not self.running:
             return
-
-        frame = cv2.resize(frame, (FRAME_WIDTH, FRAME_HEIGHT))
-        now = time.perf_counter()
-        if TARGET_DPS <= 0 or (now - self.last_detection_ts) >= (1.0 / TARGET_DPS):
-            detections = self.detector.detect(frame)
-            self._update_detection_tracks(detections)
-            self.last_detection_ts = now
+        started = time.perf_counter()
+
+        packet = self.pipeline.latest(self.view_camera_id)
+        if packet is not None and packet.frame_id != self.last_shown_frame_id:
+            self.last_shown_frame_id = packet.frame_id
+            self.truck_zone_state = packet.eval_data["truck_zone_state"]
+            self.update_depot_indicators()
+            warnings = packet.eval_data["warnings"]
+            self._set_text(self.warning_text, ", ".join(warnings) if warnings else "No warnings")
         else:
-            self._decay_detection_tracks()
-        self.current_detections = [track.detection for track in self.active_detection_tracks]
-
-        eval_data = self.detector.evaluate(self.current_detections, self.zones)
-        self.truck_zone_state = eval_data["truck_zone_state"]
-        self.update_depot_indicators()
-        warnings = eval_data["warnings"]
-        self.warning_text.set(", ".join(warnings) if warnings else "No warnings")
-
-        output = self.draw_overlays(frame, warnings)
-        rgb = cv2.cvtColor(output, cv2.COLOR_BGR2RGB)
-        photo = ImageTk.PhotoImage(image=Image.fromarray(rgb))
-        self.video_label.configure(image=photo)
-        self.video_label.image = photo
-
-        self.after(15, self.update_frame)
-
-    @staticmethod
-    def _centroid_distance_sq(a: tuple[int, int], b: tuple[int, int]) -> int:
-        dx = a[0] - b[0]
-        dy = a[1] - b[1]
-        return dx * dx + dy * dy
-
-    def _decay_detection_tracks(self) -> None:
-        for track in self.active_detection_tracks:
-            track.ttl_frames -= 1
-        self.active_detection_tracks = [t for t in self.active_detection_tracks if t.ttl_frames > 0]
-
-    def _update_detection_tracks(self, detections: list[Detection]) -> None:
-        self._decay_detection_tracks()
-        distance_threshold_sq = 60 * 60
-        used_track_indices: set[int] = set()
-
-        for det in detections:
-            best_idx = -1
-            best_dist_sq = distance_threshold_sq + 1
-            for idx, track in enumerate(self.active_detection_tracks):
-                if idx in used_track_indices or track.detection.label != det.label:
-                    continue
-                dist_sq = self._centroid_distance_sq(track.detection.centroid, det.centroid)
-                if dist_sq < best_dist_sq and dist_sq <= distance_threshold_sq:
-                    best_dist_sq = dist_sq
-                    best_idx = idx
-
-            if best_idx >= 0:
-                self.active_detection_tracks[best_idx].detection = det
-                self.active_detection_tracks[best_idx].ttl_frames = self.detection_ttl_frames
-                used_track_indices.add(best_idx)
-            else:
-                self.active_detection_tracks.append(
-                    DetectionTrack(detection=det, ttl_frames=self.detection_ttl_frames)
-                )
+            status = self.pipeline.status[self.view_camera_id]
+            if status not in ("Streaming", "Waiting for frames"):
+                self._set_text(self.warning_text, status)
+
+        frame = self.display.take()
+        if frame is not None:
+            self._show_frame(frame.output)
+            METRICS.mark("display_fps")
+            METRICS.record("display_age", (time.time() - frame.capture_ts) * 1000.0)
+
+        # Timings and frame age change every frame; twice a second is plenty for a text label.
+        if packet is not None and started >= self._next_status_update:
+            self._next_status_update = started + 0.5
+            self._set_text(self.pipeline_status_text, self._pipeline_status(packet))
+
+        self.after(self.display.poll_ms(started), self.update_frame)
+
+    def _pipeline_status(self, packet: FramePacket) -> str:
+        timings = self.pipeline.stage_timings()
+        status = " | ".join(f"{name} {timings[name]:.0f} ms" for name in ("capture", "inference", "evaluate", "render"))
+        reader = self.pipeline.reader(self.view_camera_id)
+        if reader is not None:
+            age_ms = (time.time() - packet.capture_ts) * 1000.0
+            status += f"\nframe age {age_ms:.0f} ms | dropped {reader.dropped_frames}"
+        motion = self.pipeline.motion_stats(self.view_camera_id)
+        if motion is not None:
+            status += (
+                f"\ndetect {motion['target_dps']:g} DPS | inferences {motion['inferences']}"
+                f" | saved {motion['inferences_saved']}"
+            )
+        health = self.engine.camera_health(self.view_camera_id)
+        if health is not None:
+            uptime = int(health["uptime_s"])
+            status += (
+                f"\nuptime {uptime // 3600}h{uptime % 3600 // 60:02d}m | reconnects {health['reconnects']}"
+                f" | timestamp gaps {health['timestamp_gaps']}"
+            )
+        return status
 
-    def draw_overlays(self, frame, warnings: list[str]):
-        output = frame.copy()
-
-        if self.show_zones.get():
-            for key, box in self.zones.items():
-                x1, y1, x2, y2 = box
-                if key.startswith("truck_space"):
-                    zone_state = self.truck_zone_state.get(key, "free")
-                    if zone_state == "occupied":
-                        color = (0, 200, 0)  # green
-                    elif zone_state == "warning":
-                        color = (0, 255, 255)  # yellow
-                    else:
-                        color = (0, 0, 255)  # red
-                elif key == "warn_car":
-                    color = (0, 0, 255)
-                else:
-                    color = (180, 105, 255)
-                cv2.rectangle(output, (x1, y1), (x2, y2), color, 2)
-                cv2.putText(output, key, (x1, max(15, y1 - 6)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
-
-        if self.show_detections.get():
-            for det in self.current_detections:
-                x1, y1, x2, y2 = det.bbox
-                if det.label == "truck":
-                    color = (0, 200, 0)
-                elif det.label == "car":
-                    color = (0, 0, 255)
+    def _show_frame(self, rgb) -> None:
+        """Paste an RGB frame into the panel's PhotoImage (recreated only if the size changes)."""
+        height, width = rgb.shape[:2]
+        try:
+            with METRICS.time("photoimage"):
+                image = Image.frombuffer("RGB", (width, height), rgb, "raw", "RGB", 0, 1)
+                if self._photo is None or (self._photo.width(), self._photo.height()) != (width, height):
+                    self._photo = ImageTk.PhotoImage(image=image)
+                    self.video_label.configure(image=self._photo)
                 else:
-                    color = (180, 105, 255)
+                    self._photo.paste(image)
+        finally:
+            self.display.painted()
 
+    def update_metrics_panel(self) -> None:
+        if not self.running:
+            return
+        if METRICS.enabled:
+            self.metrics_text.set(
+                METRICS.format_table(
+                    (
+                        "cap_read",
+                        "resize",
+                        "preprocess",
+                        "model",
+                        "postprocess",
+                        "evaluate",
+                        "draw_overlays",
+                        "display_resize",
+                        "bgr_to_rgb",
+                        "photoimage",
+                        "frame_age",
+                        "display_age",
+                    )
+                )
+            )
+        self.after(1000, self.update_metrics_panel)
+
+    def draw_overlays(
+        self,
+        output,
+        detections: DetectionBatch,
+        zone_index: ZoneIndex | None,
+        truck_zone_state: dict[str, str],
+        warnings: list[str],
+    ) -> None:
+        """Draw onto an RGB frame in place; zones come from the cached ``ZoneLayer``."""
+        options = self.overlay_options
+
+        if options.show_zones and zone_index is not None:
+            self._zone_layer.update(zone_index, truck_zone_state, output.shape)
+            self._zone_layer.composite(output)
+
+        if options.show_detections and len(detections):
+            rows = zip(
+                detections.xyxy.tolist(),
+                detections.labels.tolist(),
+                detections.conf.tolist(),
+                detections.centroids.tolist(),
+                detections.track_ids.tolist(),
+            )
+            for (x1, y1, x2, y2), label, conf, (cx, cy), track_id in rows:
+                color = DETECTION_COLORS.get(label, OTHER_ZONE_COLOR)
                 cv2.rectangle(output, (x1, y1), (x2, y2), color, 2)
-                text = f"{det.label} {det.confidence:.2f}"
+                text = f"{label} #{track_id} {conf:.2f}" if track_id >= 0 else f"{label} {conf:.2f}"
                 cv2.putText(output, text, (x1, max(15, y1 - 8)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
 
-                if self.show_centroids.get():
-                    cv2.circle(output, det.centroid, 4, color, -1)
+                if options.show_centroids:
+                    cv2.circle(output, (cx, cy), 4, color, -1)
 
-        if self.edit_mode and self.temp_box:
-            x1, y1, x2, y2 = normalize_box(self.temp_box, FRAME_WIDTH, FRAME_HEIGHT)
+        temp_box = self.temp_box
+        if self.edit_mode and temp_box:
+            x1, y1, x2, y2 = normalize_box(temp_box, FRAME_WIDTH, FRAME_HEIGHT)
             cv2.rectangle(output, (x1, y1), (x2, y2), (255, 255, 255), 2)
+        temp_polygon = self.temp_polygon
+        if self.edit_mode and temp_polygon:
+            cv2.polylines(output, [zone_points(temp_polygon)], False, (255, 255, 255), 2)
+            for x, y in temp_polygon:
+                cv2.circle(output, (x, y), 3, (255, 255, 255), -1)
 
-        if self.show_warnings.get() and warnings:
+        if options.show_warnings and warnings:
             cv2.putText(
                 output,
                 " | ".join(warnings),
                 (10, 24),
                 cv2.FONT_HERSHEY_SIMPLEX,
                 0.7,
-                (0, 0, 255),
+                (255, 0, 0),
                 2,
             )
 
-        return output
-
     def on_close(self) -> None:
         self.running = False
-        if self.rfid_bridge is not None:
-            self.rfid_bridge.stop()
-        if self.cap and self.cap.isOpened():
-            self.cap.release()
+        self.engine.stop()
         self.destroy()
@@ -0,0 +1,312 @@
+"""Inference worker processes fed through a shared-memory frame ring.
+
+CPU inference inside the GUI process competes with capture, rendering and Tk
+for the GIL, and one model instance runs one batch at a time.
+``InferencePool`` starts ``workers`` processes that each load their own model
+with at most ``threads`` intra-op threads. Frames are copied into the slots of
+one ``multiprocessing.shared_memory`` block instead of being pickled: only the
+slot number and shape travel over the task queue, and a worker sends back the
+small xyxy/conf/cls arrays of its result.
+
+The pool is an ``InferenceBackend``. ``submit`` returns a future right away,
+so the pipeline can keep ``max_in_flight`` batches going at once; futures are
+resolved strictly in submission order, so results come back in order per
+camera even when a later frame finishes first on another worker.
+"""
+
+from __future__ import annotations
+
+import multiprocessing as mp
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Dict, List
+
+import numpy as np
+
+from backends import InferenceBackend, RawBoxes, backend_for_path, load_backend
+
+# Largest frame a slot holds when no frame size is given.
+DEFAULT_FRAME_SIZE = (1920, 1080)
+
+
+class FrameRing:
+    """``slots`` equally sized uint8 frame buffers in one shared memory block."""
+
+    def __init__(self, slots: int, slot_bytes: int, name: str | None = None) -> None:
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self._owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self._owner, size=slots * slot_bytes)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def view(self, slot: int, shape: tuple[int, ...]) -> np.ndarray:
+        return np.ndarray(shape, dtype=np.uint8, buffer=self.shm.buf, offset=slot * self.slot_bytes)
+
+    def write(self, slot: int, image: np.ndarray) -> tuple[int, ...]:
+        """Copy ``image`` (e.g. a non-contiguous ROI crop) into ``slot``; returns its shape."""
+        if image.nbytes > self.slot_bytes:
+            raise ValueError(f"frame of {image.nbytes} bytes does not fit a {self.slot_bytes}-byte slot")
+        np.copyto(self.view(slot, image.shape), image)
+        return image.shape
+
+    def close(self) -> None:
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # a view is still referenced; the mapping goes away with the process
+        if self._owner:
+            self.shm.unlink()
+
+
+@dataclass(eq=False)
+class _Batch:
+    future: Future
+    parts: List[RawBoxes | None]
+    remaining: int
+    error: str | None = None
+
+
+def _worker_main(
+    index: int,
+    model_path: str,
+    backend: str,
+    threads: int,
+    ring_name: str,
+    slots: int,
+    slot_bytes: int,
+    warmup: tuple[int, int, int] | None,
+    tasks,
+    results,
+) -> None:
+    """Worker process: load the model, then run one frame per task until ``None`` arrives."""
+    import cv2
+
+    if threads > 0:
+        cv2.setNumThreads(threads)
+    try:
+        model = load_backend(model_path, backend, threads=threads)
+        if warmup is not None:
+            width, height, img_size = warmup
+            model.predict([np.zeros((height, width, 3), dtype=np.uint8)], img_size, 0.25, 0.7)
+    except Exception as exc:
+        results.put(("error", index, f"{type(exc).__name__}: {exc}"))
+        return
+    results.put(("ready", index, dict(model.names)))
+
+    ring = FrameRing(slots, slot_bytes, name=ring_name)
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            batch_id, part, slot, shape, img_size, conf_threshold, iou_threshold, classes = task
+            try:
+                (raw,) = model.predict([ring.view(slot, shape)], img_size, conf_threshold, iou_threshold, classes)
+                payload = (raw.xyxy.astype(np.float32), raw.conf.astype(np.float32), raw.cls.astype(np.int32))
+                results.put(("done", batch_id, part, slot, payload))
+            except Exception as exc:
+                results.put(("failed", batch_id, part, slot, f"{type(exc).__name__}: {exc}"))
+    finally:
+        ring.close()
+
+
+class InferencePool(InferenceBackend):
+    """``workers`` model processes behind the ``InferenceBackend`` interface.
+
+    Blocks until every worker has loaded (and, with ``warmup_img_size``,
+    run) its model, so create it off the GUI thread. Each image of a batch is a
+    separate task, so frames from several cameras run on several workers.
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        backend: str = "auto",
+        workers: int = 2,
+        threads: int = 1,
+        frame_size: tuple[int, int] | None = None,
+        warmup_img_size: int | None = None,
+        slots: int = 0,
+        start_timeout: float = 300.0,
+    ) -> None:
+        backend = backend_for_path(model_path) if backend == "auto" else backend
+        self.workers = max(1, workers)
+        self.max_in_flight = self.workers
+        self.name = f"{backend} x{self.workers} processes"
+        width, height = frame_size or DEFAULT_FRAME_SIZE
+        self.ring = FrameRing(slots or self.workers * 4, width * height * 3)
+        self._free_slots: queue.Queue[int] = queue.Queue()
+        for slot in range(self.ring.slots):
+            self._free_slots.put(slot)
+
+        context = mp.get_context("spawn")  # torch and fork don't mix; also what Windows does anyway
+        self._tasks = context.Queue()
+        self._results = context.Queue()
+        warmup = (width, height, warmup_img_size) if warmup_img_size else None
+        self._processes = [
+            context.Process(
+                target=_worker_main,
+                args=(i, model_path, backend, threads, self.ring.name, self.ring.slots, self.ring.slot_bytes,
+                      warmup, self._tasks, self._results),
+                name=f"inference-worker-{i}",
+                daemon=True,
+            )
+            for i in range(self.workers)
+        ]
+        for process in self._processes:
+            process.start()
+
+        self._lock = threading.Lock()
+        self._pending: Dict[int, _Batch] = {}
+        self._submitted = 0  # batch ids handed out so far
+        self._next_batch = 0
+        self._broken: str | None = None
+        self._closed = False
+        try:
+            self.names = self._wait_ready(start_timeout)
+        except Exception:
+            self.close()
+            raise
+        self._collector = threading.Thread(target=self._collect, name="inference-pool", daemon=True)
+        self._collector.start()
+
+    def _wait_ready(self, timeout: float) -> Dict[int, str]:
+        names: Dict[int, str] = {}
+        deadline = time.monotonic() + timeout
+        started = 0
+        while started < len(self._processes):
+            try:
+                kind, index, payload = self._results.get(timeout=1.0)
+            except queue.Empty:
+                dead = [p.name for p in self._processes if not p.is_alive()]
+                if dead:
+                    raise RuntimeError(f"{', '.join(dead)} exited while loading the model") from None
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"inference workers did not start within {timeout:.0f} s") from None
+                continue
+            started += 1
+            if kind == "error":
+                raise RuntimeError(f"inference worker {index} failed to load the model: {payload}")
+            names = payload
+        return names
+
+    def predict(self, images, img_size, conf_threshold, iou_threshold, classes=None) -> List[RawBoxes]:
+        return self.submit(images, img_size, conf_threshold, iou_threshold, classes).result()
+
+    def submit(self, images, img_size, conf_threshold, iou_threshold, classes=None) -> "Future[List[RawBoxes]]":
+        images = list(images)
+        for image in images:
+            if image.nbytes > self.ring.slot_bytes:
+                raise ValueError(
+                    f"frame {image.shape} does not fit a {self.ring.slot_bytes}-byte slot; raise frame_size"
+                )
+        future: Future[List[RawBoxes]] = Future()
+        with self._lock:
+            batch_id = self._submitted
+            self._submitted += 1
+            self._pending[batch_id] = _Batch(future, [None] * len(images), len(images))
+        classes = list(classes) if classes is not None else None
+        # One slot at a time, so workers free slots while a batch larger than the ring is still going in.
+        for part, image in enumerate(images):
+            slot = None
+            try:
+                slot = self._acquire_slot()
+                shape = self.ring.write(slot, image)
+                self._tasks.put((batch_id, part, slot, shape, img_size, conf_threshold, iou_threshold, classes))
+            except Exception as exc:
+                # Parts already queued free their slots when their results arrive; _collect drops them.
+                if slot is not None:
+                    self._free_slots.put(slot)
+                with self._lock:
+                    self._pending.pop(batch_id, None)
+                if not future.done():
+                    future.set_exception(exc)
+                break
+        self._resolve_ready()
+        return future
+
+    def _acquire_slot(self) -> int:
+        """A free ring slot; waits while every slot is being worked on."""
+        while True:
+            if self._broken or self._closed:
+                raise RuntimeError(self._broken or "inference pool is closed")
+            try:
+                return self._free_slots.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+    def _collect(self) -> None:
+        while not self._closed:
+            try:
+                message = self._results.get(timeout=1.0)
+            except queue.Empty:
+                dead = [p.name for p in self._processes if not p.is_alive()]
+                if dead and not self._closed:
+                    self._fail_all(f"{', '.join(dead)} exited")
+                    return
+                continue
+            except (EOFError, OSError) as exc:
+                if not self._closed:
+                    self._fail_all(f"result queue closed ({exc!r})")
+                return
+            if message is None:
+                return
+            kind, batch_id, part, slot, payload = message
+            self._free_slots.put(slot)
+            with self._lock:
+                batch = self._pending.get(batch_id)
+                if batch is None:
+                    continue
+                if kind == "done":
+                    batch.parts[part] = RawBoxes(*payload)
+                else:
+                    batch.error = batch.error or payload
+                batch.remaining -= 1
+            self._resolve_ready()
+
+    def _resolve_ready(self) -> None:
+        """Resolve finished batches, but never one before an earlier batch."""
+        finished: List[_Batch] = []
+        with self._lock:
+            while self._next_batch < self._submitted:
+                batch = self._pending.get(self._next_batch)
+                if batch is not None:
+                    if batch.remaining:
+                        break
+                    finished.append(self._pending.pop(self._next_batch))
+                # else: failed in submit() and already resolved there
+                self._next_batch += 1
+        for batch in finished:
+            if batch.error:
+                batch.future.set_exception(RuntimeError(f"inference worker failed: {batch.error}"))
+            else:
+                batch.future.set_result(batch.parts)
+
+    def _fail_all(self, reason: str) -> None:
+        with self._lock:
+            self._broken = self._broken or reason
+            pending, self._pending = list(self._pending.values()), {}
+        for batch in pending:
+            if not batch.future.done():
+                batch.future.set_exception(RuntimeError(f"inference pool stopped: {reason}"))
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._processes:
+            self._tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=5.0)
+            if process.is_alive():
+                process.terminate()
+        self._results.put(None)
+        self._fail_all("closed")
+        self.ring.close()
@@ -1,7 +1,38 @@
-from gui_app import DepotMonitorApp
+import argparse
+
+
+def run_headless() -> None:
+    # Imported here so headless runs never pull in Tkinter or PIL.
+    from engine import DepotEngine
+
+    engine = DepotEngine()
+    engine.load_model_async()
+    for camera_id, ok in engine.connect_configured_cameras().items():
+        status = "connected" if ok else "failed to open"
+        print(f"[{camera_id}] camera {engine.camera_device_index[camera_id]} {status}", flush=True)
+    engine.start()
+    print(f"[rfid] serial {engine.start_rfid_bridge()}", flush=True)
+    try:
+        engine.run_headless()
+    finally:
+        engine.stop()
 
 
 def main() -> None:
+    parser = argparse.ArgumentParser(description="Depot truck monitor")
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="run capture/detect/evaluate/RFID without the GUI and print state changes",
+    )
+    args = parser.parse_args()
+
+    if args.headless:
+        run_headless()
+        return
+
+    from gui_app import DepotMonitorApp
+
     app = DepotMonitorApp()
     app.mainloop()
 
@@ -0,0 +1,181 @@
+"""Lightweight latency/rate instrumentation with rolling percentile windows.
+
+Stages record durations in milliseconds into fixed-size ring buffers; p50,
+p95 and p99 are computed only when a snapshot is requested. When metrics
+are disabled, ``time()`` hands back a shared no-op context manager and
+``record()`` returns immediately, so instrumented code pays almost nothing.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Deque, Dict
+
+import numpy as np
+
+from app_config import METRICS_ENABLED
+
+_NULL_CONTEXT = nullcontext()
+
+
+class RollingHistogram:
+    """Keeps the last ``size`` samples and reports percentiles over them."""
+
+    def __init__(self, size: int = 512) -> None:
+        self._samples = np.zeros(size, dtype=np.float64)
+        self._next = 0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def record(self, value: float) -> None:
+        with self._lock:
+            self._samples[self._next] = value
+            self._next = (self._next + 1) % len(self._samples)
+            self.count += 1
+
+    def percentiles(self) -> Dict[str, float]:
+        with self._lock:
+            window = self._samples[: min(self.count, len(self._samples))].copy()
+        if not window.size:
+            return {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+        p50, p95, p99 = np.percentile(window, (50, 95, 99))
+        return {"p50": float(p50), "p95": float(p95), "p99": float(p99)}
+
+
+class RateMeter:
+    """Events per second over a sliding time window."""
+
+    def __init__(self, window_seconds: float = 5.0) -> None:
+        self.window_seconds = window_seconds
+        self._events: Deque[float] = deque()
+        self._lock = threading.Lock()
+
+    def mark(self, now: float | None = None) -> None:
+        now = time.perf_counter() if now is None else now
+        with self._lock:
+            self._events.append(now)
+            self._trim(now)
+
+    def _trim(self, now: float) -> None:
+        while self._events and now - self._events[0] > self.window_seconds:
+            self._events.popleft()
+
+    def rate(self) -> float:
+        now = time.perf_counter()
+        with self._lock:
+            self._trim(now)
+            if len(self._events) < 2:
+                return 0.0
+            span = now - self._events[0]
+            return (len(self._events) - 1) / span if span > 0 else 0.0
+
+
+class _Timer:
+    __slots__ = ("_metrics", "_name", "_started")
+
+    def __init__(self, metrics: "Metrics", name: str) -> None:
+        self._metrics = metrics
+        self._name = name
+
+    def __enter__(self) -> "_Timer":
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._metrics.record(self._name, (time.perf_counter() - self._started) * 1000.0)
+
+
+class Metrics:
+    def __init__(self, enabled: bool = True, window: int = 512) -> None:
+        self.enabled = enabled
+        self.window = window
+        self._histograms: Dict[str, RollingHistogram] = {}
+        self._rates: Dict[str, RateMeter] = {}
+        self._lock = threading.Lock()
+
+    def _histogram(self, name: str) -> RollingHistogram:
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, RollingHistogram(self.window))
+        return histogram
+
+    def record(self, name: str, value_ms: float) -> None:
+        if not self.enabled:
+            return
+        self._histogram(name).record(value_ms)
+
+    def time(self, name: str):
+        """Context manager recording the block's duration under ``name``."""
+        if not self.enabled:
+            return _NULL_CONTEXT
+        return _Timer(self, name)
+
+    def mark(self, name: str) -> None:
+        """Count one event for the ``name`` rate (e.g. ``inference_fps``)."""
+        if not self.enabled:
+            return
+        meter = self._rates.get(name)
+        if meter is None:
+            with self._lock:
+                meter = self._rates.setdefault(name, RateMeter())
+        meter.mark()
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        latency = {}
+        for name, histogram in list(self._histograms.items()):
+            latency[name] = {**histogram.percentiles(), "count": histogram.count}
+        rates = {name: meter.rate() for name, meter in list(self._rates.items())}
+        return {"latency_ms": latency, "rates": rates}
+
+    def to_prometheus(self) -> str:
+        snap = self.snapshot()
+        lines = [
+            "# HELP depot_latency_ms Rolling latency per stage in milliseconds.",
+            "# TYPE depot_latency_ms summary",
+        ]
+        for name, values in sorted(snap["latency_ms"].items()):
+            for quantile, key in (("0.5", "p50"), ("0.95", "p95"), ("0.99", "p99")):
+                lines.append(f'depot_latency_ms{{stage="{name}",quantile="{quantile}"}} {values[key]:.3f}')
+            lines.append(f'depot_latency_ms_count{{stage="{name}"}} {values["count"]}')
+        lines.append("# HELP depot_rate_per_second Event rates (frames/sec).")
+        lines.append("# TYPE depot_rate_per_second gauge")
+        for name, value in sorted(snap["rates"].items()):
+            lines.append(f'depot_rate_per_second{{name="{name}"}} {value:.3f}')
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str) -> None:
+        """Write a snapshot: Prometheus text for ``.prom``/``.txt`` files, JSON otherwise."""
+        target = Path(path)
+        if target.suffix in (".prom", ".txt"):
+            text = self.to_prometheus()
+        else:
+            text = json.dumps(self.snapshot(), indent=2, sort_keys=True)
+        tmp = target.with_name(target.name + ".tmp")
+        tmp.write_text(text, encoding="utf-8")
+        tmp.replace(target)
+
+    def format_table(self, order: tuple[str, ...] = ()) -> str:
+        """Compact fixed-width p50/p95/p99 table for the GUI panel.
+
+        Every recorded stage is shown: those in ``order`` first, the rest sorted by name.
+        """
+        snap = self.snapshot()
+        latency = snap["latency_ms"]
+        rows = [f"{'stage':<14}{'p50':>7}{'p95':>7}{'p99':>7}"]
+        names = [name for name in order if name in latency]
+        names += sorted(set(latency) - set(names))
+        for name in names:
+            values = latency[name]
+            rows.append(f"{name:<14}{values['p50']:>7.1f}{values['p95']:>7.1f}{values['p99']:>7.1f}")
+        for name, value in sorted(snap["rates"].items()):
+            rows.append(f"{name:<14}{value:>7.1f}/s")
+        return "\n".join(rows)
+
+
+METRICS = Metrics(enabled=METRICS_ENABLED)
@@ -0,0 +1,112 @@
+"""Cheap motion detection used to gate YOLO inference."""
+
+from __future__ import annotations
+
+import cv2
+import numpy as np
+
+from zones import ZoneMap, zone_points
+
+
+class MotionGate:
+    """Decides when a camera needs a detection cycle.
+
+    Every captured frame is downscaled, blurred and compared against a
+    running-average background, restricted to the zone areas. While motion
+    is seen the camera is scheduled at ``max_dps``; after ``idle_seconds``
+    without motion it drops to the ``idle_dps`` keep-alive rate.
+    """
+
+    def __init__(
+        self,
+        max_dps: float,
+        idle_dps: float,
+        idle_seconds: float,
+        threshold: float = 0.01,
+        pixel_delta: int = 25,
+        scale_width: int = 160,
+    ) -> None:
+        self.max_dps = max_dps
+        self.idle_dps = idle_dps
+        self.idle_seconds = idle_seconds
+        self.threshold = threshold
+        self.pixel_delta = pixel_delta
+        self.scale_width = scale_width
+
+        self.frames_checked = 0
+        self.motion_frames = 0
+        self.inferences = 0
+        self.inferences_saved = 0
+
+        self._zones: ZoneMap = {}
+        self._mask: np.ndarray | None = None
+        self._mask_pixels = 0
+        self._background: np.ndarray | None = None
+        self._last_motion_ts: float | None = None
+        self._last_inference_ts = 0.0
+        self._last_full_rate_ts = 0.0
+
+    def set_zones(self, zones: ZoneMap) -> None:
+        # The mask itself is built lazily at the downscaled resolution.
+        self._zones = dict(zones)
+        self._mask = None
+
+    def is_idle(self, now: float) -> bool:
+        return self._last_motion_ts is None or (now - self._last_motion_ts) >= self.idle_seconds
+
+    def target_dps(self, now: float) -> float:
+        return self.idle_dps if self.is_idle(now) else self.max_dps
+
+    def _build_mask(self, shape: tuple[int, int], scale: float) -> None:
+        mask = np.zeros(shape, dtype=np.uint8)
+        if self._zones:
+            polygons = [np.round(zone_points(z) * scale).astype(np.int32) for z in self._zones.values()]
+            cv2.fillPoly(mask, polygons, 1)
+        else:
+            mask[:] = 1
+        self._mask = mask.astype(bool)
+        self._mask_pixels = max(1, int(self._mask.sum()))
+
+    def update(self, frame, now: float) -> bool:
+        """Feed a captured frame; returns True if motion was detected in the zones."""
+        h, w = frame.shape[:2]
+        scale = self.scale_width / float(w)
+        small = cv2.resize(frame, (self.scale_width, max(1, int(round(h * scale)))), interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0).astype(np.float32)
+        if self._mask is None or self._mask.shape != gray.shape:
+            self._build_mask(gray.shape, scale)
+        self.frames_checked += 1
+
+        if self._background is None or self._background.shape != gray.shape:
+            self._background = gray
+            self._last_motion_ts = now
+            return True
+
+        changed = (np.abs(gray - self._background) > self.pixel_delta) & self._mask
+        cv2.accumulateWeighted(gray, self._background, 0.05)
+        moving = changed.sum() / self._mask_pixels >= self.threshold
+        if moving:
+            self.motion_frames += 1
+            self._last_motion_ts = now
+        return bool(moving)
+
+    def due(self, now: float) -> bool:
+        """True when a detection cycle should run now under the adaptive rate.
+
+        Also counts cycles the full ``max_dps`` schedule would have run but
+        the gate skipped (``inferences_saved``).
+        """
+        full_rate_due = self.max_dps <= 0 or (now - self._last_full_rate_ts) >= (1.0 / self.max_dps)
+        if self.is_idle(now):
+            # idle_dps <= 0 disables the keep-alive entirely.
+            run = self.idle_dps > 0 and (now - self._last_inference_ts) >= (1.0 / self.idle_dps)
+        else:
+            run = full_rate_due
+        if run:
+            self._last_inference_ts = now
+            self.inferences += 1
+        elif full_rate_due:
+            self.inferences_saved += 1
+        if full_rate_due:
+            self._last_full_rate_ts = now
+        return run
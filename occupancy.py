@@ -0,0 +1,169 @@
+"""Debounced bay occupancy: per-zone state machines that emit only transitions.
+
+``evaluate`` reports a raw ``free``/``occupied``/``warning`` state per bay on
+every frame, which flickers when a detection drops out for a frame or two.
+``OccupancyTracker`` only accepts a new state once it has been seen on
+``min_frames`` consecutive frames spanning at least ``min_seconds``, and then
+emits one ``ZoneTransition`` carrying how long the bay was in the previous
+state. The transition is timestamped when the new state was first seen.
+
+Transitions go to a small CSV log (or the SQLite event store for a ``.db``
+path), which is enough to rebuild per-bay dwell times and utilization.
+"""
+
+from __future__ import annotations
+
+import csv
+import threading
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List
+
+from rfid_log import is_sqlite_path
+
+TRANSITION_FIELDS = ["timestamp", "camera_id", "zone", "from_state", "to_state", "dwell_seconds"]
+
+
+@dataclass
+class ZoneTransition:
+    timestamp: float
+    camera_id: str
+    zone: str
+    from_state: str
+    to_state: str
+    dwell_seconds: float
+
+    def as_row(self) -> Dict[str, str]:
+        row = asdict(self)
+        row["timestamp"] = datetime.fromtimestamp(self.timestamp).isoformat(timespec="seconds")
+        row["dwell_seconds"] = f"{self.dwell_seconds:.1f}"
+        return row
+
+
+@dataclass
+class _ZoneMachine:
+    state: str
+    since: float
+    candidate: str | None = None
+    candidate_since: float = 0.0
+    candidate_frames: int = 0
+
+    def update(self, observed: str, ts: float, min_frames: int, min_seconds: float) -> tuple[str, float] | None:
+        """Feed one observation; returns (previous state, its dwell) when the state changes."""
+        if observed == self.state:
+            self.candidate = None
+            return None
+        if observed != self.candidate:
+            self.candidate = observed
+            self.candidate_since = ts
+            self.candidate_frames = 0
+        self.candidate_frames += 1
+        if self.candidate_frames < min_frames or ts - self.candidate_since < min_seconds:
+            return None
+        previous, dwell = self.state, max(0.0, self.candidate_since - self.since)
+        self.state, self.since = observed, self.candidate_since
+        self.candidate = None
+        return previous, dwell
+
+
+class OccupancyTracker:
+    """Hysteresis on top of ``evaluate``'s per-frame bay states.
+
+    Use ``observe`` as the pipeline's ``on_evaluated`` hook; transitions are
+    passed to ``on_transitions`` (called on the evaluate thread, so keep it
+    cheap). The first state seen for a bay is taken as-is without a transition.
+    """
+
+    def __init__(
+        self,
+        min_frames: int = 3,
+        min_seconds: float = 1.0,
+        on_transitions: Callable[[List[ZoneTransition]], None] | None = None,
+    ) -> None:
+        self.min_frames = max(1, min_frames)
+        self.min_seconds = max(0.0, min_seconds)
+        self.on_transitions = on_transitions
+        self._machines: Dict[str, Dict[str, _ZoneMachine]] = defaultdict(dict)
+        self._lock = threading.Lock()
+
+    def update(self, camera_id: str, states: Dict[str, str], ts: float) -> List[ZoneTransition]:
+        transitions: List[ZoneTransition] = []
+        with self._lock:
+            machines = self._machines[camera_id]
+            for zone, observed in states.items():
+                machine = machines.get(zone)
+                if machine is None:
+                    machines[zone] = _ZoneMachine(observed, ts)
+                    continue
+                change = machine.update(observed, ts, self.min_frames, self.min_seconds)
+                if change is not None:
+                    previous, dwell = change
+                    transitions.append(ZoneTransition(machine.since, camera_id, zone, previous, observed, dwell))
+        if transitions and self.on_transitions is not None:
+            self.on_transitions(transitions)
+        return transitions
+
+    def observe(self, packet) -> None:
+        """``DetectionPipeline`` hook: debounce one evaluated ``FramePacket``."""
+        if packet.eval_data:
+            self.update(packet.camera_id, packet.eval_data["truck_zone_state"], packet.capture_ts)
+
+    def current(self, camera_id: str, now: float) -> Dict[str, tuple[str, float]]:
+        """Debounced state of each bay and how many seconds it has been in it."""
+        with self._lock:
+            return {zone: (m.state, max(0.0, now - m.since)) for zone, m in self._machines[camera_id].items()}
+
+
+class ZoneTransitionLog:
+    """Append-only CSV of transitions; a few rows per truck visit, so each batch is written directly."""
+
+    def __init__(self, path: str) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def append(self, transitions: Iterable[ZoneTransition]) -> None:
+        rows = [t.as_row() for t in transitions]
+        if not rows:
+            return
+        with self._lock:
+            new_file = not self.path.exists() or self.path.stat().st_size == 0
+            with self.path.open("a", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fieldnames=TRANSITION_FIELDS)
+                if new_file:
+                    writer.writeheader()
+                writer.writerows(rows)
+
+
+def transition_sink(path: str) -> Callable[[List[ZoneTransition]], None]:
+    """Writer for ``path``: the SQLite event store for ``.db`` paths, a CSV log otherwise."""
+    if is_sqlite_path(path):
+        from event_store import open_store
+
+        store = open_store(path)
+        return lambda transitions: store.add_zone_transitions(t.as_row() for t in transitions)
+    return ZoneTransitionLog(path).append
+
+
+def read_transitions(path: str) -> List[Dict[str, str]]:
+    """Oldest-first transition rows from a CSV log or the SQLite event store."""
+    if is_sqlite_path(path):
+        from event_store import open_store
+
+        return open_store(path).zone_transitions()
+    if not Path(path).exists():
+        return []
+    with Path(path).open("r", newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def dwell_totals(rows: Iterable[Dict[str, str]]) -> Dict[tuple[str, str], Dict[str, float]]:
+    """Seconds spent in each state per (camera, bay), summed from a transition log.
+
+    Utilization of a bay is ``totals["occupied"] / sum(totals.values())``.
+    """
+    totals: Dict[tuple[str, str], Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    for row in rows:
+        totals[(row["camera_id"], row["zone"])][row["from_state"]] += float(row["dwell_seconds"] or 0.0)
+    return {key: dict(states) for key, states in totals.items()}
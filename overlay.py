@@ -0,0 +1,211 @@
+"""Allocation-free overlay rendering helpers for the video panel.
+
+Zone outlines and labels only change when a zone is edited or a bay changes
+state, so ``ZoneLayer`` rasterizes them once and then only composites them
+onto each frame: outlines with a masked copy, anti-aliased labels by blending
+their small bounding boxes. Whether anything changed is decided from the
+``ZoneIndex`` version and the bay states, without building a signature. Frames
+are converted into a small ring of preallocated buffers, so the per-frame
+BGR->RGB conversion doubles as the copy that used to be ``frame.copy()``.
+
+``DisplayScheduler`` caps how often frames are rendered for the screen and
+hands each rendered frame to the Tk loop exactly once.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, List, NamedTuple, Sequence
+
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from zones import ZoneIndex, is_polygon, zone_bounds, zone_points
+
+# RGB, since overlays are drawn after the BGR->RGB conversion.
+BAY_COLORS = {"occupied": (0, 200, 0), "warning": (255, 255, 0), "free": (255, 0, 0)}
+WARN_ZONE_COLOR = (255, 0, 0)
+OTHER_ZONE_COLOR = (255, 105, 180)
+DETECTION_COLORS = {"truck": (0, 200, 0), "car": (255, 0, 0)}  # anything else: OTHER_ZONE_COLOR
+LABEL_FONT = cv2.FONT_HERSHEY_SIMPLEX
+LABEL_SCALE = 0.5
+
+
+def zone_color(key: str, state: str | None) -> tuple[int, int, int]:
+    if key.startswith("truck_space"):
+        return BAY_COLORS.get(state or "free", BAY_COLORS["free"])
+    if key == "warn_car":
+        return WARN_ZONE_COLOR
+    return OTHER_ZONE_COLOR
+
+
+class ZoneLayer:
+    """Pre-rendered zone outlines/labels, re-rasterized only when zones or bay states change."""
+
+    def __init__(self) -> None:
+        self._version = 0
+        self._shape: tuple[int, ...] = ()
+        self._states: Dict[str, str] = {}
+        self._layer: np.ndarray | None = None
+        self._mask: np.ndarray | None = None
+        self._labels: List[_Label] = []
+        self.renders = 0
+
+    def update(self, index: ZoneIndex, states: Dict[str, str], shape: tuple[int, ...]) -> bool:
+        """Re-rasterize if anything drawn changed; returns True when it did."""
+        version = index.version  # read first: an edit while we draw then shows up next frame
+        if version == self._version and shape == self._shape and states == self._states:
+            return False
+        zones = index.zones
+        height, width = shape[:2]
+        self._layer = np.zeros(shape, dtype=np.uint8)
+        self._mask = np.zeros((height, width), dtype=np.uint8)
+        self._labels = []
+        for key, zone in zones.items():
+            color = zone_color(key, states.get(key))
+            x1, y1, x2, y2 = zone_bounds(zone)
+            for target, ink in ((self._layer, color), (self._mask, 255)):
+                if is_polygon(zone):
+                    cv2.polylines(target, [zone_points(zone)], True, ink, 2)
+                else:
+                    cv2.rectangle(target, (x1, y1), (x2, y2), ink, 2)
+            label = _Label.render(key, (x1, max(15, y1 - 6)), color, width, height)
+            if label is not None:
+                self._labels.append(label)
+        self._version, self._shape, self._states = version, shape, dict(states)
+        self.renders += 1
+        return True
+
+    def composite(self, dst: np.ndarray) -> None:
+        """Draw the layer onto ``dst`` (same shape as the layer) in place."""
+        if self._layer is None:
+            return
+        cv2.copyTo(self._layer, self._mask, dst)
+        for label in self._labels:
+            label.blend(dst)
+
+
+class _Label:
+    """One anti-aliased zone label, blended within its bounding box with preallocated scratch."""
+
+    def __init__(self, rows: slice, cols: slice, keep: np.ndarray, ink: np.ndarray) -> None:
+        self.rows, self.cols = rows, cols
+        self.keep = keep
+        self.ink = ink
+        self._scratch = np.empty(ink.shape, dtype=np.float32)
+
+    @classmethod
+    def render(cls, text: str, org: tuple[int, int], color, width: int, height: int) -> "_Label | None":
+        (text_w, text_h), baseline = cv2.getTextSize(text, LABEL_FONT, LABEL_SCALE, 1)
+        x, y = org
+        rows = slice(max(0, y - text_h - 2), min(height, y + baseline + 2))
+        cols = slice(max(0, x - 2), min(width, x + text_w + 2))
+        if rows.start >= rows.stop or cols.start >= cols.stop:
+            return None
+        # Coverage of the text inside its box; ink = color * coverage (+0.5 so the uint8 cast rounds).
+        coverage = np.zeros((rows.stop - rows.start, cols.stop - cols.start), dtype=np.uint8)
+        cv2.putText(coverage, text, (x - cols.start, y - rows.start), LABEL_FONT, LABEL_SCALE, 255, 1)
+        alpha = (coverage.astype(np.float32) / 255.0)[..., None]
+        ink = alpha * np.array(color, dtype=np.float32) + 0.5
+        return cls(rows, cols, np.repeat(1.0 - alpha, 3, axis=2), ink)
+
+    def blend(self, dst: np.ndarray) -> None:
+        roi = dst[self.rows, self.cols]
+        np.multiply(roi, self.keep, out=self._scratch)
+        self._scratch += self.ink
+        np.copyto(roi, self._scratch, casting="unsafe")
+
+
+class BufferRing:
+    """A few preallocated frame buffers handed out round-robin.
+
+    The render thread fills the next buffer while the GUI thread may still be
+    painting one and another may be published but not yet taken, so
+    ``next(avoid=...)`` skips those (``DisplayScheduler.in_use()``).
+    """
+
+    def __init__(self, count: int = 3) -> None:
+        self.count = max(2, count)
+        self._buffers: List[np.ndarray] = []
+        self._next = 0
+
+    def next(self, shape: tuple[int, ...], avoid: Sequence[np.ndarray] = ()) -> np.ndarray:
+        if not self._buffers or self._buffers[0].shape != shape:
+            self._buffers = [np.empty(shape, dtype=np.uint8) for _ in range(self.count)]
+        for _ in range(self.count):
+            buffer = self._buffers[self._next]
+            self._next = (self._next + 1) % self.count
+            if not any(buffer is busy for busy in avoid):
+                return buffer
+        raise RuntimeError(f"all {self.count} frame buffers are in use")
+
+
+class DisplayFrame(NamedTuple):
+    frame_id: int
+    output: np.ndarray
+    capture_ts: float
+
+
+class DisplayScheduler:
+    """Paces GUI repaints at ``fps``, independently of capture and inference.
+
+    The render thread asks ``due()`` before drawing a frame and ``publish()``es
+    the result; the Tk loop ``take()``s it, getting each frame only once, so
+    nothing is converted or pasted when no new frame was rendered. A taken
+    frame counts as being painted until ``painted()``; ``in_use()`` lists the
+    buffers the render thread must not draw into.
+    """
+
+    def __init__(self, fps: float) -> None:
+        self.interval = 1.0 / fps if fps > 0 else 0.0
+        self._next_due = 0.0
+        self._frame: DisplayFrame | None = None
+        self._painting: np.ndarray | None = None
+        self._lock = threading.Lock()
+
+    def due(self) -> bool:
+        """True (and the next slot booked) when a frame may be rendered now."""
+        now = time.perf_counter()
+        with self._lock:
+            # A quarter interval of slack, so camera jitter doesn't turn a 15 FPS cap on 30 FPS input into 10.
+            if now < self._next_due - self.interval / 4:
+                return False
+            # Book from the slot just used, unless the display sat idle for longer than an interval.
+            base = self._next_due if now - self._next_due < self.interval else now
+            self._next_due = base + self.interval
+            return True
+
+    def publish(self, frame_id: int, output: np.ndarray, capture_ts: float) -> None:
+        with self._lock:
+            self._frame = DisplayFrame(frame_id, output, capture_ts)
+
+    def take(self) -> DisplayFrame | None:
+        with self._lock:
+            frame, self._frame = self._frame, None
+            if frame is not None:
+                self._painting = frame.output
+            return frame
+
+    def painted(self) -> None:
+        """The taken frame has been copied to the screen; its buffer may be reused."""
+        with self._lock:
+            self._painting = None
+
+    def in_use(self) -> tuple[np.ndarray, ...]:
+        """The published-but-not-taken buffer and the one being painted."""
+        with self._lock:
+            published = self._frame.output if self._frame is not None else None
+            return tuple(buffer for buffer in (published, self._painting) if buffer is not None)
+
+    def poll_ms(self, started: float) -> int:
+        """Delay until the Tk loop should look again, given when this tick started."""
+        spent = time.perf_counter() - started
+        return max(5, int(((self.interval or 0.015) - spent) * 1000))
+
+    def reset(self) -> None:
+        """Drop whatever was rendered for the previous camera."""
+        with self._lock:
+            self._frame = None
+            self._next_due = 0.0
@@ -0,0 +1,391 @@
+"""Background capture -> inference -> evaluate -> render pipeline."""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List
+
+import cv2
+
+from camera import LatestFrameReader
+from detector import DepotDetector, DetectionBatch
+from metrics import METRICS
+from motion import MotionGate
+from tracking import DetectionTracker
+from zones import Box, ZoneIndex, ZoneMap, zones_roi
+
+STAGES = ("capture", "inference", "evaluate", "render")
+
+
+@dataclass
+class FramePacket:
+    camera_id: str
+    frame_id: int
+    frame: Any
+    capture_ts: float
+    detections: DetectionBatch = field(default_factory=DetectionBatch.empty)
+    detected: bool = False
+    motion: bool = True
+    eval_data: Dict[str, object] = field(default_factory=dict)
+    zone_index: ZoneIndex | None = None  # the zones eval_data was computed against
+    generation: int = 0  # capture generation of the camera when the frame was read
+    output: Any = None
+    stage_ms: Dict[str, float] = field(default_factory=dict)
+
+
+def put_latest(q: queue.Queue, item: object) -> bool:
+    """Put into a bounded queue, dropping the oldest item when full.
+
+    Returns True if an older item had to be dropped.
+    """
+    dropped = False
+    while True:
+        try:
+            q.put_nowait(item)
+            return dropped
+        except queue.Full:
+            try:
+                q.get_nowait()
+                dropped = True
+            except queue.Empty:
+                pass
+
+
+class DetectionPipeline:
+    """Runs capture, inference, evaluation and overlay rendering on worker threads.
+
+    Each stage hands batches (one packet per camera with a fresh frame) to the
+    next through a small bounded queue that drops the oldest entry when full,
+    so a slow stage never builds a backlog. Frames from all cameras go through
+    a single batched ``submit_batch`` call per detection cycle. The GUI only
+    reads the most recent finished packet per camera via ``latest()``.
+    """
+
+    def __init__(
+        self,
+        detector: DepotDetector,
+        zones_by_camera: Dict[str, ZoneMap],
+        frame_size: tuple[int, int],
+        target_dps: float,
+        ttl_frames: int,
+        renderer: Callable[[FramePacket], Any] | None = None,
+        queue_size: int = 2,
+        roi_margin: int | None = None,
+        motion_gate: Callable[[], MotionGate] | None = None,
+        tracker: Callable[[], DetectionTracker] | None = None,
+        on_evaluated: Callable[[FramePacket], None] | None = None,
+    ) -> None:
+        self.detector = detector
+        self.frame_size = frame_size
+        self.target_dps = target_dps
+        self.renderer = renderer
+        self.on_evaluated = on_evaluated
+        self.roi_margin = roi_margin
+
+        self._zones: Dict[str, ZoneMap] = {cam: dict(z) for cam, z in zones_by_camera.items()}
+        # Label masks are rasterized once here and then only for zones that get edited.
+        self._zone_indexes: Dict[str, ZoneIndex] = {cam: ZoneIndex(z) for cam, z in zones_by_camera.items()}
+        self._zones_dirty: set[str] = set()
+        self._rois: Dict[str, Box | None] = {cam: self._compute_roi(z) for cam, z in zones_by_camera.items()}
+        make_tracker = tracker or (lambda: DetectionTracker(ttl_frames))
+        self._trackers: Dict[str, DetectionTracker] = {cam: make_tracker() for cam in zones_by_camera}
+        self._motion_gates: Dict[str, MotionGate] = {}
+        if motion_gate is not None:
+            for cam, zones in zones_by_camera.items():
+                self._motion_gates[cam] = motion_gate()
+                self._motion_gates[cam].set_zones(zones)
+        self._last_detection_ts: Dict[str, float] = {cam: 0.0 for cam in zones_by_camera}
+        self._readers: Dict[str, LatestFrameReader] = {}
+        # Bumped by set_capture; frames read from an older capture are dropped when they come back.
+        self._generations: Dict[str, int] = {cam: 0 for cam in zones_by_camera}
+        self._cap_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._reset_tracks: set[str] = set()
+
+        size = max(1, queue_size)
+        self._capture_q: queue.Queue[List[FramePacket]] = queue.Queue(maxsize=size)
+        self._evaluate_q: queue.Queue[List[FramePacket]] = queue.Queue(maxsize=size)
+        self._render_q: queue.Queue[List[FramePacket]] = queue.Queue(maxsize=size)
+
+        self._latest: Dict[str, FramePacket] = {}
+        self._frame_counter = 0
+        self._stage_avg_ms: Dict[str, float] = {name: 0.0 for name in STAGES}
+        self.dropped_frames: Dict[str, int] = {name: 0 for name in STAGES}
+        self.status: Dict[str, str] = {cam: "Camera not connected" for cam in zones_by_camera}
+
+        self._stop_event = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def camera_ids(self) -> List[str]:
+        return list(self._zones)
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        self._stop_event.clear()
+        for name, target in (
+            ("capture", self._capture_loop),
+            ("inference", self._inference_loop),
+            ("evaluate", self._evaluate_loop),
+            ("render", self._render_loop),
+        ):
+            thread = threading.Thread(target=target, name=f"pipeline-{name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        for thread in self._threads:
+            thread.join(timeout=2.0)
+        self._threads = []
+        for camera_id in self.camera_ids:
+            self.set_capture(camera_id, None)
+
+    def reader(self, camera_id: str) -> LatestFrameReader | None:
+        return self._readers.get(camera_id)
+
+    def set_capture(self, camera_id: str, cap: LatestFrameReader | None) -> None:
+        """Swap a camera's capture source; the previous one is released."""
+        with self._cap_lock:
+            old_cap = self._readers.pop(camera_id, None)
+            if cap is not None:
+                self._readers[camera_id] = cap
+            self._generations[camera_id] = self._generations.get(camera_id, 0) + 1
+        if old_cap is not None and old_cap is not cap:
+            old_cap.release()
+        with self._state_lock:
+            self._reset_tracks.add(camera_id)
+            self._last_detection_ts[camera_id] = 0.0
+            self._latest.pop(camera_id, None)
+        self.status[camera_id] = "Camera not connected" if cap is None else "Waiting for frames"
+
+    def _compute_roi(self, zones: ZoneMap) -> Box | None:
+        if self.roi_margin is None:
+            return None
+        return zones_roi(zones, self.roi_margin, *self.frame_size)
+
+    def set_zones(self, camera_id: str, zones: ZoneMap) -> None:
+        roi = self._compute_roi(zones)
+        with self._state_lock:
+            self._zones[camera_id] = dict(zones)
+            self._zones_dirty.add(camera_id)
+            self._rois[camera_id] = roi
+        gate = self._motion_gates.get(camera_id)
+        if gate is not None:
+            gate.set_zones(zones)
+
+    def roi(self, camera_id: str) -> Box | None:
+        """Inference crop for a camera (None = full frame)."""
+        return self._rois.get(camera_id)
+
+    def latest(self, camera_id: str) -> FramePacket | None:
+        with self._state_lock:
+            return self._latest.get(camera_id)
+
+    def track_dwell(self, camera_id: str, now: float) -> Dict[int, float]:
+        """Seconds each current track of the camera has been followed, by track id."""
+        tracker = self._trackers.get(camera_id)
+        return tracker.dwell(now) if tracker is not None else {}
+
+    def motion_stats(self, camera_id: str) -> Dict[str, float] | None:
+        gate = self._motion_gates.get(camera_id)
+        if gate is None:
+            return None
+        return {
+            "frames_checked": gate.frames_checked,
+            "motion_frames": gate.motion_frames,
+            "inferences": gate.inferences,
+            "inferences_saved": gate.inferences_saved,
+            "target_dps": gate.target_dps(time.perf_counter()),
+        }
+
+    def stage_timings(self) -> Dict[str, float]:
+        """Smoothed per-stage latency in milliseconds (per batch)."""
+        return dict(self._stage_avg_ms)
+
+    def _record(self, batch: List[FramePacket], stage: str, started: float) -> None:
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        for packet in batch:
+            packet.stage_ms[stage] = elapsed_ms
+        prev = self._stage_avg_ms[stage]
+        self._stage_avg_ms[stage] = elapsed_ms if prev == 0.0 else prev * 0.9 + elapsed_ms * 0.1
+
+    def _handoff(self, q: queue.Queue, batch: List[FramePacket], stage: str) -> None:
+        if put_latest(q, batch):
+            self.dropped_frames[stage] += 1
+
+    def _take(self, q: queue.Queue) -> List[FramePacket] | None:
+        try:
+            return q.get(timeout=0.2)
+        except queue.Empty:
+            return None
+
+    def _capture_loop(self) -> None:
+        while not self._stop_event.is_set():
+            with self._cap_lock:
+                readers = [(cam, reader, self._generations.get(cam, 0)) for cam, reader in self._readers.items()]
+            if not readers:
+                time.sleep(0.2)
+                continue
+
+            started = time.perf_counter()
+            batch: List[FramePacket] = []
+            for camera_id, reader, generation in readers:
+                # Single camera: block for the next frame. Several: poll each without waiting.
+                captured = reader.read_latest(timeout=0.5 if len(readers) == 1 else 0.0)
+                if captured is None:
+                    if reader.failing:
+                        self.status[camera_id] = "Camera read failed"
+                    continue
+                self.status[camera_id] = "Streaming"
+                self._frame_counter += 1
+                with METRICS.time("resize"):
+                    frame = cv2.resize(captured.frame, self.frame_size)
+                packet = FramePacket(
+                    camera_id=camera_id,
+                    frame_id=self._frame_counter,
+                    frame=frame,
+                    capture_ts=captured.timestamp,
+                    generation=generation,
+                )
+                gate = self._motion_gates.get(camera_id)
+                if gate is not None:
+                    packet.motion = gate.update(packet.frame, time.perf_counter())
+                batch.append(packet)
+            if not batch:
+                if len(readers) > 1:
+                    time.sleep(0.005)
+                continue
+            self._record(batch, "capture", started)
+            self._handoff(self._capture_q, batch, "capture")
+
+    def _inference_loop(self) -> None:
+        # Batches waiting for detections, oldest first. A worker-pool detector
+        # runs several at once; they are finished in capture order so every
+        # camera's tracker still sees its frames in sequence.
+        in_flight: Deque[tuple[List[FramePacket], Future | None, float]] = deque()
+        while not self._stop_event.is_set():
+            outstanding = [future for _, future, _ in in_flight if future is not None]
+            if len(outstanding) < self.detector.max_in_flight:
+                try:
+                    batch = self._capture_q.get(timeout=0.005 if in_flight else 0.2)
+                    in_flight.append(self._submit_detection(batch))
+                except queue.Empty:
+                    pass
+            else:
+                # Every worker is busy: wait for the oldest outstanding batch.
+                wait(outstanding[:1], timeout=0.2)
+            while in_flight and (in_flight[0][1] is None or in_flight[0][1].done()):
+                self._finish_detection(*in_flight.popleft())
+
+    def _submit_detection(self, batch: List[FramePacket]) -> tuple[List[FramePacket], Future | None, float]:
+        started = now = time.perf_counter()
+        due: List[FramePacket] = []
+        # Until the model has loaded, frames flow through without detections.
+        if self.detector.ready:
+            due = [packet for packet in batch if self._detection_due(packet.camera_id, now)]
+        if not due:
+            return batch, None, started
+        try:
+            future = self.detector.submit_batch(
+                [packet.frame for packet in due],
+                [self._rois.get(packet.camera_id) for packet in due],
+            )
+        except Exception as exc:  # e.g. a worker pool that lost a process
+            print(f"inference failed: {exc}", flush=True)
+            return batch, None, started
+        for packet in due:
+            self._last_detection_ts[packet.camera_id] = now
+            packet.detected = True
+        return batch, future, started
+
+    def _finish_detection(self, batch: List[FramePacket], future: Future | None, started: float) -> None:
+        with self._state_lock:
+            for camera_id in self._reset_tracks:
+                self._trackers[camera_id].reset()
+            self._reset_tracks.clear()
+        if future is not None:
+            due = [packet for packet in batch if packet.detected]
+            try:
+                results = future.result()
+            except Exception as exc:
+                print(f"inference failed: {exc}", flush=True)
+                for packet in due:
+                    packet.detected = False
+            else:
+                for packet, detections in zip(due, results):
+                    if self._is_stale(packet):
+                        continue
+                    self._trackers[packet.camera_id].update(detections, packet.capture_ts)
+                    METRICS.mark("inference_fps")
+        # Frames from a capture that was swapped while they were in flight must
+        # not reach the freshly reset tracker or the bay states.
+        batch = [packet for packet in batch if not self._is_stale(packet)]
+        if not batch:
+            return
+        now = time.perf_counter()
+        for packet in batch:
+            if packet.detected:
+                continue
+            gate = self._motion_gates.get(packet.camera_id)
+            # While a gated camera is idle, hold the last detections instead of
+            # letting their TTL run out between keep-alive cycles.
+            if gate is None or not gate.is_idle(now):
+                self._trackers[packet.camera_id].decay(packet.capture_ts)
+        for packet in batch:
+            packet.detections = self._trackers[packet.camera_id].detections()
+        self._record(batch, "inference", started)
+        self._handoff(self._evaluate_q, batch, "inference")
+
+    def _is_stale(self, packet: FramePacket) -> bool:
+        return packet.generation != self._generations.get(packet.camera_id)
+
+    def _detection_due(self, camera_id: str, now: float) -> bool:
+        gate = self._motion_gates.get(camera_id)
+        if gate is not None:
+            return gate.due(now)
+        last = self._last_detection_ts.get(camera_id, 0.0)
+        return self.target_dps <= 0 or (now - last) >= (1.0 / self.target_dps)
+
+    def _evaluate_loop(self) -> None:
+        while not self._stop_event.is_set():
+            batch = self._take(self._evaluate_q)
+            if batch is None:
+                continue
+            started = time.perf_counter()
+            with self._state_lock:
+                for camera_id in self._zones_dirty:
+                    self._zone_indexes[camera_id] = self._zone_indexes[camera_id].sync(self._zones[camera_id])
+                self._zones_dirty.clear()
+            for packet in batch:
+                packet.zone_index = self._zone_indexes[packet.camera_id]
+                with METRICS.time("evaluate"):
+                    packet.eval_data = self.detector.evaluate(packet.detections, packet.zone_index)
+                if self.on_evaluated is not None:
+                    self.on_evaluated(packet)
+            self._record(batch, "evaluate", started)
+            self._handoff(self._render_q, batch, "evaluate")
+
+    def _render_loop(self) -> None:
+        while not self._stop_event.is_set():
+            batch = self._take(self._render_q)
+            if batch is None:
+                continue
+            started = time.perf_counter()
+            if self.renderer is not None:
+                for packet in batch:
+                    packet.output = self.renderer(packet)
+            self._record(batch, "render", started)
+            with self._state_lock:
+                for packet in batch:
+                    if not self._is_stale(packet):
+                        self._latest[packet.camera_id] = packet
+            now = time.time()
+            for packet in batch:
+                METRICS.record("frame_age", (now - packet.capture_ts) * 1000.0)
@@ -0,0 +1,233 @@
+"""Offline replay: re-run occupancy over recorded video files or image folders.
+
+Frames are decoded on a background thread and pushed through
+``DepotDetector.detect_batch`` as fast as the CPU allows (no TARGET_DPS
+pacing). The per-frame timeline is written as CSV, one letter per bay:
+``F`` free, ``O`` occupied, ``W`` warning. Use a ``.gz`` output name to
+compress it.
+
+Example:
+    python replay.py footage/day1.mp4 --every 5 --output day1_timeline.csv.gz
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import gzip
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Sequence
+
+import cv2
+
+from app_config import (
+    ALLOWED_LABELS,
+    CONF_THRESHOLD,
+    DETECTION_TTL_FRAMES,
+    FRAME_HEIGHT,
+    FRAME_WIDTH,
+    IMG_SIZE,
+    INFERENCE_BACKEND,
+    MODEL_PATH,
+    NMS_IOU_THRESHOLD,
+    ROI_MARGIN,
+    TRACK_MATCH_RADIUS,
+    TRACK_MIN_IOU,
+    TRACK_PREDICT_SECONDS,
+    ZONES_PATH,
+)
+from backends import BACKENDS
+from detector import DepotDetector
+from tracking import DetectionTracker
+from zones import ZoneIndex, load_zones, zones_roi
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+STATE_CODES = {"free": "F", "occupied": "O", "warning": "W"}
+
+
+@dataclass
+class ReplayFrame:
+    input_path: str
+    source: str
+    index: int
+    time_s: float | None
+    frame: Any
+
+
+def iter_frames(path: str, every: int = 1) -> Iterator[ReplayFrame]:
+    """Yield every ``every``-th frame of a video file or an image directory."""
+    every = max(1, every)
+    source = Path(path)
+    if source.is_dir():
+        images = sorted(p for p in source.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+        for index, image_path in enumerate(images):
+            if index % every:
+                continue
+            frame = cv2.imread(str(image_path))
+            if frame is not None:
+                yield ReplayFrame(input_path=path, source=image_path.name, index=index, time_s=None, frame=frame)
+        return
+
+    cap = cv2.VideoCapture(str(source))
+    if not cap.isOpened():
+        raise OSError(f"Could not open video {path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+    index = 0
+    try:
+        while True:
+            # Skipped frames are only grabbed, not decoded.
+            if not cap.grab():
+                break
+            if index % every == 0:
+                ok, frame = cap.retrieve()
+                if ok:
+                    time_s = index / fps if fps > 0 else None
+                    yield ReplayFrame(input_path=path, source=source.name, index=index, time_s=time_s, frame=frame)
+            index += 1
+    finally:
+        cap.release()
+
+
+class FrameDecoder:
+    """Decodes sources on a background thread into a bounded queue."""
+
+    _DONE = object()
+
+    def __init__(self, paths: Sequence[str], every: int, frame_size: tuple[int, int], buffer: int = 64) -> None:
+        self.paths = list(paths)
+        self.every = every
+        self.frame_size = frame_size
+        self.error: Exception | None = None
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, buffer))
+        self._thread = threading.Thread(target=self._run, name="replay-decoder", daemon=True)
+
+    def start(self) -> "FrameDecoder":
+        self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        try:
+            for path in self.paths:
+                for item in iter_frames(path, self.every):
+                    item.frame = cv2.resize(item.frame, self.frame_size)
+                    self._queue.put(item)
+        except Exception as exc:
+            self.error = exc
+        finally:
+            self._queue.put(self._DONE)
+
+    def batches(self, batch_size: int) -> Iterator[List[ReplayFrame]]:
+        batch: List[ReplayFrame] = []
+        while True:
+            item = self._queue.get()
+            if item is self._DONE:
+                break
+            batch.append(item)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def _open_output(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "wt", newline="", encoding="utf-8")
+    return open(path, "w", newline="", encoding="utf-8")
+
+
+def replay(
+    paths: Sequence[str],
+    detector: DepotDetector,
+    zones_path: str,
+    output_path: str,
+    every: int = 1,
+    batch_size: int = 8,
+    roi_margin: int | None = None,
+) -> Dict[str, float]:
+    zones = load_zones(zones_path, FRAME_WIDTH, FRAME_HEIGHT)
+    zone_index = ZoneIndex(zones)
+    roi = zones_roi(zones, roi_margin, FRAME_WIDTH, FRAME_HEIGHT) if roi_margin is not None else None
+    tracker = DetectionTracker(
+        DETECTION_TTL_FRAMES, TRACK_MATCH_RADIUS, TRACK_MIN_IOU, predict_seconds=TRACK_PREDICT_SECONDS
+    )
+    bay_keys = list(zone_index.truck_keys)
+
+    decoder = FrameDecoder(paths, every, (FRAME_WIDTH, FRAME_HEIGHT)).start()
+    frames = 0
+    current_input = None
+    started = time.perf_counter()
+    last_report = started
+    with _open_output(output_path) as f:
+        writer = csv.writer(f)
+        writer.writerow(["source", "frame", "time_s", *bay_keys, "warnings"])
+        for batch in decoder.batches(max(1, batch_size)):
+            results = detector.detect_batch([item.frame for item in batch], [roi] * len(batch))
+            for item, detections in zip(batch, results):
+                if item.input_path != current_input:
+                    # Detections must not carry over from one recording into the next.
+                    tracker.reset()
+                    current_input = item.input_path
+                # Video time, so velocities and prediction don't depend on how fast we decode.
+                tracker.update(detections, item.time_s)
+                eval_data = detector.evaluate(tracker.detections(), zone_index)
+                states = eval_data["truck_zone_state"]
+                writer.writerow(
+                    [
+                        item.source,
+                        item.index,
+                        "" if item.time_s is None else f"{item.time_s:.2f}",
+                        *(STATE_CODES.get(states[key], "?") for key in bay_keys),
+                        ";".join(eval_data["warnings"]),
+                    ]
+                )
+            frames += len(batch)
+            now = time.perf_counter()
+            if now - last_report >= 5.0:
+                print(f"{frames} frames, {frames / (now - started):.1f} frames/sec", flush=True)
+                last_report = now
+    if decoder.error is not None:
+        raise decoder.error
+
+    elapsed = time.perf_counter() - started
+    return {"frames": frames, "seconds": elapsed, "fps": frames / elapsed if elapsed > 0 else 0.0}
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Replay recorded footage through the depot detector")
+    parser.add_argument("inputs", nargs="+", help="video files and/or directories of images")
+    parser.add_argument("--output", default="replay_timeline.csv", help="timeline CSV (.gz to compress)")
+    parser.add_argument("--zones", default=ZONES_PATH, help="zone file to evaluate against")
+    parser.add_argument("--every", type=int, default=1, help="process every Nth frame")
+    parser.add_argument("--batch-size", type=int, default=8, help="frames per YOLO call")
+    parser.add_argument("--model", default=MODEL_PATH, help=".pt, .onnx or OpenVINO .xml model")
+    parser.add_argument("--backend", default=INFERENCE_BACKEND, choices=("auto", *BACKENDS))
+    parser.add_argument("--img-size", type=int, default=IMG_SIZE)
+    parser.add_argument("--conf", type=float, default=CONF_THRESHOLD)
+    parser.add_argument("--roi", action="store_true", help=f"crop inference to the zones (+{ROI_MARGIN} px)")
+    args = parser.parse_args(argv)
+
+    detector = DepotDetector(
+        args.model, args.conf, args.img_size, ALLOWED_LABELS, backend=args.backend, iou_threshold=NMS_IOU_THRESHOLD
+    )
+    stats = replay(
+        args.inputs,
+        detector,
+        args.zones,
+        args.output,
+        every=args.every,
+        batch_size=args.batch_size,
+        roi_margin=ROI_MARGIN if args.roi else None,
+    )
+    print(
+        f"{stats['frames']} frames in {stats['seconds']:.1f} s = {stats['fps']:.1f} frames/sec "
+        f"(model={args.model}, backend={detector.backend.name}, imgsz={args.img_size}) -> {args.output}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,35 @@
-"""RFID ingress/egress CSV utilities."""
+"""RFID ingress/egress CSV utilities.
+
+A log path ending in ``.db``/``.sqlite``/``.sqlite3`` is stored in SQLite
+instead (see ``event_store.py``); the functions below dispatch on the path.
+"""
 
 from __future__ import annotations
 
 import csv
-from datetime import datetime
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import date, datetime
+from itertools import islice
 from pathlib import Path
-from typing import Dict, List
+from typing import Callable, Deque, Dict, List, TextIO
 
 CSV_HEADERS = ["timestamp", "event", "tag_id", "notes"]
+FSYNC_POLICIES = ("never", "batch", "always")
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+
+
+def is_sqlite_path(path: str) -> bool:
+    return Path(path).suffix.lower() in SQLITE_SUFFIXES
+
+
+def _store(path: str):
+    from event_store import open_store  # event_store imports this module
+
+    return open_store(path)
 
 
 def ensure_csv(path: str) -> None:
@@ -19,26 +41,303 @@ def ensure_csv(path: str) -> None:
         writer.writeheader()
 
 
-def add_rfid_event(path: str, event: str, tag_id: str, notes: str = "") -> None:
-    """Append an ingress/egress RFID event row to CSV."""
-    ensure_csv(path)
-    record = {
+def make_record(event: str, tag_id: str, notes: str = "") -> Dict[str, str]:
+    return {
         "timestamp": datetime.now().isoformat(timespec="seconds"),
         "event": event,
         "tag_id": tag_id,
         "notes": notes,
     }
+
+
+def add_rfid_event(path: str, event: str, tag_id: str, notes: str = "") -> Dict[str, str]:
+    """Append an ingress/egress RFID event row to CSV and return it."""
+    record = make_record(event, tag_id, notes)
+    if is_sqlite_path(path):
+        _store(path).add_rfid_events([record])
+        return record
+    ensure_csv(path)
     with Path(path).open("a", newline="", encoding="utf-8") as f:
         writer = csv.DictWriter(f, fieldnames=CSV_HEADERS)
         writer.writerow(record)
+    return record
 
 
-def read_rfid_events(path: str, limit: int = 200) -> List[Dict[str, str]]:
+def tail_lines(path: str, count: int, block_size: int = 65536) -> List[str]:
+    """Last ``count`` non-empty lines of a text file, read backwards in blocks from the end."""
+    with Path(path).open("rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        data = b""
+        while pos > 0 and data.count(b"\n") <= count:
+            step = min(block_size, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+    lines = data.split(b"\n")
+    if pos > 0:
+        lines = lines[1:]  # starts mid-line
+    decoded = [line.decode("utf-8", errors="replace").rstrip("\r") for line in lines]
+    return [line for line in decoded if line][-count:]
+
+
+def read_rfid_events(path: str, limit: int = 200, offset: int = 0) -> List[Dict[str, str]]:
+    """Newest-first rows, skipping the ``offset`` newest.
+
+    With ``limit > 0`` only the tail of the file (``offset + limit`` lines) is
+    read and parsed, so paging back through history never loads the whole log.
+    """
+    if is_sqlite_path(path):
+        return _store(path).recent_rfid_events(limit, offset)
     ensure_csv(path)
-    with Path(path).open("r", newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        rows = list(reader)
-    if limit > 0:
-        rows = rows[-limit:]
+    if limit <= 0:
+        with Path(path).open("r", newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        rows.reverse()
+        return rows[offset:]
+
+    rows = []
+    # One extra line in case the tail reaches back to the header.
+    for values in csv.reader(tail_lines(path, offset + limit + 1)):
+        if values == CSV_HEADERS:
+            continue
+        values += [""] * (len(CSV_HEADERS) - len(values))
+        rows.append(dict(zip(CSV_HEADERS, values)))
     rows.reverse()
-    return rows
+    return rows[offset : offset + limit]
+
+
+class RFIDLogWriter:
+    """Buffered CSV appender for RFID events, with fsync policy and rotation.
+
+    ``write()`` only timestamps the event and queues it; a background thread
+    appends queued rows through one open file handle once ``flush_rows`` are
+    waiting or every ``flush_seconds``. ``fsync`` is ``"never"`` (leave it to
+    the OS), ``"batch"`` (fsync after each batch) or ``"always"`` (``write()``
+    itself appends and fsyncs before returning).
+
+    The log is rotated to ``<name>.<stamp>.csv`` when it reaches ``max_bytes``
+    (0 = no limit) or, with ``rotate_daily``, on the first write of a new day;
+    only the newest ``backups`` rotated files are kept (0 = keep all).
+
+    The last ``ring_size`` events (seeded from the tail of the log) are also
+    kept in memory, so ``recent()`` never has to touch the file; pages further
+    back continue from the live log into the rotated files, newest first. ``on_record``
+    is called with every row as it is queued (e.g. to feed the visit correlator).
+
+    With a SQLite ``path`` each batch is one transaction, ``fsync`` maps to
+    the ``synchronous`` pragma and there is no rotation (the table is indexed).
+
+    Write failures (disk full, file locked) never reach the callers of
+    ``write()``: the rows stay queued for the next attempt and ``error``
+    describes the problem until a batch is written again.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        flush_rows: int = 50,
+        flush_seconds: float = 1.0,
+        fsync: str = "batch",
+        max_bytes: int = 0,
+        rotate_daily: bool = False,
+        backups: int = 30,
+        ring_size: int = 500,
+        on_record: Callable[[Dict[str, str]], None] | None = None,
+    ) -> None:
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, got {fsync!r}")
+        self.path = Path(path)
+        self.flush_rows = max(1, flush_rows)
+        self.flush_seconds = flush_seconds
+        self.fsync = fsync
+        self.max_bytes = max_bytes
+        self.rotate_daily = rotate_daily
+        self.backups = backups
+        self.on_record = on_record
+        self.rows_written = 0
+        self.batches_written = 0
+        self.rotations = 0
+        self.error: str | None = None
+        self._store = None
+        if is_sqlite_path(path):
+            self._store = _store(path)
+            self._store.set_synchronous(fsync)
+
+        self._pending: List[Dict[str, str]] = []
+        self._pending_lock = threading.Lock()
+        self._recent: Deque[Dict[str, str]] = deque(maxlen=max(1, ring_size))
+        if self._store is not None or self.path.exists():
+            self._recent.extend(reversed(read_rfid_events(str(self.path), limit=self._recent.maxlen)))
+        self._io_lock = threading.Lock()
+        self._file: TextIO | None = None
+        self._writer: csv.DictWriter | None = None
+        self._file_day: date | None = None
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> "RFIDLogWriter":
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="rfid-log-writer", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        """Stop the writer thread, write whatever is still queued and close the file."""
+        self._stop_event.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+        self._try_flush()
+        with self._io_lock:
+            self._close_file()
+
+    def write(self, event: str, tag_id: str, notes: str = "") -> Dict[str, str]:
+        """Queue one event (timestamped now) and return the row as it will be logged."""
+        record = make_record(event, tag_id, notes)
+        with self._pending_lock:
+            self._pending.append(record)
+            self._recent.append(record)
+            pending = len(self._pending)
+        if self.on_record is not None:
+            self.on_record(record)
+        if self.fsync == "always":
+            self._try_flush()
+        elif pending >= self.flush_rows:
+            self._wake.set()
+        return record
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def recent(self, limit: int = 200, offset: int = 0) -> List[Dict[str, str]]:
+        """Newest-first events, queued ones included; only reads the log beyond the ring size.
+
+        An empty list means there is no older history, in the live log or the rotated ones.
+        """
+        if 0 < offset + limit <= (self._recent.maxlen or 0):
+            with self._pending_lock:
+                return list(islice(reversed(self._recent), offset, offset + limit))
+        self._try_flush()
+        rows: List[Dict[str, str]] = []
+        for path in [self.path, *reversed(self._rotated_files())]:
+            if limit > 0 and len(rows) >= limit:
+                break
+            # Reading offset + (rows still wanted) tells how many rows a shorter file holds.
+            file_rows = read_rfid_events(str(path), limit=offset + limit - len(rows) if limit > 0 else 0)
+            rows.extend(file_rows[offset:])
+            offset = max(0, offset - len(file_rows))
+        return rows[:limit] if limit > 0 else rows
+
+    def flush(self) -> None:
+        """Append all queued rows now (no-op when nothing is queued); raises ``OSError`` on failure."""
+        with self._io_lock:
+            with self._pending_lock:
+                rows, self._pending = self._pending, []
+            if not rows:
+                return
+            try:
+                if self._store is not None:
+                    self._store_rows(rows)
+                else:
+                    self._append_rows(rows)
+            except OSError as exc:
+                # Keep the rows for the next attempt and reopen the file then.
+                with self._pending_lock:
+                    self._pending[:0] = rows
+                    queued = len(self._pending)
+                self._close_file()
+                self.error = f"log write failed ({exc}); {queued} events queued"
+                raise
+            self.error = None
+            self.rows_written += len(rows)
+            self.batches_written += 1
+
+    def _try_flush(self) -> bool:
+        """``flush()`` for the GUI, serial-bridge and writer threads: failures only set ``error``."""
+        try:
+            self.flush()
+        except OSError:
+            return False
+        return True
+
+    def _append_rows(self, rows: List[Dict[str, str]]) -> None:
+        self._rotate_if_needed()
+        writer = self._open()
+        writer.writerows(rows)
+        self._file.flush()
+        if self.fsync != "never":
+            os.fsync(self._file.fileno())
+
+    def _store_rows(self, rows: List[Dict[str, str]]) -> None:
+        try:
+            self._store.add_rfid_events(rows)
+        except sqlite3.Error as exc:
+            # Database locked / disk full: handled like a file error, so the rows are retried.
+            raise OSError(str(exc)) from exc
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            if not self._try_flush():
+                # Disk full / file locked by another program: retry on the next cycle.
+                time.sleep(1.0)
+
+    def _open(self) -> csv.DictWriter:
+        if self._writer is None:
+            new_file = not self.path.exists() or self.path.stat().st_size == 0
+            self._file = self.path.open("a", newline="", encoding="utf-8")
+            self._writer = csv.DictWriter(self._file, fieldnames=CSV_HEADERS)
+            if new_file:
+                self._writer.writeheader()
+                self._file_day = date.today()
+            else:
+                self._file_day = date.fromtimestamp(self.path.stat().st_mtime)
+        return self._writer
+
+    def _close_file(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        self._file = None
+        self._writer = None
+
+    def _rotate_if_needed(self) -> None:
+        if not self.path.exists():
+            return
+        if self._file_day is None:
+            self._file_day = date.fromtimestamp(self.path.stat().st_mtime)
+        too_big = self.max_bytes > 0 and self.path.stat().st_size >= self.max_bytes
+        new_day = self.rotate_daily and self._file_day != date.today()
+        if not (too_big or new_day):
+            return
+        self._close_file()
+        stamp = self._file_day.isoformat() if new_day else datetime.now().strftime("%Y%m%d-%H%M%S")
+        target = self.path.with_name(f"{self.path.stem}.{stamp}{self.path.suffix}")
+        counter = 1
+        while target.exists():
+            target = self.path.with_name(f"{self.path.stem}.{stamp}-{counter}{self.path.suffix}")
+            counter += 1
+        self.path.replace(target)
+        self.rotations += 1
+        self._file_day = None
+        self._prune_backups()
+
+    def _rotated_files(self) -> List[Path]:
+        """Rotated logs, oldest first."""
+        if self._store is not None:
+            return []
+        return sorted(self.path.parent.glob(f"{self.path.stem}.*{self.path.suffix}"), key=lambda p: p.stat().st_mtime)
+
+    def _prune_backups(self) -> None:
+        if self.backups <= 0:
+            return
+        for old in self._rotated_files()[: -self.backups]:
+            try:
+                old.unlink()
+            except OSError:
+                pass
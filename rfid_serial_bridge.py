@@ -8,7 +8,7 @@ import time
 from dataclasses import dataclass
 from typing import Dict, List
 
-from rfid_log import add_rfid_event
+from rfid_log import RFIDLogWriter, add_rfid_event
 
 try:
     import serial
@@ -23,13 +23,24 @@ class RFIDBridgeEvent:
     message: str
     event: str = ""
     tag_id: str = ""
+    timestamp: str = ""
+    notes: str = ""
 
 
 class RFIDSerialBridge:
     """Background serial reader that writes parsed RFID events to CSV."""
 
-    def __init__(self, csv_path: str, port: str, baudrate: int = 115200, auto_scan: bool = True) -> None:
+    def __init__(
+        self,
+        csv_path: str,
+        port: str,
+        baudrate: int = 115200,
+        auto_scan: bool = True,
+        writer: RFIDLogWriter | None = None,
+    ) -> None:
+        # With a writer, rows are only queued here so the next readline isn't delayed by file I/O.
         self.csv_path = csv_path
+        self.writer = writer
         self.port = port.strip()
         self.baudrate = baudrate
         self.auto_scan = auto_scan
@@ -61,13 +72,15 @@ class RFIDSerialBridge:
     def _emit_status(self, message: str) -> None:
         self._events.put(RFIDBridgeEvent(kind="status", message=message))
 
-    def _emit_rfid_event(self, event: str, tag_id: str, source: str) -> None:
+    def _emit_rfid_event(self, record: Dict[str, str], source: str) -> None:
         self._events.put(
             RFIDBridgeEvent(
                 kind="rfid_event",
-                message=f"{source}: {event} {tag_id}",
-                event=event,
-                tag_id=tag_id,
+                message=f"{source}: {record['event']} {record['tag_id']}",
+                event=record["event"],
+                tag_id=record["tag_id"],
+                timestamp=record["timestamp"],
+                notes=record["notes"],
             )
         )
 
@@ -139,8 +152,11 @@ class RFIDSerialBridge:
 
                         event = parsed["event"]
                         tag_id = parsed["tag_id"]
-                        add_rfid_event(self.csv_path, event, tag_id, f"serial:{resolved_port}")
-                        self._emit_rfid_event(event, tag_id, resolved_port)
+                        if self.writer is not None:
+                            record = self.writer.write(event, tag_id, f"serial:{resolved_port}")
+                        else:
+                            record = add_rfid_event(self.csv_path, event, tag_id, f"serial:{resolved_port}")
+                        self._emit_rfid_event(record, resolved_port)
             except Exception as exc:
                 self._emit_status(f"disconnected ({exc})")
                 time.sleep(2.0)
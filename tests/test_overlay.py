@@ -0,0 +1,98 @@
+"""Frame buffer hand-off and zone layer caching."""
+
+from __future__ import annotations
+
+import random
+
+import numpy as np
+import pytest
+
+from overlay import BufferRing, DisplayScheduler, ZoneLayer
+from zones import ZoneIndex
+
+SHAPE = (48, 64, 3)
+
+
+def render(ring: BufferRing, scheduler: DisplayScheduler, frame_id: int) -> np.ndarray:
+    """What the render thread does: draw into a free buffer and publish it."""
+    busy = scheduler.in_use()
+    output = ring.next(SHAPE, avoid=busy)
+    assert not any(output is buffer for buffer in busy)
+    output.fill(frame_id % 256)
+    scheduler.publish(frame_id, output, 0.0)
+    return output
+
+
+@pytest.mark.parametrize("count", [2, 3])
+def test_buffer_is_not_overwritten_while_painting(count):
+    ring = BufferRing(count)
+    scheduler = DisplayScheduler(fps=0)
+    rng = random.Random(count)
+    painting = None
+    frame_id = 0
+    for _ in range(2000):
+        action = rng.choice(("render", "render", "take", "painted"))
+        if action == "render":
+            if count == 2 and painting is not None and len(scheduler.in_use()) == 2:
+                continue  # two buffers cannot hold a published and a painted frame plus a new one
+            frame_id += 1
+            render(ring, scheduler, frame_id)
+        elif action == "take" and painting is None:
+            frame = scheduler.take()
+            if frame is not None:
+                painting = (frame.output, frame.frame_id)
+        elif action == "painted" and painting is not None:
+            # The Tk loop copied the buffer to the screen: it must still hold the frame it took.
+            output, taken_id = painting
+            assert (output == taken_id % 256).all()
+            scheduler.painted()
+            painting = None
+
+
+def test_buffer_ring_refuses_when_every_buffer_is_busy():
+    ring = BufferRing(2)
+    scheduler = DisplayScheduler(fps=0)
+    render(ring, scheduler, 1)
+    scheduler.take()
+    render(ring, scheduler, 2)
+    with pytest.raises(RuntimeError):
+        ring.next(SHAPE, avoid=scheduler.in_use())
+
+
+def composited(layer: ZoneLayer) -> np.ndarray:
+    frame = np.zeros(SHAPE, dtype=np.uint8)
+    layer.composite(frame)
+    return frame
+
+
+def test_zone_layer_rebuilds_after_version_change():
+    # warn_car spans the frame, so the index mask has room for the moved bay.
+    index = ZoneIndex({"truck_space_1": [5, 5, 25, 25], "warn_car": [0, 0, 63, 47]})
+    states = {"truck_space_1": "free"}
+    layer = ZoneLayer()
+    assert layer.update(index, states, SHAPE)
+    assert not layer.update(index, dict(states), SHAPE)
+    assert layer.renders == 1
+    assert composited(layer)[15, 5].any()  # left edge of the outline
+
+    version = index.version
+    assert index.update_zone("truck_space_1", [30, 10, 60, 40])
+    assert index.version != version
+    assert layer.update(index, states, SHAPE)
+    assert layer.renders == 2
+    frame = composited(layer)
+    assert frame[25, 30].any()
+    assert not frame[15, 5].any()
+
+
+def test_zone_layer_rebuilds_on_state_shape_and_new_index():
+    index = ZoneIndex({"truck_space_1": [5, 5, 25, 25]})
+    layer = ZoneLayer()
+    layer.update(index, {"truck_space_1": "free"}, SHAPE)
+    free = composited(layer)[15, 5].copy()
+    assert layer.update(index, {"truck_space_1": "occupied"}, SHAPE)
+    assert (composited(layer)[15, 5] != free).any()
+    assert layer.update(index, {"truck_space_1": "occupied"}, (SHAPE[0] * 2, SHAPE[1] * 2, 3))
+    # Same zones in a new index still count as a change: versions are unique per index.
+    assert layer.update(ZoneIndex({"truck_space_1": [5, 5, 25, 25]}), {"truck_space_1": "occupied"}, SHAPE)
+    assert layer.renders == 4
@@ -0,0 +1,106 @@
+"""Assignment solvers against brute force over every permutation."""
+
+from __future__ import annotations
+
+import itertools
+
+import numpy as np
+import pytest
+
+import tracking
+from tracking import _FORBIDDEN, hungarian, match_pairs
+
+
+def brute_force_cost(cost: np.ndarray) -> float:
+    """Cheapest total over every assignment of min(n, m) rows to distinct columns."""
+    if cost.shape[0] > cost.shape[1]:
+        cost = cost.T
+    n, m = cost.shape
+    return min(cost[np.arange(n), list(cols)].sum() for cols in itertools.permutations(range(m), n))
+
+
+def brute_force_matching(cost: np.ndarray, allowed: np.ndarray) -> tuple[int, float]:
+    """Most allowed pairs, then the lowest total cost among matchings with that many."""
+    n, m = cost.shape
+    best = (0, 0.0)
+    for size in range(1, min(n, m) + 1):
+        for rows in itertools.combinations(range(n), size):
+            for cols in itertools.permutations(range(m), size):
+                if allowed[rows, cols].all():
+                    total = float(cost[rows, cols].sum())
+                    if size > best[0] or total < best[1]:
+                        best = (size, total)
+    return best
+
+
+def random_shapes(rng: np.random.Generator, count: int):
+    for _ in range(count):
+        yield tuple(int(x) for x in rng.integers(1, 6, 2))
+
+
+@pytest.fixture
+def fallback_solver(monkeypatch):
+    """Run match_pairs on the NumPy solver even when SciPy is installed."""
+    monkeypatch.setattr(tracking, "_solver", hungarian)
+
+
+def assert_valid_assignment(rows: np.ndarray, cols: np.ndarray, shape: tuple[int, int]) -> None:
+    assert len(rows) == len(cols) == min(shape)
+    assert len(set(rows.tolist())) == len(rows)
+    assert len(set(cols.tolist())) == len(cols)
+    assert list(rows) == sorted(rows)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_hungarian_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    for n, m in random_shapes(rng, 200):
+        # Small integer costs give many ties, uniform ones none.
+        cost = rng.integers(0, 4, (n, m)).astype(float) if seed % 2 else rng.random((n, m))
+        rows, cols = hungarian(cost)
+        assert_valid_assignment(rows, cols, cost.shape)
+        assert cost[rows, cols].sum() == pytest.approx(brute_force_cost(cost))
+
+
+def test_hungarian_avoids_gated_entries():
+    rng = np.random.default_rng(10)
+    checked = 0
+    for n, m in random_shapes(rng, 400):
+        cost = rng.random((n, m))
+        cost[rng.random((n, m)) < 0.4] = np.inf
+        best = brute_force_cost(cost)
+        if not np.isfinite(best):
+            continue  # no assignment avoids every gated entry
+        rows, cols = hungarian(cost)
+        assert_valid_assignment(rows, cols, cost.shape)
+        assert cost[rows, cols].sum() == pytest.approx(best)
+        checked += 1
+    assert checked > 100
+
+
+def test_hungarian_forbidden_cost_only_when_unavoidable():
+    cost = np.array([[1.0, _FORBIDDEN], [_FORBIDDEN, _FORBIDDEN], [2.0, 0.5]])
+    rows, cols = hungarian(cost)
+    assert list(zip(rows.tolist(), cols.tolist())) == [(0, 0), (2, 1)]
+
+
+@pytest.mark.usefixtures("fallback_solver")
+@pytest.mark.parametrize("density", [0.2, 0.5, 0.9])
+def test_match_pairs_matches_brute_force(density):
+    rng = np.random.default_rng(int(density * 10))
+    for n, m in random_shapes(rng, 150):
+        cost = rng.random((n, m)) * 3.0
+        allowed = rng.random((n, m)) < density
+        rows, cols = match_pairs(cost, allowed)
+        assert allowed[rows, cols].all()
+        assert len(set(rows.tolist())) == len(rows)
+        assert len(set(cols.tolist())) == len(cols)
+        size, total = brute_force_matching(cost, allowed)
+        assert len(rows) == size
+        assert cost[rows, cols].sum() == pytest.approx(total)
+
+
+@pytest.mark.usefixtures("fallback_solver")
+def test_match_pairs_nothing_allowed():
+    rows, cols = match_pairs(np.ones((3, 2)), np.zeros((3, 2), dtype=bool))
+    assert rows.size == cols.size == 0
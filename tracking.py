@@ -0,0 +1,258 @@
+"""Multi-object tracking: stable track ids across frames with optimal matching.
+
+Each detection cycle, tracks are first moved to where their velocity puts
+them, then matched to the new detections of the same label by minimum total
+cost ``(1 - IoU) + distance / match_radius`` over all pairs at once. Greedy
+matching could instead hand a truck's id to its neighbour. A pair can only
+match if the boxes overlap by at least ``min_iou`` or their centres are
+within ``match_radius`` pixels.
+
+Matched tracks keep their id; unmatched detections start new tracks and a
+track that goes ``ttl_frames`` frames without a match is dropped, which keeps
+the overlay from flickering when a detection drops out for a frame or two.
+Between detection cycles (and while a track is missed) its box moves at its
+last measured velocity, for at most ``predict_seconds``.
+
+All state is in NumPy arrays (one row per track); ``detections()`` returns a
+fresh ``DetectionBatch`` with the ``track_ids`` column filled in.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Callable, Dict, Iterable
+
+import numpy as np
+
+from detector import Detection, DetectionBatch, as_batch
+
+# Cost given to pairs that are not allowed to match; any real cost is < 3.
+_FORBIDDEN = 1e6
+
+_solver: Callable[[np.ndarray], tuple[np.ndarray, np.ndarray]] | None = None
+
+
+def linear_assignment(cost: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Minimum-cost (rows, cols) assignment, like ``scipy.optimize.linear_sum_assignment``.
+
+    SciPy (installed with ultralytics) is used when available, else ``hungarian``.
+    """
+    global _solver
+    if _solver is None:
+        try:
+            from scipy.optimize import linear_sum_assignment
+        except ImportError:  # ONNX/OpenVINO-only installs
+            _solver = hungarian
+        else:
+            _solver = linear_sum_assignment
+    if cost.size == 0:
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+    return _solver(cost)
+
+
+def hungarian(cost: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """O(n^3) Hungarian method (shortest augmenting paths with potentials), rows vectorized.
+
+    When a row's cheapest column is still free it is assigned in one step, so
+    the sparse, mostly unambiguous matrices of a depot yard solve quickly.
+    """
+    transposed = cost.shape[0] > cost.shape[1]
+    if transposed:
+        cost = cost.T
+    n, m = cost.shape
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    owner = np.zeros(m + 1, dtype=np.intp)  # owner[j]: row (1-based) assigned to column j, 0 = free
+    way = np.zeros(m + 1, dtype=np.intp)
+    for row in range(1, n + 1):
+        owner[0] = row
+        col = 0
+        min_slack = np.full(m + 1, np.inf)
+        visited = np.zeros(m + 1, dtype=bool)
+        while True:
+            visited[col] = True
+            i = owner[col]
+            free = ~visited
+            free[0] = False
+            slack = cost[i - 1] - u[i] - v[1:]
+            better = free[1:] & (slack < min_slack[1:])
+            min_slack[1:][better] = slack[better]
+            way[1:][better] = col
+            candidates = np.where(free, min_slack, np.inf)
+            next_col = int(candidates.argmin())
+            delta = candidates[next_col]
+            u[owner[visited]] += delta
+            v[visited] -= delta
+            min_slack[free] -= delta
+            col = next_col
+            if owner[col] == 0:
+                break
+        while col:
+            previous = way[col]
+            owner[col] = owner[previous]
+            col = previous
+    cols = np.flatnonzero(owner[1:])
+    rows = owner[1:][cols] - 1
+    if transposed:
+        rows, cols = cols, rows
+    order = np.argsort(rows)
+    return rows[order], cols[order]
+
+
+def match_pairs(cost: np.ndarray, allowed: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Optimal matching restricted to ``allowed`` pairs; returns matched (rows, cols).
+
+    Pairs that are each other's only option are taken directly (they are in
+    every optimal matching), so the solver only sees the contested rows.
+    """
+    row_options = allowed.sum(axis=1)
+    col_options = allowed.sum(axis=0)
+    only = allowed & (row_options[:, None] == 1) & (col_options[None, :] == 1)
+    rows, cols = np.nonzero(only)
+    open_rows = row_options > 0
+    open_rows[rows] = False
+    open_cols = col_options > 0
+    open_cols[cols] = False
+    rest_rows, rest_cols = np.flatnonzero(open_rows), np.flatnonzero(open_cols)
+    if rest_rows.size and rest_cols.size:
+        sub_allowed = allowed[np.ix_(rest_rows, rest_cols)]
+        sub_cost = np.where(sub_allowed, cost[np.ix_(rest_rows, rest_cols)], _FORBIDDEN)
+        sub_rows, sub_cols = linear_assignment(sub_cost)
+        keep = sub_allowed[sub_rows, sub_cols]
+        rows = np.concatenate([rows, rest_rows[sub_rows[keep]]])
+        cols = np.concatenate([cols, rest_cols[sub_cols[keep]]])
+    return rows, cols
+
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of ``(n, 4)`` and ``(m, 4)`` xyxy boxes -> ``(n, m)``."""
+    inter_w = np.minimum(a[:, None, 2], b[None, :, 2]) - np.maximum(a[:, None, 0], b[None, :, 0])
+    inter_h = np.minimum(a[:, None, 3], b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1])
+    inter = np.clip(inter_w, 0, None) * np.clip(inter_h, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def _centers(boxes: np.ndarray) -> np.ndarray:
+    return (boxes[:, :2] + boxes[:, 2:]) / 2.0
+
+
+class DetectionTracker:
+    """Tracks with stable ids, optimal IoU/centroid matching and constant-velocity prediction."""
+
+    def __init__(
+        self,
+        ttl_frames: int,
+        match_radius: float = 60.0,
+        min_iou: float = 0.1,
+        predict_seconds: float = 1.0,
+        velocity_smoothing: float = 0.5,
+    ) -> None:
+        self.ttl_frames = max(1, ttl_frames)
+        self.match_radius = float(match_radius)
+        self.min_iou = min_iou
+        self.predict_seconds = predict_seconds
+        self.velocity_smoothing = velocity_smoothing
+        self._next_id = 1
+        self.reset()
+
+    def reset(self) -> None:
+        """Drop every track (e.g. after a camera switch); ids keep counting up."""
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.boxes = np.zeros((0, 4), dtype=np.float64)  # last matched box
+        self.velocity = np.zeros((0, 2), dtype=np.float64)  # centre, pixels per second
+        self.conf = np.zeros(0, dtype=np.float32)
+        self.cls = np.zeros(0, dtype=np.int32)
+        self.labels = np.zeros(0, dtype=str)
+        self.ttl = np.zeros(0, dtype=np.int32)
+        self.first_seen = np.zeros(0, dtype=np.float64)
+        self.last_seen = np.zeros(0, dtype=np.float64)
+        self._published = (DetectionBatch.empty(), np.zeros(0, dtype=np.float64))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def detections(self) -> DetectionBatch:
+        return self._published[0]
+
+    def dwell(self, now: float) -> Dict[int, float]:
+        """Seconds each published track has existed, by track id (same clock as the ``ts`` passed in).
+
+        Reads the last published snapshot, so other threads may call it during an update.
+        """
+        batch, first_seen = self._published
+        return dict(zip(batch.track_ids.tolist(), (now - first_seen).tolist()))
+
+    def decay(self, ts: float | None = None) -> None:
+        """A frame without a detection cycle: age every track and move it along its velocity."""
+        self._age()
+        self._publish(time.monotonic() if ts is None else ts)
+
+    def update(self, detections: DetectionBatch | Iterable[Detection], ts: float | None = None) -> None:
+        detections = as_batch(detections)
+        ts = time.monotonic() if ts is None else ts
+        self._age()
+        boxes = detections.xyxy.astype(np.float64)
+        rows, cols = self._match(detections, boxes, self._predicted(ts))
+
+        if len(rows):
+            dt = ts - self.last_seen[cols]
+            moved = dt > 0
+            if moved.any():
+                measured = (_centers(boxes[rows[moved]]) - _centers(self.boxes[cols[moved]])) / dt[moved, None]
+                alpha = self.velocity_smoothing
+                self.velocity[cols[moved]] = alpha * measured + (1.0 - alpha) * self.velocity[cols[moved]]
+            self.boxes[cols] = boxes[rows]
+            self.conf[cols] = detections.conf[rows]
+            self.ttl[cols] = self.ttl_frames
+            self.last_seen[cols] = ts
+
+        new = np.ones(len(detections), dtype=bool)
+        new[rows] = False
+        count = int(new.sum())
+        if count:
+            self.ids = np.concatenate([self.ids, np.arange(self._next_id, self._next_id + count, dtype=np.int64)])
+            self._next_id += count
+            self.boxes = np.concatenate([self.boxes, boxes[new]])
+            self.velocity = np.concatenate([self.velocity, np.zeros((count, 2))])
+            self.conf = np.concatenate([self.conf, detections.conf[new]])
+            self.cls = np.concatenate([self.cls, detections.cls[new]])
+            self.labels = np.concatenate([self.labels, detections.labels[new]])
+            self.ttl = np.concatenate([self.ttl, np.full(count, self.ttl_frames, dtype=np.int32)])
+            self.first_seen = np.concatenate([self.first_seen, np.full(count, ts)])
+            self.last_seen = np.concatenate([self.last_seen, np.full(count, ts)])
+        self._publish(ts)
+
+    def _age(self) -> None:
+        self.ttl = self.ttl - 1
+        alive = self.ttl > 0
+        if alive.all():
+            return
+        for name in ("ids", "boxes", "velocity", "conf", "cls", "labels", "ttl", "first_seen", "last_seen"):
+            setattr(self, name, getattr(self, name)[alive])
+
+    def _predicted(self, ts: float) -> np.ndarray:
+        dt = np.clip(ts - self.last_seen, 0.0, self.predict_seconds)
+        return self.boxes + np.tile(self.velocity, 2) * dt[:, None]
+
+    def _match(
+        self, detections: DetectionBatch, boxes: np.ndarray, predicted: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        if not len(detections) or not len(self.ids):
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+        iou = box_iou(boxes, predicted)
+        offset = _centers(boxes)[:, None, :] - _centers(predicted)[None, :, :]
+        distance = np.hypot(offset[..., 0], offset[..., 1])
+        allowed = (detections.labels[:, None] == self.labels[None, :]) & (
+            (iou >= self.min_iou) | (distance <= self.match_radius)
+        )
+        cost = (1.0 - iou) + distance / self.match_radius
+        return match_pairs(cost, allowed)
+
+    def _publish(self, ts: float) -> None:
+        """Output batch at ``ts``: matched tracks where they were seen, the rest where they should be."""
+        xyxy = np.rint(self._predicted(ts)).astype(np.int32)
+        centroids = ((xyxy[:, :2] + xyxy[:, 2:]) / 2).astype(np.int32)
+        batch = DetectionBatch(xyxy, self.conf.copy(), self.cls.copy(), self.labels.copy(), centroids, self.ids.copy())
+        self._published = (batch, self.first_seen.copy())
@@ -1,14 +1,26 @@
-"""Zone definitions and helpers for centroid-in-box checks."""
+"""Zone definitions (rectangles or polygons) and centroid-in-zone lookups."""
 
 from __future__ import annotations
 
+import itertools
 import json
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Tuple, Union
+
+import cv2
+import numpy as np
 
 Box = List[int]
-ZoneMap = Dict[str, Box]
+Polygon = List[List[int]]
+Zone = Union[Box, Polygon]
+ZoneMap = Dict[str, Zone]
+
+TRUCK_ZONE_PREFIX = "truck_space_"
+WARNING_ZONE_PREFIX = "warn_"
+# Detections whose centroid falls in an exclusion zone are ignored entirely.
+EXCLUSION_ZONE_PREFIX = "exclude_"
 
+# Default bay set; per-camera zone files may define any number of bays.
 TRUCK_ZONE_KEYS = ("truck_space_1", "truck_space_2", "truck_space_3")
 WARNING_ZONE_KEYS = ("warn_car",)
 
@@ -35,11 +47,224 @@ def normalize_box(box: Box, frame_w: int | None = None, frame_h: int | None = No
     return [left, top, right, bottom]
 
 
+def normalize_polygon(points: Polygon, frame_w: int | None = None, frame_h: int | None = None) -> Polygon:
+    polygon: Polygon = []
+    for x, y in points:
+        x, y = int(x), int(y)
+        if frame_w is not None:
+            x = max(0, min(x, frame_w - 1))
+        if frame_h is not None:
+            y = max(0, min(y, frame_h - 1))
+        polygon.append([x, y])
+    return polygon
+
+
+def is_polygon(zone: Zone) -> bool:
+    return bool(zone) and isinstance(zone[0], (list, tuple))
+
+
+def normalize_zone(zone: Zone, frame_w: int | None = None, frame_h: int | None = None) -> Zone:
+    if is_polygon(zone):
+        return normalize_polygon(zone, frame_w, frame_h)
+    return normalize_box(zone, frame_w, frame_h)
+
+
+def zone_points(zone: Zone) -> np.ndarray:
+    """Zone outline as an (K, 2) int32 vertex array; rectangles become 4 corners."""
+    if is_polygon(zone):
+        return np.array(zone, dtype=np.int32).reshape(-1, 2)
+    x1, y1, x2, y2 = zone
+    return np.array([[x1, y1], [x2, y1], [x2, y2], [x1, y2]], dtype=np.int32)
+
+
+def zone_bounds(zone: Zone) -> Box:
+    """Axis-aligned bounding box ``[x1, y1, x2, y2]`` of a zone."""
+    if not is_polygon(zone):
+        return list(zone)
+    pts = zone_points(zone)
+    x1, y1 = pts.min(axis=0).tolist()
+    x2, y2 = pts.max(axis=0).tolist()
+    return [x1, y1, x2, y2]
+
+
+def zones_roi(zones: ZoneMap, margin: int, frame_w: int, frame_h: int) -> Box | None:
+    """Union bounding box of all zones grown by ``margin``, clamped to the frame.
+
+    Returns None when there are no zones or the ROI would be the whole frame.
+    """
+    if not zones:
+        return None
+    bounds = np.array([zone_bounds(zone) for zone in zones.values()])
+    x1 = max(0, int(bounds[:, 0].min()) - margin)
+    y1 = max(0, int(bounds[:, 1].min()) - margin)
+    x2 = min(frame_w - 1, int(bounds[:, 2].max()) + margin)
+    y2 = min(frame_h - 1, int(bounds[:, 3].max()) + margin)
+    if x1 == 0 and y1 == 0 and x2 == frame_w - 1 and y2 == frame_h - 1:
+        return None
+    return [x1, y1, x2, y2]
+
+
 def point_in_box(x: int, y: int, box: Box) -> bool:
     x1, y1, x2, y2 = box
     return x1 <= x <= x2 and y1 <= y <= y2
 
 
+def _zone_sort_key(key: str) -> Tuple[str, int, str]:
+    prefix, _, suffix = key.rpartition("_")
+    if suffix.isdigit():
+        return prefix, int(suffix), ""
+    return key, -1, key
+
+
+def truck_zone_keys(zones: ZoneMap) -> Tuple[str, ...]:
+    """Truck bay keys present in a zone map, in natural order (bay 2 before bay 10)."""
+    return tuple(sorted((k for k in zones if k.startswith(TRUCK_ZONE_PREFIX)), key=_zone_sort_key))
+
+
+def warning_zone_label(key: str) -> str:
+    """Object label a warning zone watches (``warn_car`` -> ``car``), or ``""``."""
+    if key.startswith(WARNING_ZONE_PREFIX):
+        return key[len(WARNING_ZONE_PREFIX):]
+    return ""
+
+
+def is_known_zone_key(key: str) -> bool:
+    return key in DEFAULT_ZONES or key.startswith((TRUCK_ZONE_PREFIX, WARNING_ZONE_PREFIX, EXCLUSION_ZONE_PREFIX))
+
+
+def _copy_zone(zone: Zone) -> Zone:
+    if is_polygon(zone):
+        return [list(p) for p in zone]
+    return list(zone)
+
+
+_index_versions = itertools.count(1)
+
+
+class ZoneIndex:
+    """Zones rasterized into a bit-packed label mask for O(1) centroid lookups.
+
+    Bit ``j`` of ``mask[plane, y, x]`` is set when pixel (x, y) lies inside
+    zone column ``j`` (``plane = j // bits_per_plane``), so overlapping zones
+    just set several bits. Truck bays come first, in ``truck_zone_keys`` order.
+    The mask covers the zones' extent; points beyond it match no zone.
+
+    ``version`` changes whenever the zone shapes do (also across the new
+    indexes ``sync`` may return), so consumers can compare one integer
+    instead of the zones themselves.
+    """
+
+    def __init__(self, zones: ZoneMap) -> None:
+        truck_keys = truck_zone_keys(zones)
+        self.keys: Tuple[str, ...] = truck_keys + tuple(k for k in zones if k not in truck_keys)
+        self.zones: ZoneMap = {k: _copy_zone(zones[k]) for k in self.keys}
+        warning_cols = [i for i, k in enumerate(self.keys) if warning_zone_label(k)]
+        self.truck_cols = np.arange(len(truck_keys))
+        self.warning_cols = np.array(warning_cols, dtype=np.intp)
+        self.warning_labels = tuple(warning_zone_label(self.keys[i]) for i in warning_cols)
+        self.exclusion_cols = np.array(
+            [i for i, k in enumerate(self.keys) if k.startswith(EXCLUSION_ZONE_PREFIX)], dtype=np.intp
+        )
+
+        n = len(self.keys)
+        for dtype in (np.uint8, np.uint16, np.uint32, np.uint64):
+            if n <= np.iinfo(dtype).bits or dtype is np.uint64:
+                break
+        self.dtype = np.dtype(dtype)
+        self.bits_per_plane = self.dtype.itemsize * 8
+        planes = max(1, -(-n // self.bits_per_plane))
+
+        width = height = 1
+        for zone in self.zones.values():
+            x1, y1, x2, y2 = zone_bounds(zone)
+            width = max(width, x2 + 1)
+            height = max(height, y2 + 1)
+        self.mask = np.zeros((planes, height, width), dtype=self.dtype)
+        for col, key in enumerate(self.keys):
+            self._paint(col, self.zones[key])
+
+        cols = np.arange(n)
+        self._col_planes = cols // self.bits_per_plane
+        self._col_shifts = (cols % self.bits_per_plane).astype(self.dtype)[:, None]
+        self.version = next(_index_versions)
+
+    @property
+    def truck_keys(self) -> Tuple[str, ...]:
+        return self.keys[: len(self.truck_cols)]
+
+    def _clipped_bounds(self, zone: Zone) -> Tuple[int, int, int, int] | None:
+        _, height, width = self.mask.shape
+        x1, y1, x2, y2 = zone_bounds(zone)
+        x1, y1 = max(0, x1), max(0, y1)
+        x2, y2 = min(width - 1, x2), min(height - 1, y2)
+        if x2 < x1 or y2 < y1:
+            return None
+        return x1, y1, x2, y2
+
+    def _bit(self, col: int):
+        return col // self.bits_per_plane, self.dtype.type(1 << (col % self.bits_per_plane))
+
+    def _paint(self, col: int, zone: Zone) -> None:
+        bounds = self._clipped_bounds(zone)
+        if bounds is None:
+            return
+        x1, y1, x2, y2 = bounds
+        region = np.zeros((y2 - y1 + 1, x2 - x1 + 1), dtype=np.uint8)
+        cv2.fillPoly(region, [zone_points(zone) - np.array([x1, y1], dtype=np.int32)], 1)
+        plane, bit = self._bit(col)
+        self.mask[plane, y1 : y2 + 1, x1 : x2 + 1] |= region.astype(self.dtype) * bit
+
+    def _clear(self, col: int, zone: Zone) -> None:
+        bounds = self._clipped_bounds(zone)
+        if bounds is None:
+            return
+        x1, y1, x2, y2 = bounds
+        plane, bit = self._bit(col)
+        self.mask[plane, y1 : y2 + 1, x1 : x2 + 1] &= ~bit
+
+    def update_zone(self, key: str, zone: Zone) -> bool:
+        """Re-rasterize a single edited zone in place.
+
+        Returns False when the zone is unknown or grew past the mask extent;
+        the caller should then build a new index.
+        """
+        if key not in self.zones:
+            return False
+        _, height, width = self.mask.shape
+        x1, y1, x2, y2 = zone_bounds(zone)
+        if x2 >= width or y2 >= height:
+            return False
+        col = self.keys.index(key)
+        self._clear(col, self.zones[key])
+        self.zones[key] = _copy_zone(zone)
+        self._paint(col, zone)
+        self.version = next(_index_versions)
+        return True
+
+    def sync(self, zones: ZoneMap) -> "ZoneIndex":
+        """Bring the index up to date with ``zones``, reusing it when only shapes changed."""
+        if set(zones) != set(self.keys):
+            return ZoneIndex(zones)
+        for key in self.keys:
+            if zones[key] != self.zones[key] and not self.update_zone(key, zones[key]):
+                return ZoneIndex(zones)
+        return self
+
+    def contains(self, points: np.ndarray) -> np.ndarray:
+        """Boolean (points x zones) matrix: True where a point lies inside a zone."""
+        _, height, width = self.mask.shape
+        result = np.zeros((len(points), len(self.keys)), dtype=bool)
+        if not len(points) or not len(self.keys):
+            return result
+        x = points[:, 0]
+        y = points[:, 1]
+        valid = (x >= 0) & (y >= 0) & (x < width) & (y < height)
+        values = self.mask[:, y[valid], x[valid]]
+        bits = (values[self._col_planes] >> self._col_shifts) & 1
+        result[valid] = bits.T.astype(bool)
+        return result
+
+
 def load_zones(path: str, frame_w: int, frame_h: int) -> ZoneMap:
     zone_file = Path(path)
     if not zone_file.exists():
@@ -47,17 +272,29 @@ def load_zones(path: str, frame_w: int, frame_h: int) -> ZoneMap:
         return dict(DEFAULT_ZONES)
 
     data = json.loads(zone_file.read_text(encoding="utf-8"))
-    zones: ZoneMap = dict(DEFAULT_ZONES)
+    # Non-bay defaults first with the file on top, so a zones.json without
+    # warn_car keeps car warnings; default bays are only used if it has none.
+    zones: ZoneMap = {k: _copy_zone(v) for k, v in DEFAULT_ZONES.items() if not k.startswith(TRUCK_ZONE_PREFIX)}
     for key, value in data.items():
-        if key not in zones:
-            continue
-        if not isinstance(value, list) or len(value) != 4:
+        if not is_known_zone_key(key) or not isinstance(value, list):
             continue
-        zones[key] = normalize_box([int(v) for v in value], frame_w, frame_h)
+        if is_polygon(value):
+            if len(value) < 3 or any(len(p) != 2 for p in value):
+                continue
+            zones[key] = normalize_polygon(value, frame_w, frame_h)
+        elif len(value) == 4:
+            zones[key] = normalize_box([int(v) for v in value], frame_w, frame_h)
+    if not truck_zone_keys(zones):
+        # A file without bays is treated as unconfigured; fall back to the defaults.
+        for key, box in DEFAULT_ZONES.items():
+            zones.setdefault(key, box)
     return zones
 
 
 def save_zones(path: str, zones: ZoneMap) -> None:
     zone_file = Path(path)
-    serializable = {key: [int(v) for v in box] for key, box in zones.items()}
+    serializable = {
+        key: [[int(x), int(y)] for x, y in zone] if is_polygon(zone) else [int(v) for v in zone]
+        for key, zone in zones.items()
+    }
     zone_file.write_text(json.dumps(serializable, indent=2), encoding="utf-8")